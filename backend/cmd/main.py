@@ -9,7 +9,7 @@ import sys
 
 sys.path.append(os.path.abspath(os.path.join(__file__, "../../")))
 
-from services.ollama import async_chat_with_model, fetch_models
+from services.ollama import OllamaClient
 
 try:
     import pyfiglet
@@ -62,9 +62,16 @@ def display_ascii_logo():
 async def main_async():
     display_ascii_logo()
 
+    # One pooled client for the whole session, so every turn reuses the connection
+    async with OllamaClient() as ollama:
+        await chat_loop(ollama)
+
+
+async def chat_loop(ollama: OllamaClient):
+    """Picks a model and runs the interactive conversation."""
     # Dynamically fetch models from Ollama
     try:
-        models = await fetch_models()
+        models = await ollama.fetch_models()
     except ConnectionError as e:
         print(f"❌ {e}")
         sys.exit(1)
@@ -91,8 +98,9 @@ async def main_async():
     print(f"\n✅ Model selected: {selected_model}")
     print("\n💬 Brainstorming Chatbot (type 'exit' to quit)")
 
-    # Start conversation
-    conversation_history = f"System: {SYSTEM_PROMPT}"
+    # Start conversation. Earlier messages are resent unchanged, so Ollama (which
+    # keeps the model loaded between turns) only evaluates the new ones
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
 
     while True:
         user_input = input("\n👤 You: ").strip()
@@ -101,26 +109,25 @@ async def main_async():
             break
 
         # Add user turn
-        conversation_history += f"\nUser: {user_input}"
+        messages.append({"role": "user", "content": user_input})
 
         # Stream response
         print("\n🧠 AI: ", end="", flush=True)
 
         chunks_collected = []
         try:
-            async for chunk in async_chat_with_model(
-                selected_model, conversation_history
-            ):
+            async for chunk in ollama.chat_stream(selected_model, messages):
                 print(chunk, end="", flush=True)
                 chunks_collected.append(chunk)
         except Exception as e:
             print(f"[ERROR] {str(e)}")
+            messages.pop()
             continue
 
         ai_text = "".join(chunks_collected)
         print()  # newline
         # Add to conversation
-        conversation_history += f"\nAI: {ai_text}"
+        messages.append({"role": "assistant", "content": ai_text})
 
 
 def main():
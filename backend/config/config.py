@@ -3,7 +3,7 @@ Configuration constants or environment variables for the Ollama application.
 """
 
 import os
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -23,7 +23,19 @@ class FileTypeConfig(BaseModel):
 class TextExtractorConfig(BaseModel):
     extraction_settings: FileTypeConfig
     temp_upload_dir: str = Field(
-        "./temp_uploads", description="Directory to store temporary file uploads."
+        default="./temp_uploads",
+        description="Directory to store temporary file uploads.",
+    )
+    pdf_parallel_min_pages: int = Field(
+        default=32,
+        description="PDFs with at least this many pages are split across processes.",
+    )
+    pdf_pages_per_task: int = Field(
+        default=16, description="Number of PDF pages extracted by one worker task."
+    )
+    pdf_process_workers: Optional[int] = Field(
+        default=None,
+        description="Size of the PDF process pool (defaults to the CPU count).",
     )
 
 
@@ -39,6 +51,249 @@ TEXT_EXTRACTOR_CONFIG = TextExtractorConfig(
         },
     ),
     temp_upload_dir="docs/uploads",
+    pdf_parallel_min_pages=int(os.environ.get("PDF_PARALLEL_MIN_PAGES", 32)),
+    pdf_pages_per_task=int(os.environ.get("PDF_PAGES_PER_TASK", 16)),
+)
+
+
+class UploadConfig(BaseModel):
+    max_file_bytes: int = Field(
+        default=512 * 1024 * 1024, description="Uploads larger than this are rejected."
+    )
+    copy_chunk_bytes: int = Field(
+        default=1024 * 1024, description="Block size used when writing uploads to disk."
+    )
+
+
+# Configuration for document uploads
+UPLOAD_CONFIG = UploadConfig(
+    max_file_bytes=int(os.environ.get("UPLOAD_MAX_FILE_BYTES", 512 * 1024 * 1024)),
+)
+
+
+class IngestionConfig(BaseModel):
+    workers: int = Field(
+        default=2, description="Number of jobs processed concurrently."
+    )
+    max_queued_jobs: int = Field(
+        default=64,
+        description="Submissions are rejected once this many jobs are waiting.",
+    )
+    max_retained_jobs: int = Field(
+        default=200, description="Finished jobs kept for status queries."
+    )
+    write_batch_size: int = Field(
+        default=256, description="Chunks embedded and written to ChromaDB per step."
+    )
+    pipeline_queue_size: int = Field(
+        default=32, description="Pages buffered between extraction and segmentation."
+    )
+    embed_linger_ms: float = Field(
+        default=50.0,
+        description="How long a partial embedding batch waits for more chunks.",
+    )
+
+
+# Configuration for background document ingestion jobs
+INGESTION_CONFIG = IngestionConfig(
+    workers=int(os.environ.get("INGESTION_WORKERS", 2)),
+    max_queued_jobs=int(os.environ.get("INGESTION_MAX_QUEUED_JOBS", 64)),
+)
+
+
+class EmbeddingBatchConfig(BaseModel):
+    token_budget: int = Field(
+        default=8192,
+        description="Maximum number of (padded) tokens encoded in a single forward pass.",
+    )
+    max_batch_size: int = Field(
+        default=256, description="Upper bound on the number of texts per batch."
+    )
+    chars_per_token: float = Field(
+        default=4.0,
+        description="Average characters per token used to estimate text length.",
+    )
+
+
+# Configuration for batched embedding generation
+EMBEDDING_BATCH_CONFIG = EmbeddingBatchConfig(
+    token_budget=int(os.environ.get("EMBEDDING_TOKEN_BUDGET", 8192)),
+    max_batch_size=int(os.environ.get("EMBEDDING_MAX_BATCH_SIZE", 256)),
+)
+
+
+class EmbeddingCacheConfig(BaseModel):
+    enabled: bool = Field(
+        default=True, description="Whether chunk embeddings are cached."
+    )
+    memory_max_entries: int = Field(
+        default=50_000,
+        description="Maximum number of embeddings kept in the in-memory LRU.",
+    )
+    disk_path: Optional[str] = Field(
+        default="./embedding_cache/embeddings.sqlite3",
+        description="SQLite file backing the on-disk tier (None disables it).",
+    )
+    disk_max_entries: int = Field(
+        default=1_000_000, description="Maximum number of embeddings kept on disk."
+    )
+
+
+# Configuration for the content-addressed embedding cache
+EMBEDDING_CACHE_CONFIG = EmbeddingCacheConfig(
+    enabled=os.environ.get("EMBEDDING_CACHE_ENABLED", "1") != "0",
+    memory_max_entries=int(os.environ.get("EMBEDDING_CACHE_MEMORY_ENTRIES", 50_000)),
+    disk_path=os.environ.get(
+        "EMBEDDING_CACHE_PATH", "./embedding_cache/embeddings.sqlite3"
+    )
+    or None,
+    disk_max_entries=int(os.environ.get("EMBEDDING_CACHE_DISK_ENTRIES", 1_000_000)),
+)
+
+
+class QueryBatcherConfig(BaseModel):
+    max_wait_ms: float = Field(
+        default=5.0, description="How long a query waits for others to join its batch."
+    )
+    max_batch_size: int = Field(
+        default=32,
+        description="Maximum number of queries embedded in one forward pass.",
+    )
+
+
+# Configuration for cross-request query embedding micro-batching
+QUERY_BATCHER_CONFIG = QueryBatcherConfig(
+    max_wait_ms=float(os.environ.get("QUERY_BATCH_MAX_WAIT_MS", 5.0)),
+    max_batch_size=int(os.environ.get("QUERY_BATCH_MAX_SIZE", 32)),
+)
+
+
+class WebScrapeConfig(BaseModel):
+    total_deadline_s: float = Field(
+        default=8.0,
+        description="Overall time budget for one search + scrape, in seconds.",
+    )
+    connect_timeout_s: float = Field(
+        default=3.0, description="TCP/TLS connect timeout."
+    )
+    read_timeout_s: float = Field(
+        default=5.0, description="Timeout between received bytes."
+    )
+    max_connections: int = Field(
+        default=32, description="Size of the shared HTTP connection pool."
+    )
+    max_connections_per_host: int = Field(
+        default=2, description="Concurrent requests allowed to a single host."
+    )
+    max_bytes: int = Field(
+        default=2 * 1024 * 1024,
+        description="Pages are truncated after this many bytes.",
+    )
+    user_agent: str = (
+        "Mozilla/5.0 (X11; Linux x86_64) Chrome/58.0.3029.110 Safari/537.3"
+    )
+
+
+# Configuration for concurrent web page scraping
+WEB_SCRAPE_CONFIG = WebScrapeConfig(
+    total_deadline_s=float(os.environ.get("WEB_SCRAPE_DEADLINE_S", 8.0)),
+    max_bytes=int(os.environ.get("WEB_SCRAPE_MAX_BYTES", 2 * 1024 * 1024)),
+)
+
+
+class ChatRetrievalConfig(BaseModel):
+    deadline_s: float = Field(
+        default=10.0,
+        description="Time budget for the web search and RAG stages of a chat turn.",
+    )
+    rag_n_results: int = Field(
+        default=5, description="Number of document chunks retrieved from ChromaDB."
+    )
+    web_max_results: int = Field(
+        default=3, description="Number of web pages searched per chat turn."
+    )
+    web_top_k: int = Field(
+        default=5,
+        description="Number of web chunks, ranked by similarity, given to the model.",
+    )
+    persist_web_results: bool = Field(
+        default=True,
+        description="Store the chat's web chunks in ChromaDB in the background.",
+    )
+
+
+# Configuration for the retrieval stage of the chat endpoint
+CHAT_RETRIEVAL_CONFIG = ChatRetrievalConfig(
+    deadline_s=float(os.environ.get("CHAT_RETRIEVAL_DEADLINE_S", 10.0)),
+    persist_web_results=os.environ.get("CHAT_PERSIST_WEB_RESULTS", "1") != "0",
+)
+
+
+class PromptBudgetConfig(BaseModel):
+    context_tokens: int = Field(
+        default=4096, description="Context window of the chat model, in tokens."
+    )
+    answer_tokens: int = Field(
+        default=768,
+        description="Tokens of the context window kept free for the answer.",
+    )
+    history_share: float = Field(
+        default=0.2,
+        description="Share of the remaining budget for conversation history.",
+    )
+    web_share: float = Field(
+        default=0.4, description="Share of the remaining budget for web search results."
+    )
+    rag_share: float = Field(
+        default=0.4, description="Share of the remaining budget for document results."
+    )
+    chars_per_token: float = Field(
+        default=4.0,
+        description="Calibration of the token estimator (characters per token).",
+    )
+    max_overlap: float = Field(
+        default=0.8,
+        description="Chunks sharing more than this fraction of their word trigrams "
+        "with chunks already in the prompt are left out.",
+    )
+
+
+# Token budget of the prompts built by the chat endpoint
+PROMPT_BUDGET_CONFIG = PromptBudgetConfig(
+    context_tokens=int(os.environ.get("PROMPT_CONTEXT_TOKENS", 4096)),
+    answer_tokens=int(os.environ.get("PROMPT_ANSWER_TOKENS", 768)),
+)
+
+
+class ConversationConfig(BaseModel):
+    window_messages: int = Field(
+        default=12,
+        description="Messages of a session kept verbatim; beyond that, the older "
+        "half is folded into the summary.",
+    )
+    summary_max_sentences: int = Field(
+        default=8,
+        description="Sentences kept in the rolling summary of older messages.",
+    )
+    idle_ttl_s: float = Field(
+        default=3600.0, description="Sessions idle for longer are evicted from memory."
+    )
+    max_sessions: int = Field(
+        default=1000,
+        description="Sessions kept in memory, least recently used evicted first.",
+    )
+    db_path: Optional[str] = Field(
+        default=None,
+        description="SQLite file persisting sessions (memory only if unset).",
+    )
+
+
+# Per-session conversation memory of the chat endpoint
+CONVERSATION_CONFIG = ConversationConfig(
+    window_messages=int(os.environ.get("CONVERSATION_WINDOW_MESSAGES", 12)),
+    idle_ttl_s=float(os.environ.get("CONVERSATION_IDLE_TTL_S", 3600.0)),
+    max_sessions=int(os.environ.get("CONVERSATION_MAX_SESSIONS", 1000)),
+    db_path=os.environ.get("CONVERSATION_DB_PATH") or None,
 )
 
 # Define available embedding models
@@ -60,7 +315,87 @@ AVAILABLE_EMBEDDING_MODELS = [
 # You can set these via environment variables or just hardcode them.
 OLLAMA_HOST = os.environ.get("OLLAMA_URL", "http://localhost:11434")
 OLLAMA_MODELS_URL = f"{OLLAMA_HOST}/api/tags"
-OLLAMA_CHAT_URL = f"{OLLAMA_HOST}/api/generate"
+OLLAMA_CHAT_URL = f"{OLLAMA_HOST}/api/chat"
+OLLAMA_GENERATE_URL = f"{OLLAMA_HOST}/api/generate"
+
+
+class OllamaClientConfig(BaseModel):
+    connect_timeout_s: float = Field(
+        default=5.0, description="Timeout for opening a connection to Ollama."
+    )
+    read_timeout_s: float = Field(
+        default=120.0,
+        description="Maximum wait between streamed bytes (covers model load time).",
+    )
+    max_connections: int = Field(
+        default=100, description="Maximum number of open connections to Ollama."
+    )
+    max_keepalive_connections: int = Field(
+        default=50, description="Idle connections kept alive for reuse."
+    )
+    keepalive_expiry_s: float = Field(
+        default=30.0, description="How long an idle connection is kept in the pool."
+    )
+    models_ttl_s: float = Field(
+        default=60.0,
+        description="How long the cached list of Ollama models stays fresh.",
+    )
+    keep_alive: str = Field(
+        default="30m",
+        description="How long Ollama keeps a model loaded after a request.",
+    )
+    num_ctx: Optional[int] = Field(
+        default=None,
+        description="Context window requested from Ollama (model default if unset).",
+    )
+
+
+# Configuration for the pooled Ollama HTTP client
+OLLAMA_CLIENT_CONFIG = OllamaClientConfig(
+    connect_timeout_s=float(os.environ.get("OLLAMA_CONNECT_TIMEOUT_S", 5.0)),
+    read_timeout_s=float(os.environ.get("OLLAMA_READ_TIMEOUT_S", 120.0)),
+    max_connections=int(os.environ.get("OLLAMA_MAX_CONNECTIONS", 100)),
+    models_ttl_s=float(os.environ.get("OLLAMA_MODELS_TTL_S", 60.0)),
+    keep_alive=os.environ.get("OLLAMA_KEEP_ALIVE", "30m"),
+    # Same window as the prompt budget, so prompts are never truncated upstream
+    num_ctx=int(os.environ.get("OLLAMA_NUM_CTX", PROMPT_BUDGET_CONFIG.context_tokens)),
+)
+
+
+class OllamaSchedulerConfig(BaseModel):
+    max_concurrent_per_model: int = Field(
+        default=2, description="Generations sent to Ollama at once for each model."
+    )
+    model_limits: Dict[str, int] = Field(
+        default_factory=dict,
+        description="Per-model overrides of max_concurrent_per_model.",
+    )
+    max_queued: int = Field(
+        default=32,
+        description="Requests waiting for a slot; more are rejected with 429.",
+    )
+    max_wait_s: float = Field(
+        default=30.0, description="Longest wait for a slot before giving up with 503."
+    )
+
+
+def _parse_model_limits(value: str) -> Dict[str, int]:
+    """Parses "model=limit,model=limit" into a dict."""
+    limits = {}
+    for item in value.split(","):
+        if "=" in item:
+            model, limit = item.rsplit("=", 1)
+            limits[model.strip()] = int(limit)
+    return limits
+
+
+# Admission control in front of Ollama
+OLLAMA_SCHEDULER_CONFIG = OllamaSchedulerConfig(
+    max_concurrent_per_model=int(os.environ.get("OLLAMA_MAX_CONCURRENT_PER_MODEL", 2)),
+    model_limits=_parse_model_limits(os.environ.get("OLLAMA_MODEL_CONCURRENCY", "")),
+    max_queued=int(os.environ.get("OLLAMA_MAX_QUEUED", 32)),
+    max_wait_s=float(os.environ.get("OLLAMA_MAX_WAIT_S", 30.0)),
+)
 
 
 # config/config.py
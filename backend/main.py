@@ -1,12 +1,59 @@
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from routes.chat import router as chat_router
 from routes.chromadb import router as chromadb_router  # Ajout de ChromaDB
 from routes.file_manager import router as file_manager_router
+from routes.metrics import router as metrics_router
 from routes.text_extraction import router as text_extraction_router
 from routes.websearch import router as websearch_router
+from services.conversation import get_conversation_store
+from services.ingestion import IngestionJobQueue
+from services.ollama import get_model_catalog, get_ollama_client, get_ollama_scheduler
+from services.ragutils.chroma_service import close_chroma_client, get_chroma_collection
+from services.ragutils.embedder import get_embedding_service
+from services.ragutils.manifest import get_document_manifest
+from services.ragutils.web_search import close_http_client
+from workflow.extraction_indexing import ExtractionIndexingWorkflow
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Creates the app-scoped services once at startup and shares them with every router.
+    """
+    # Load each embedding model exactly once for the whole process
+    app.state.embedder = get_embedding_service()
+    # One pooled connection set to Ollama, shared by every chat
+    app.state.ollama = get_ollama_client()
+    # Model list cached with a TTL instead of hitting /api/tags on every message
+    app.state.model_catalog = get_model_catalog()
+    # Per-model concurrency caps and a bounded wait queue in front of Ollama
+    app.state.ollama_scheduler = get_ollama_scheduler()
+    # Bounded per-session chat memory
+    app.state.conversations = get_conversation_store()
+    # Open the Chroma store and load the collection before the first query
+    collection = get_chroma_collection()
+    # One-time migration for collections indexed before the manifest existed
+    get_document_manifest().backfill(collection)
+    # File indexing, run inline or by the background ingestion workers
+    app.state.extraction_workflow = ExtractionIndexingWorkflow(
+        embedder=app.state.embedder
+    )
+    app.state.ingestion = IngestionJobQueue(app.state.extraction_workflow.index_upload)
+    await app.state.ingestion.start()
+    yield
+    await app.state.ingestion.stop()
+    app.state.extraction_workflow.extractor.shutdown()
+    await app.state.embedder.aclose()
+    await app.state.ollama.aclose()
+    app.state.conversations.close()
+    await close_http_client()
+    close_chroma_client()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Register document management API
 app.include_router(file_manager_router)
@@ -14,6 +61,7 @@ app.include_router(websearch_router)
 app.include_router(text_extraction_router)
 app.include_router(chat_router)
 app.include_router(chromadb_router)
+app.include_router(metrics_router)
 
 
 @app.get("/")
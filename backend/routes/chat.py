@@ -1,44 +1,192 @@
-from config.config import PersonalityConfig
-from fastapi import APIRouter, HTTPException
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Dict, List
+
+from config.config import CHAT_RETRIEVAL_CONFIG, PersonalityConfig
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from services.ollama import async_chat_with_model, fetch_models
+from routes.dependencies import (
+    get_conversations,
+    get_embedder,
+    get_model_catalog,
+    get_ollama,
+    get_ollama_scheduler,
+)
+from services.conversation import ConversationStore
+from services.ollama import (
+    BATCH,
+    INTERACTIVE,
+    ModelCatalog,
+    OllamaClient,
+    OllamaOverloaded,
+    OllamaScheduler,
+)
+from services.prompt_builder import get_prompt_builder
 from services.ragutils.chroma_service import query_by_embedding
 from services.ragutils.embedder import EmbeddingService
 from services.ragutils.web_search import DuckDuckGoSearchService
+from starlette.background import BackgroundTask
+from starlette.requests import ClientDisconnect
 from workflow.web_search_indexing import WebSearchIndexingWorkflow
 
-router = APIRouter(prefix="/chat", tags=["Chatbot"])
-
-embedder = EmbeddingService()
+logger = logging.getLogger(__name__)
 
-# In-memory conversation storage
-conversation_history = []
+router = APIRouter(prefix="/chat", tags=["Chatbot"])
 
 
 class ChatRequest(BaseModel):
     model_name: str
     user_message: str
+    session_id: str = "default"
     personality: str = "Universal"
     use_web_search: bool = False
     use_rag: bool = False
     stream: bool = False
 
 
+async def _timed(timings: Dict[str, float], stage: str, coro: Awaitable[Any]) -> Any:
+    """Awaits `coro` and records how long it took, in milliseconds."""
+    start = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        timings[stage] = round((time.perf_counter() - start) * 1000, 1)
+
+
+async def _search_web(query: str, embedder: EmbeddingService) -> list:
+    """
+    Searches the web and ranks the scraped chunks against the query in memory.
+    Storing them in Chroma, if enabled, happens in the background.
+    """
+    search_service = DuckDuckGoSearchService(
+        max_results=CHAT_RETRIEVAL_CONFIG.web_max_results
+    )
+    web_search_workflow = WebSearchIndexingWorkflow(
+        search_service=search_service, embedder=embedder
+    )
+    ranked: list = await web_search_workflow.search_and_rank(
+        query,
+        top_k=CHAT_RETRIEVAL_CONFIG.web_top_k,
+        persist=CHAT_RETRIEVAL_CONFIG.persist_web_results,
+    )
+    return ranked
+
+
+async def _query_documents(query: str, embedder: EmbeddingService) -> dict:
+    """Embeds the query and searches ChromaDB off the event loop."""
+    query_embedding = await embedder.embed_query(query)
+    if not len(query_embedding):
+        return {}
+    return await asyncio.to_thread(
+        query_by_embedding,
+        query_embedding,
+        n_results=CHAT_RETRIEVAL_CONFIG.rag_n_results,
+    )
+
+
+async def retrieve_context(
+    request: ChatRequest, embedder: EmbeddingService, timings: Dict[str, float]
+) -> Dict[str, Any]:
+    """
+    Runs the enabled retrieval stages (web search, RAG) concurrently.
+
+    Stages still running after `CHAT_RETRIEVAL_CONFIG.deadline_s` are cancelled, and
+    failed stages are logged; either way the chat goes on with what did finish.
+
+    Returns:
+        dict: {"web": [...], "rag": {...}, "dropped": [stage names]}
+    """
+    stages: Dict[str, Awaitable[Any]] = {}
+    if request.use_web_search:
+        stages["web_search"] = _search_web(request.user_message, embedder)
+    if request.use_rag:
+        stages["rag"] = _query_documents(request.user_message, embedder)
+
+    results: Dict[str, Any] = {"web": [], "rag": {}, "dropped": []}
+    if not stages:
+        return results
+
+    start = time.perf_counter()
+    tasks = {
+        name: asyncio.create_task(_timed(timings, name, coro))
+        for name, coro in stages.items()
+    }
+    _, pending = await asyncio.wait(
+        tasks.values(), timeout=CHAT_RETRIEVAL_CONFIG.deadline_s
+    )
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    timings["retrieval"] = round((time.perf_counter() - start) * 1000, 1)
+
+    for name, task in tasks.items():
+        if task.cancelled():
+            logger.warning(
+                f"Dropped the {name} stage after {CHAT_RETRIEVAL_CONFIG.deadline_s}s."
+            )
+            results["dropped"].append(name)
+        elif task.exception() is not None:
+            logger.warning(f"The {name} stage failed: {task.exception()}")
+            results["dropped"].append(name)
+        else:
+            results["web" if name == "web_search" else "rag"] = task.result()
+    return results
+
+
+def _document_chunks(chroma_results: Any) -> List[Dict[str, Any]]:
+    """
+    Flattens a ChromaDB query result into chunks with "content", "metadata" and a
+    "score" that grows with similarity.
+    """
+    if not isinstance(chroma_results, dict) or not chroma_results.get("documents"):
+        return []
+    chunks = []
+    distances = chroma_results.get("distances") or []
+    for i, doc_list in enumerate(chroma_results["documents"]):
+        meta_list = chroma_results["metadatas"][i]
+        distance_list = distances[i] if i < len(distances) else []
+        for j, chunk_text in enumerate(doc_list):
+            distance = distance_list[j] if j < len(distance_list) else 0.0
+            chunks.append(
+                {
+                    "content": chunk_text,
+                    "metadata": meta_list[j] if j < len(meta_list) else {},
+                    "score": 1.0 / (1.0 + distance),
+                }
+            )
+    return chunks
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Formats stage timings as a `Server-Timing` header value."""
+    return ", ".join(f"{stage};dur={ms}" for stage, ms in timings.items())
+
+
 @router.get("/available_models/")
-async def get_available_models():
+async def get_available_models(catalog: ModelCatalog = Depends(get_model_catalog)):
     """
-    Fetches available models from Ollama.
+    Returns the models available in Ollama (cached, see ModelCatalog).
     """
     try:
-        models = await fetch_models()
+        models = await catalog.get_models()
         return {"models": models}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/message/")
-async def send_message(request: ChatRequest):
+async def send_message(
+    request: ChatRequest,
+    http_request: Request,
+    response: Response,
+    embedder: EmbeddingService = Depends(get_embedder),
+    ollama: OllamaClient = Depends(get_ollama),
+    catalog: ModelCatalog = Depends(get_model_catalog),
+    conversations: ConversationStore = Depends(get_conversations),
+    scheduler: OllamaScheduler = Depends(get_ollama_scheduler),
+):
     """
     Main chat endpoint. Handles AI interaction + optional Web Search + optional RAG (ChromaDB).
 
@@ -48,17 +196,21 @@ async def send_message(request: ChatRequest):
           "sources": {
             "web": [...],    # List of web references (title, url)
             "docs": [...]    # List of local doc references (filename, chunk_index, etc.)
-          }
+          },
+          "timings": {...},  # Per-stage durations in ms (also sent as Server-Timing)
+          "prompt_tokens": {...}  # Estimated prompt size per section
         }
     """
+    request_start = time.perf_counter()
+    timings: Dict[str, float] = {}
 
     model_name = request.model_name
     user_message = request.user_message
     personality = request.personality
 
     # 1️⃣ Verify model existence
-    models = await fetch_models()
-    if model_name not in models:
+    if not await catalog.has_model(model_name):
+        models = await catalog.get_models()
         raise HTTPException(
             status_code=400,
             detail=f"Model '{model_name}' not found. Available models: {models}",
@@ -71,121 +223,185 @@ async def send_message(request: ChatRequest):
     sources_web = []
     sources_docs = []
 
-    # 3️⃣ Optional: perform a web search
-    web_results = []
-    if request.use_web_search:
-        # The web search workflow uses your DuckDuckGoSearchService + indexing
-        search_service = DuckDuckGoSearchService(max_results=3)
-        web_search_workflow = WebSearchIndexingWorkflow(search_service=search_service)
-        # This step does the actual web search + chunking + embedding + storing in Chroma
-        web_results = await web_search_workflow.search_and_index(user_message)
-
-        # We can store some references from the web
-        for doc in web_results:
-            # doc["metadata"] should contain 'title' and 'url'
-            meta = doc.get("metadata", {})
-            sources_web.append(
-                {
-                    "title": meta.get("title", "Untitled"),
-                    "url": meta.get("url", "No URL"),
-                }
-            )
+    # 3️⃣ + 4️⃣ Optional web search and RAG from Chroma, run concurrently
+    retrieved = await retrieve_context(request, embedder, timings)
 
-    # 4️⃣ Optional: RAG from Chroma
-    chroma_results = {}
-    if request.use_rag:
-        query_embedding = await embedder.get_embeddings([user_message])
-        if query_embedding:
-            chroma_results = query_by_embedding(query_embedding[0], n_results=5)
-
-    # 5️⃣ Build the text context that the LLM sees
-    context = ""
-
-    # 5a) Append web search text
-    # Note: web_results come from the indexing workflow, so each doc might have "chunks"
-    if web_results:
-        context += "\n\n🔍 **Web Search Results:**\n"
-        for doc in web_results:
-            # Each doc might have a list of chunk objects: doc["chunks"]
-            # We'll just grab the first chunk or all of them, depending on your preference
-            if "chunks" in doc and doc["chunks"]:
-                # e.g. take the first chunk text
-                snippet_text = doc["chunks"][0].get("content", "")
-                context += f"{snippet_text}\n"
-
-    # 5b) Append ChromaDB doc text
-    if isinstance(chroma_results, dict) and chroma_results.get("documents"):
-        documents = chroma_results["documents"]  # list of lists of chunk strings
-        metadatas = chroma_results["metadatas"]  # parallel list of lists of metadata
-        context += "\n\n📂 **Document Results:**\n"
-
-        for i, doc_list in enumerate(documents):
-            for j, chunk_text in enumerate(doc_list):
-                context += chunk_text + "\n"
-                # store references for final JSON
-                meta_list = metadatas[i]
-                chunk_meta = meta_list[j] if j < len(meta_list) else {}
-                sources_docs.append(
-                    {
-                        "filename": chunk_meta.get("filename", "unknown_file"),
-                        "chunk_index": chunk_meta.get("chunk_index", None),
-                        "id": chunk_meta.get("id", ""),
-                    }
-                )
+    # 5️⃣ Build the prompt the LLM sees within the token budget: the session's
+    # recent messages (older ones summarized), web chunks (most similar to the
+    # message first) and document chunks, without near-duplicates
+    build_start = time.perf_counter()
+    summary, history = await asyncio.to_thread(
+        conversations.history, request.session_id
+    )
+    built = get_prompt_builder().build(
+        system_prompt,
+        user_message,
+        web_chunks=retrieved["web"],
+        rag_chunks=_document_chunks(retrieved["rag"]),
+        history=history,
+        summary=summary,
+    )
+    messages = built["messages"]
+    if built["history_messages"] < len(history):
+        # Older messages no longer fit: summarize them now rather than sliding the
+        # window every turn, which would change the prompt's prefix each time
+        await asyncio.to_thread(
+            conversations.compact,
+            request.session_id,
+            built["history_messages"] // 2,
+        )
+    timings["prompt_build"] = round((time.perf_counter() - build_start) * 1000, 1)
 
-    # 6️⃣ Add user message to conversation history (optional memory)
-    conversation_history.append({"role": "user", "content": user_message})
+    # References for the final JSON, only for what the model actually sees
+    for chunk in built["web"]:
+        # chunk["metadata"] should contain 'title' and 'url' (one source per page)
+        meta = chunk.get("metadata", {})
+        source = {
+            "title": meta.get("title", "Untitled"),
+            "url": meta.get("url", "No URL"),
+        }
+        if source not in sources_web:
+            sources_web.append(source)
+    for chunk in built["rag"]:
+        chunk_meta = chunk["metadata"]
+        sources_docs.append(
+            {
+                "filename": chunk_meta.get("filename", "unknown_file"),
+                "chunk_index": chunk_meta.get("chunk_index", None),
+                "id": chunk_meta.get("id", ""),
+            }
+        )
 
-    # 7️⃣ Construct final prompt for the model
-    final_prompt = (
-        f"{system_prompt}\n\n### Context:\n{context}\n\n"
-        f"👤 User: {user_message}\n"
-        f"🤖 AI: "
-    )
+    # 6️⃣ Wait for a generation slot; streamed answers are interactive and go
+    # ahead of blocking ones. Overload is answered right away instead of timing out.
+    try:
+        lease = await _timed(
+            timings,
+            "queue",
+            scheduler.acquire(model_name, INTERACTIVE if request.stream else BATCH),
+        )
+    except OllamaOverloaded as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after_s)},
+        )
 
-    # 8️⃣ Streaming mode or non-streaming?
+    # 7️⃣ Streaming mode or non-streaming? The exchange is added to the session's
+    # history once the answer is complete; failed or abandoned ones are not kept.
     if request.stream:
-        # SSE streaming mode
+        # SSE streaming mode; generation stops as soon as the client goes away
         async def event_generator():
+            response_chunks = []
+            upstream = ollama.chat_stream(model_name, messages)
             try:
-                async for chunk in async_chat_with_model(model_name, final_prompt):
+                async for chunk in upstream:
+                    # Starlette cancels this generator on disconnect; checking
+                    # between chunks also covers servers where it does not
+                    if await http_request.is_disconnected():
+                        raise ClientDisconnect()
+                    response_chunks.append(chunk)
                     yield f"data: {chunk}\n\n"
+            except (ClientDisconnect, asyncio.CancelledError) as e:
+                lease.cancel()
+                logger.info(
+                    f"Client left session '{request.session_id}'; stopped the "
+                    f"generation after {len(response_chunks)} chunks."
+                )
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                return
             except Exception as e:
                 yield f"data: [ERROR] {str(e)}\n\n"
+                return
+            finally:
+                lease.release()
+                # Closing the upstream aborts the HTTP stream so that Ollama stops
+                # generating. Shielded: once cancelled, every await here would be
+                # cancelled too
+                await asyncio.shield(upstream.aclose())
+            await asyncio.to_thread(
+                conversations.append_exchange,
+                request.session_id,
+                user_message,
+                "".join(response_chunks),
+            )
 
-        return StreamingResponse(event_generator(), media_type="text/event-stream")
+        timings["total_before_stream"] = round(
+            (time.perf_counter() - request_start) * 1000, 1
+        )
+        # The background task frees the slot if the generator never ran to the end
+        return StreamingResponse(
+            event_generator(),
+            media_type="text/event-stream",
+            headers={"Server-Timing": server_timing(timings)},
+            background=BackgroundTask(lease.release),
+        )
     else:
         # Non-streaming mode: we collect the chunks into one final string
         response_chunks = []
+        stats: Dict[str, Any] = {}
+        generation_start = time.perf_counter()
         try:
-            async for chunk in async_chat_with_model(model_name, final_prompt):
+            async for chunk in ollama.chat_stream(model_name, messages, stats):
                 response_chunks.append(chunk)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"AI model error: {str(e)}")
+        finally:
+            lease.release()
+        timings["generation"] = round(
+            (time.perf_counter() - generation_start) * 1000, 1
+        )
+        timings["total"] = round((time.perf_counter() - request_start) * 1000, 1)
+        # Ollama's own durations are in nanoseconds
+        for key in ("load_duration", "prompt_eval_duration"):
+            if key in stats:
+                timings[f"ollama_{key[:-9]}"] = round(stats[key] / 1e6, 1)
 
         ai_response = "".join(response_chunks)
-        # Append the AI's reply to the conversation history
-        conversation_history.append({"role": "ai", "content": ai_response})
+        # Add the exchange to the session's conversation history
+        await asyncio.to_thread(
+            conversations.append_exchange,
+            request.session_id,
+            user_message,
+            ai_response,
+        )
 
         # Return both the message + the references as requested
+        response.headers["Server-Timing"] = server_timing(timings)
         return {
             "message": ai_response,
             "sources": {"web": sources_web, "docs": sources_docs},
+            "timings": timings,
+            "dropped_stages": retrieved["dropped"],
+            "prompt_tokens": built["tokens"],
+            "usage": {
+                key: stats[key]
+                for key in ("prompt_eval_count", "eval_count")
+                if key in stats
+            },
         }
 
 
 @router.get("/history/")
-def get_chat_history():
+def get_chat_history(
+    session_id: str = "default",
+    conversations: ConversationStore = Depends(get_conversations),
+):
     """
-    Retrieves the full conversation history.
+    Retrieves a session's recent messages and the summary of the older ones.
     """
-    return {"conversation": conversation_history}
+    summary, history = conversations.history(session_id)
+    return {"session_id": session_id, "conversation": history, "summary": summary}
 
 
 @router.delete("/clear_history/")
-def clear_chat_history():
+def clear_chat_history(
+    session_id: str = "default",
+    conversations: ConversationStore = Depends(get_conversations),
+):
     """
-    Clears the entire conversation history.
+    Clears a session's conversation history.
     """
-    conversation_history.clear()
+    conversations.clear(session_id)
     return {"message": "Chat history cleared successfully."}
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
-from services.ragutils.chroma_service import get_chroma_collection, query_by_embedding
-from services.ragutils.embedder import EmbeddingService  # Correct import
+from routes.dependencies import get_embedder
+from services.ragutils.chroma_service import (
+    get_chroma_collection,
+    query_by_embedding,
+    reset_chroma_collection,
+)
+from services.ragutils.embedder import EmbeddingService
+from services.ragutils.manifest import get_document_manifest, release_chunks
 
 router = APIRouter(prefix="/chromadb", tags=["ChromaDB"])
-embedder = EmbeddingService()  # Ensure correct initialization
 
 
 class SearchRequest(BaseModel):
@@ -12,28 +17,32 @@ class SearchRequest(BaseModel):
 
 
 @router.get("/list/")
-async def list_extracted_documents():
+async def list_extracted_documents(
+    offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000)
+):
     """
-    Retrieves a list of all indexed documents from ChromaDB.
+    Retrieves a page of indexed documents from the manifest
+    (filename, chunk count, indexed-at and content hash).
     """
     try:
-        collection = get_chroma_collection()
-        results = collection.get(include=["documents", "metadatas"])
-
-        # Extract document names from metadata
-        document_names = set()
-        if "metadatas" in results and results["metadatas"]:
-            for meta in results["metadatas"]:
-                if "filename" in meta:
-                    document_names.add(meta["filename"])
-
-        return {"extracted_files": list(document_names)}
+        total, documents = get_document_manifest().list_documents(
+            offset=offset, limit=limit
+        )
+        return {
+            "extracted_files": [doc["filename"] for doc in documents],
+            "documents": documents,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/query/")
-async def search_chromadb(request: SearchRequest):
+async def search_chromadb(
+    request: SearchRequest, embedder: EmbeddingService = Depends(get_embedder)
+):
     """
     Searches in ChromaDB using an embedding of the user-provided query.
 
@@ -45,19 +54,19 @@ async def search_chromadb(request: SearchRequest):
     """
     try:
         # Ensure correct function call for embedding generation
-        query_embedding = await embedder.get_embeddings([request.query])  # Fixed method
+        query_embedding = await embedder.embed_query(request.query)
 
-        if not query_embedding:
+        if not len(query_embedding):
             raise HTTPException(
                 status_code=500, detail="Failed to generate query embedding."
             )
 
-        results = query_by_embedding(query_embedding[0], n_results=5)  # Query correctly
+        results = query_by_embedding(query_embedding, n_results=5)
         return results
     except AttributeError:
         raise HTTPException(
             status_code=500,
-            detail="EmbeddingService is missing `get_embeddings`. Ensure it's correctly implemented.",
+            detail="EmbeddingService is missing `embed_query`. Ensure it's correctly implemented.",
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -67,6 +76,7 @@ async def search_chromadb(request: SearchRequest):
 async def delete_document_from_chromadb(filename: str):
     """
     Deletes all indexed chunks for a specific document from ChromaDB.
+    Chunks shared with other files of identical content are kept for them.
 
     Args:
         filename (str): The document filename.
@@ -76,37 +86,29 @@ async def delete_document_from_chromadb(filename: str):
     """
     try:
         collection = get_chroma_collection()
-
-        # ✅ FIX: First, retrieve all metadata (WITHOUT `ids` in `include`)
-        results = collection.get(include=["metadatas"])
-
-        if "metadatas" not in results or not results["metadatas"]:
-            raise HTTPException(
-                status_code=404, detail="No documents found in ChromaDB."
-            )
-
-        # Extract all IDs associated with the filename
-        chunk_ids = []
-        for i, meta in enumerate(results["metadatas"]):
-            if meta.get("filename") == filename:
-                chunk_ids.append(
-                    results["ids"][i]
-                )  # Fetch correct ID from results["ids"]
-
-        if not chunk_ids:
+        manifest = get_document_manifest()
+
+        document = manifest.get_document(filename)
+        if document:
+            manifest.remove_document(filename)
+            release_chunks(document["chunk_ids"], manifest=manifest)
+            return {"message": f"Deleted all indexed chunks for '{filename}'."}
+
+        # Not in the manifest: only this file's chunks are looked up, using a
+        # server-side filter
+        if not collection.get(where={"filename": filename}, limit=1, include=[]).get(
+            "ids"
+        ):
             raise HTTPException(
                 status_code=404, detail=f"No indexed chunks found for '{filename}'."
             )
 
-        # Delete the identified chunks
-        collection.delete(ids=chunk_ids)
+        collection.delete(where={"filename": filename})
 
         return {"message": f"Deleted all indexed chunks for '{filename}'."}
 
-    except KeyError:
-        raise HTTPException(
-            status_code=500, detail="Unexpected response format from ChromaDB."
-        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -114,66 +116,72 @@ async def delete_document_from_chromadb(filename: str):
 @router.delete("/clear/")
 async def clear_chromadb():
     """
-    Deletes all stored documents from ChromaDB.
+    Deletes all stored documents from ChromaDB by dropping and recreating the collection.
     """
     try:
-        collection = get_chroma_collection()
-
-        # Fetch all indexed metadata first (Corrected `include` parameter)
-        results = collection.get(include=["metadatas"])
-
-        if "metadatas" not in results or not results["metadatas"]:
+        if not get_chroma_collection().count():
             raise HTTPException(
                 status_code=404, detail="No documents found in ChromaDB."
             )
 
-        # Extract all document IDs
-        all_ids = []
-        for meta in results["metadatas"]:
-            if "id" in meta:  # Ensure metadata has an "id" key
-                all_ids.append(meta["id"])
-
-        if not all_ids:
-            raise HTTPException(
-                status_code=404, detail="No document IDs found in ChromaDB."
-            )
-
-        # Delete all documents
-        collection.delete(ids=all_ids)
+        reset_chroma_collection()
+        get_document_manifest().clear()
 
         return {"message": "ChromaDB cleared successfully."}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/get/{filename}")
-async def get_extracted_text(filename: str):
+async def get_extracted_text(
+    filename: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+):
     """
-    Retrieves all text chunks for a given filename from ChromaDB.
+    Retrieves a page of text chunks for a given filename from ChromaDB, in chunk order.
     """
     try:
         collection = get_chroma_collection()
-        results = collection.get(include=["documents", "metadatas"])
-
-        if "metadatas" not in results or "documents" not in results:
-            raise HTTPException(
-                status_code=404, detail="No documents found in ChromaDB."
+        document = get_document_manifest().get_document(filename)
+
+        if document:
+            total = document["chunk_count"]
+            page_ids = document["chunk_ids"][offset : offset + limit]
+            extracted_chunks = []
+            # Past the last chunk: Chroma rejects an empty id list
+            if page_ids:
+                results = collection.get(ids=page_ids, include=["documents"])
+                by_id = dict(zip(results["ids"], results["documents"]))
+                extracted_chunks = [by_id[i] for i in page_ids if i in by_id]
+        else:
+            # Not in the manifest (e.g. indexed by an older version): filter in Chroma
+            results = collection.get(
+                where={"filename": filename},
+                include=["documents"],
+                limit=limit,
+                offset=offset,
             )
+            extracted_chunks = results["documents"]
+            total = None
 
-        # Filter documents by filename
-        extracted_chunks = [
-            results["documents"][i]
-            for i, metadata in enumerate(results["metadatas"])
-            if metadata.get("filename") == filename
-        ]
-
-        if not extracted_chunks:
+        if not extracted_chunks and offset == 0:
             raise HTTPException(
                 status_code=404, detail=f"File '{filename}' not found in ChromaDB."
             )
 
-        return {"filename": filename, "chunks": extracted_chunks}
+        return {
+            "filename": filename,
+            "chunks": extracted_chunks,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+        }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,59 @@
+"""
+Shared FastAPI dependencies exposing the app-scoped services created in the lifespan.
+"""
+
+from fastapi import Request
+from services.conversation import ConversationStore
+from services.ingestion import IngestionJobQueue
+from services.ollama import ModelCatalog, OllamaClient, OllamaScheduler
+from services.ragutils.embedder import EmbeddingService
+from workflow.extraction_indexing import ExtractionIndexingWorkflow
+
+
+def get_embedder(request: Request) -> EmbeddingService:
+    """
+    Returns the process-wide EmbeddingService stored on the application state.
+    """
+    return request.app.state.embedder
+
+
+def get_ollama(request: Request) -> OllamaClient:
+    """
+    Returns the pooled OllamaClient stored on the application state.
+    """
+    return request.app.state.ollama
+
+
+def get_model_catalog(request: Request) -> ModelCatalog:
+    """
+    Returns the cached Ollama model catalog stored on the application state.
+    """
+    return request.app.state.model_catalog
+
+
+def get_ollama_scheduler(request: Request) -> OllamaScheduler:
+    """
+    Returns the Ollama admission scheduler stored on the application state.
+    """
+    return request.app.state.ollama_scheduler
+
+
+def get_extraction_workflow(request: Request) -> ExtractionIndexingWorkflow:
+    """
+    Returns the shared ExtractionIndexingWorkflow stored on the application state.
+    """
+    return request.app.state.extraction_workflow
+
+
+def get_ingestion_queue(request: Request) -> IngestionJobQueue:
+    """
+    Returns the background ingestion job queue stored on the application state.
+    """
+    return request.app.state.ingestion
+
+
+def get_conversations(request: Request) -> ConversationStore:
+    """
+    Returns the per-session conversation store stored on the application state.
+    """
+    return request.app.state.conversations
@@ -2,14 +2,23 @@
 Routes for document management.
 Now prevents duplicate file uploads, limits simultaneous uploads,
 and ensures filenames are sanitized before saving.
+Uploads are parsed and written to disk while they are received, off the event
+loop, and an upload identical to an existing one is stored as a hard link to it.
 """
 
+import asyncio
+import hashlib
 import os
 import re
-from typing import List
+import tempfile
+import uuid
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable, List, Optional, Tuple
 
-from config.config import TEXT_EXTRACTOR_CONFIG
-from fastapi import APIRouter, File, HTTPException, UploadFile
+from config.config import TEXT_EXTRACTOR_CONFIG, UPLOAD_CONFIG
+from fastapi import APIRouter, HTTPException, Request
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from services.ragutils.manifest import get_document_manifest
 
 router = APIRouter(prefix="/docs", tags=["Documents"])
 
@@ -19,6 +28,17 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 # Limit the number of files that can be uploaded per request
 MAX_FILES_PER_UPLOAD = 5
 
+# Uploads are written under this prefix, then linked into place once complete
+TEMP_UPLOAD_PREFIX = ".upload-"
+
+# Permission bits masked out of new files (read once; os.umask has no getter)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds UPLOAD_CONFIG.max_file_bytes."""
+
 
 def sanitize_filename(filename: str) -> str:
     """
@@ -34,40 +54,326 @@ def sanitize_filename(filename: str) -> str:
     return filename
 
 
-@router.post("/upload/")
-async def upload_documents(files: List[UploadFile] = File(...)):
+class InvalidUpload(Exception):
+    """Raised for a malformed upload request or one with too many files."""
+
+
+class _UploadWriter:
+    """
+    One uploaded file being written to a temporary file next to its final location,
+    with its size and SHA-256 computed on the way.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.file_path = os.path.join(UPLOAD_DIR, filename)
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.pending: List[bytes] = []
+        self.pending_bytes = 0
+        fd, self.temp_path = tempfile.mkstemp(dir=UPLOAD_DIR, prefix=TEMP_UPLOAD_PREFIX)
+        # mkstemp creates the file as 0600; stored uploads follow the umask
+        os.fchmod(fd, 0o666 & ~_UMASK)
+        self.file: Optional[BinaryIO] = os.fdopen(fd, "wb")
+
+    def add(self, data: bytes) -> None:
+        """Buffers a block of the file, enforcing the size limit."""
+        self.size += len(data)
+        if self.size > UPLOAD_CONFIG.max_file_bytes:
+            raise UploadTooLarge(
+                f"'{self.filename}' exceeds the {UPLOAD_CONFIG.max_file_bytes} "
+                "byte limit."
+            )
+        self.digest.update(data)
+        self.pending.append(data)
+        self.pending_bytes += len(data)
+
+    def flush(self) -> None:
+        """Writes the buffered blocks (blocking)."""
+        assert self.file is not None  # nosec B101
+        self.file.write(b"".join(self.pending))
+        self.pending.clear()
+        self.pending_bytes = 0
+
+    def publish(self) -> None:
+        """
+        Moves the complete file into place (blocking). It is hard-linked rather
+        than renamed, so an upload of the same name saved meanwhile is never
+        overwritten.
+
+        Raises:
+            FileExistsError: If a file with this name exists.
+        """
+        self.flush()
+        self.close()
+        try:
+            os.link(self.temp_path, self.file_path)
+        except FileExistsError:
+            raise FileExistsError(self.filename)
+        finally:
+            os.remove(self.temp_path)
+
+    def close(self) -> None:
+        """Closes the temporary file."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def discard(self) -> None:
+        """Closes and removes the temporary file (blocking)."""
+        self.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+class MultipartUploadParser:
+    """
+    Parses a multipart/form-data body while it is received and writes the parts of
+    the `files` field straight to the upload folder, so the size limit applies
+    mid-stream instead of after the whole request has been spooled.
+    """
+
+    def __init__(self, content_type: str, field_name: str = "files") -> None:
+        """
+        Args:
+            content_type (str): The request's Content-Type header.
+            field_name (str): Form field holding the files; other parts are ignored.
+
+        Raises:
+            InvalidUpload: If the body is not multipart/form-data.
+        """
+        mime, options = parse_options_header(content_type)
+        if mime != b"multipart/form-data" or b"boundary" not in options:
+            raise InvalidUpload("Expected a multipart/form-data body.")
+        self.field_name = field_name
+        self.files = 0
+        self._headers: List[Tuple[bytes, bytes]] = []
+        self._header_name = b""
+        self._header_value = b""
+        self._current: Optional[_UploadWriter] = None
+        self._completed: List[_UploadWriter] = []
+        self._parser = MultipartParser(
+            options[b"boundary"],
+            {
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+            },
+        )
+
+    async def parse(
+        self,
+        stream: AsyncIterator[bytes],
+        on_saved: Callable[[_UploadWriter], Awaitable[None]],
+    ) -> None:
+        """
+        Consumes the request body, saving each file as soon as its part ends.
+
+        Args:
+            stream (AsyncIterator[bytes]): The request body.
+            on_saved (Callable): Awaited with each file once it is in place.
+
+        Raises:
+            UploadTooLarge: If a file exceeds `UPLOAD_CONFIG.max_file_bytes`.
+            FileExistsError: If a file with the same name exists.
+            InvalidUpload: If the body is malformed or holds too many files.
+        """
+        try:
+            async for chunk in stream:
+                try:
+                    self._parser.write(chunk)
+                except MultipartParseError as e:
+                    raise InvalidUpload(f"Malformed multipart body: {e}")
+                current = self._current
+                if (
+                    current is not None
+                    and current.pending_bytes >= UPLOAD_CONFIG.copy_chunk_bytes
+                ):
+                    await asyncio.to_thread(current.flush)
+                while self._completed:
+                    writer = self._completed[0]
+                    await asyncio.to_thread(writer.publish)
+                    self._completed.pop(0)
+                    await on_saved(writer)
+            self._parser.finalize()
+            if self._current is not None:
+                raise InvalidUpload("The request body ended in the middle of a file.")
+        except BaseException:
+            unfinished = [*self._completed]
+            if self._current is not None:
+                unfinished.append(self._current)
+            for writer in unfinished:
+                await asyncio.to_thread(writer.discard)
+            raise
+
+    def _on_part_begin(self) -> None:
+        self._headers = []
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers.append((self._header_name.lower(), self._header_value))
+        self._header_name = self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        disposition = dict(self._headers).get(b"content-disposition", b"")
+        _, options = parse_options_header(disposition)
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        if name != self.field_name or b"filename" not in options:
+            return
+        self.files += 1
+        if self.files > MAX_FILES_PER_UPLOAD:
+            raise InvalidUpload(
+                f"You can only upload up to {MAX_FILES_PER_UPLOAD} files at once."
+            )
+        filename = sanitize_filename(options[b"filename"].decode("utf-8", "replace"))
+        # Fail before receiving the data; publishing checks again without a race
+        if os.path.exists(os.path.join(UPLOAD_DIR, filename)):
+            raise FileExistsError(filename)
+        self._current = _UploadWriter(filename)
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._current is not None:
+            self._current.add(data[start:end])
+
+    def _on_part_end(self) -> None:
+        if self._current is not None:
+            self._completed.append(self._current)
+            self._current = None
+
+
+def link_duplicate_upload(
+    file_path: str, content_hash: str, size: int
+) -> Optional[str]:
+    """
+    Replaces a freshly saved upload by a hard link to an earlier upload with the
+    same content, so identical files are stored only once.
+
+    Args:
+        file_path (str): Location of the new upload.
+        content_hash (str): SHA-256 of its bytes.
+        size (int): Its size in bytes.
+
+    Returns:
+        str | None: The name of the upload it is now linked to, if any.
     """
-    Upload multiple documents to the configured upload folder.
+    uploads: List[str] = get_document_manifest().find_uploads(content_hash)
+    for existing in uploads:
+        existing_path = os.path.join(UPLOAD_DIR, existing)
+        if existing_path == file_path:
+            continue
+        try:
+            if os.stat(existing_path).st_size != size:
+                continue
+        except FileNotFoundError:
+            continue
+
+        temp_path = os.path.join(UPLOAD_DIR, TEMP_UPLOAD_PREFIX + uuid.uuid4().hex)
+        try:
+            os.link(existing_path, temp_path)
+            os.replace(temp_path, file_path)
+        except OSError:
+            # E.g. a file system without hard links: keep the copy
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
+        return existing
+    return None
+
+
+@router.post(
+    "/upload/",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["files"],
+                        "properties": {
+                            "files": {
+                                "type": "array",
+                                "items": {"type": "string", "format": "binary"},
+                            }
+                        },
+                    }
+                }
+            },
+        }
+    },
+)
+async def upload_documents(request: Request):
+    """
+    Upload multiple documents (form field `files`) to the configured upload folder.
 
     1. Prevent duplicate file names
     2. Limit total files in a single request to MAX_FILES_PER_UPLOAD
     3. Sanitize filenames for safe usage
+    4. Stream each file to disk while it is received (max size enforced),
+       returning its SHA-256
+    5. Store files identical to an earlier upload as hard links to it
     """
-    if len(files) > MAX_FILES_PER_UPLOAD:
+    # Bodies that cannot fit are refused before reading them
+    content_length = request.headers.get("content-length", "")
+    max_body = MAX_FILES_PER_UPLOAD * (UPLOAD_CONFIG.max_file_bytes + 64 * 1024)
+    if content_length.isdigit() and int(content_length) > max_body:
         raise HTTPException(
-            status_code=400,
-            detail=f"You can only upload up to {MAX_FILES_PER_UPLOAD} files at once.",
+            status_code=413,
+            detail=f"Request exceeds the {max_body} byte upload limit.",
         )
 
     saved_files = []
-    for file in files:
-        sanitized_filename = sanitize_filename(file.filename)
-        file_path = os.path.join(UPLOAD_DIR, sanitized_filename)
-
-        # Check for duplicates
-        if os.path.exists(file_path):
-            raise HTTPException(
-                status_code=400,
-                detail=f"File '{sanitized_filename}' already exists. Duplicate upload not allowed.",
-            )
+    details = []
 
-        # Save the uploaded file
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
+    async def store(upload: _UploadWriter) -> None:
+        content_hash = upload.digest.hexdigest()
+        linked_to = await asyncio.to_thread(
+            link_duplicate_upload, upload.file_path, content_hash, upload.size
+        )
+        get_document_manifest().record_upload(
+            upload.filename, content_hash, upload.size
+        )
+        saved_files.append(upload.filename)
+        details.append(
+            {
+                "filename": upload.filename,
+                "size": upload.size,
+                "sha256": content_hash,
+                "linked_to": linked_to,
+            }
+        )
+
+    try:
+        parser = MultipartUploadParser(request.headers.get("content-type", ""))
+        await parser.parse(request.stream(), store)
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileExistsError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File '{e.args[0]}' already exists. "
+            "Duplicate upload not allowed.",
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
-        saved_files.append(sanitized_filename)
+    if not saved_files:
+        raise HTTPException(status_code=400, detail="No files were uploaded.")
 
-    return {"message": "Files uploaded successfully", "files": saved_files}
+    return {
+        "message": "Files uploaded successfully",
+        "files": saved_files,
+        "details": details,
+    }
 
 
 @router.get("/list/")
@@ -75,7 +381,11 @@ async def list_documents():
     """
     List all documents in the configured upload folder.
     """
-    files = os.listdir(UPLOAD_DIR)
+    files = [
+        name
+        for name in os.listdir(UPLOAD_DIR)
+        if not name.startswith(TEMP_UPLOAD_PREFIX)
+    ]
     return {"documents": files}
 
 
@@ -91,4 +401,5 @@ async def delete_document(filename: str):
         raise HTTPException(status_code=404, detail="File not found")
 
     os.remove(file_path)
+    get_document_manifest().remove_upload(sanitized_filename)
     return {"message": f"Deleted {sanitized_filename}"}
@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends
+from routes.dependencies import (
+    get_conversations,
+    get_embedder,
+    get_ingestion_queue,
+    get_ollama_scheduler,
+)
+from services.conversation import ConversationStore
+from services.ingestion import IngestionJobQueue
+from services.ollama import OllamaScheduler
+from services.ragutils.embedder import EmbeddingService
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get("/embedding_models/")
+async def get_embedding_model_metrics(
+    embedder: EmbeddingService = Depends(get_embedder),
+):
+    """
+    Reports the resident memory used by each loaded embedding model.
+    """
+    return embedder.registry.memory_report()
+
+
+@router.get("/embedding_cache/")
+async def get_embedding_cache_metrics(
+    embedder: EmbeddingService = Depends(get_embedder),
+):
+    """
+    Reports hit/miss counters and tier sizes of the embedding cache.
+    """
+    if embedder.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **embedder.cache.stats()}
+
+
+@router.get("/query_batcher/")
+async def get_query_batcher_metrics(
+    embedder: EmbeddingService = Depends(get_embedder),
+):
+    """
+    Reports the batch size distribution and queueing delay of query embeddings.
+    """
+    return embedder.query_batcher.stats()
+
+
+@router.get("/ingestion/")
+async def get_ingestion_metrics(
+    ingestion: IngestionJobQueue = Depends(get_ingestion_queue),
+):
+    """
+    Reports the ingestion queue depth, running jobs and job counts by status.
+    """
+    return ingestion.stats()
+
+
+@router.get("/conversations/")
+async def get_conversation_metrics(
+    conversations: ConversationStore = Depends(get_conversations),
+):
+    """
+    Reports the sessions and messages held in memory and eviction counters.
+    """
+    return conversations.stats()
+
+
+@router.get("/ollama_scheduler/")
+async def get_ollama_scheduler_metrics(
+    scheduler: OllamaScheduler = Depends(get_ollama_scheduler),
+):
+    """
+    Reports running and queued generations per model, admissions and wait times.
+    """
+    return scheduler.stats()
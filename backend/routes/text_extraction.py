@@ -3,24 +3,17 @@ import os
 from typing import Dict, List
 
 from config.config import TEXT_EXTRACTOR_CONFIG
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from services.ragutils.chroma_service import upsert_documents_with_embeddings
-from services.ragutils.embedder import EmbeddingService
-from services.ragutils.segment import CustomSegment
-from services.ragutils.text_extractor import TextExtractor
+from routes.dependencies import get_extraction_workflow, get_ingestion_queue
+from services.ingestion import IngestionJobQueue
+from workflow.extraction_indexing import ExtractionIndexingWorkflow
 
 router = APIRouter(prefix="/text-extraction", tags=["Text Extraction"])
 
 UPLOAD_DIR = TEXT_EXTRACTOR_CONFIG.temp_upload_dir
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-text_extractor = TextExtractor()
-embedder = EmbeddingService()
-segmenter = CustomSegment()
-
-SEM = asyncio.Semaphore(4)
-
 # ✅ Ensure extracted_texts is defined only once with the correct type annotation
 extracted_texts: Dict[str, List[str]] = (
     {}
@@ -31,14 +24,28 @@ class ExtractionRequest(BaseModel):
     filenames: List[str]
 
 
+def _check_files_exist(filenames: List[str]) -> None:
+    """Raises a 400 if no file is given and a 404 for the first missing one."""
+    if not filenames:
+        raise HTTPException(status_code=400, detail="No files provided.")
+    for filename in filenames:
+        if not os.path.exists(os.path.join(UPLOAD_DIR, filename)):
+            raise HTTPException(status_code=404, detail=f"File '{filename}' not found.")
+
+
 @router.post("/extract_and_store/")
-async def extract_and_store_text(request: ExtractionRequest):
+async def extract_and_store_text(
+    request: ExtractionRequest,
+    workflow: ExtractionIndexingWorkflow = Depends(get_extraction_workflow),
+):
     """
     1️⃣ Extracts text from the provided documents
     2️⃣ Segments text into chunks
     3️⃣ Generates embeddings
     4️⃣ Stores the data in ChromaDB
 
+    Runs inline; prefer `POST /text-extraction/jobs/` for large files.
+
     Example API request:
     ```json
     {
@@ -47,62 +54,74 @@ async def extract_and_store_text(request: ExtractionRequest):
     ```
     """
     filenames = request.filenames
+    _check_files_exist(filenames)
 
-    if not filenames:
-        raise HTTPException(status_code=400, detail="No files provided.")
-
-    extracted_results = []
+    try:
+        results = await workflow.index_uploads(filenames)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-    async def process_file(filename: str):
-        file_path = os.path.join(UPLOAD_DIR, filename)
+    return {
+        "message": "Text extracted, chunked, embedded, and stored in ChromaDB.",
+        "results": results,
+    }
 
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail=f"File '{filename}' not found.")
 
-        async with SEM:
-            extraction_result = await text_extractor.extract_text(file_path)
-
-        # 📝 Segment text into chunks
-        chunks = segmenter.hybrid_segmentation(extraction_result.text or "")
-        if not chunks:
-            return {
-                "filename": filename,
-                "text_length": 0,
-                "status": "No valid content",
-            }
-
-        # 🔍 Generate embeddings
-        embeddings = await embedder.get_embeddings(chunks)
-
-        # 🗂 Prepare metadata
-        metadatas = [
-            {"filename": filename, "chunk_index": i} for i in range(len(chunks))
-        ]
-        chunk_ids = [f"{filename}_chunk_{i}" for i in range(len(chunks))]
-
-        # 📥 Store data in ChromaDB
-        upsert_documents_with_embeddings(
-            texts=chunks, embeddings=embeddings, metadatas=metadatas, ids=chunk_ids
+@router.post("/jobs/", status_code=202)
+async def submit_ingestion_job(
+    request: ExtractionRequest,
+    ingestion: IngestionJobQueue = Depends(get_ingestion_queue),
+):
+    """
+    Queues the files for background indexing and returns the job ID immediately.
+    Poll `GET /text-extraction/jobs/{job_id}` for progress.
+    """
+    _check_files_exist(request.filenames)
+    try:
+        job = ingestion.submit(request.filenames)
+    except asyncio.QueueFull:
+        raise HTTPException(
+            status_code=503, detail="Too many ingestion jobs queued, retry later."
         )
+    return {"job_id": job.job_id, "status": job.status}
 
-        return {
-            "filename": filename,
-            "text_length": len(extraction_result.text) if extraction_result.text else 0,
-            "chunks": len(chunks),
-            "status": "Indexed in ChromaDB",
-        }
-
-    tasks = [process_file(f) for f in filenames]
-
-    try:
-        results = await asyncio.gather(*tasks)
-        extracted_results.extend(results)
-    except HTTPException as http_err:
-        raise http_err
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/jobs/")
+async def list_ingestion_jobs(
+    ingestion: IngestionJobQueue = Depends(get_ingestion_queue),
+):
+    """
+    Lists the retained ingestion jobs, newest first, with queue statistics.
+    """
     return {
-        "message": "Text extracted, chunked, embedded, and stored in ChromaDB.",
-        "results": extracted_results,
+        "jobs": [job.report() for job in ingestion.list_jobs()],
+        "queue": ingestion.stats(),
     }
+
+
+@router.get("/jobs/{job_id}")
+async def get_ingestion_job(
+    job_id: str, ingestion: IngestionJobQueue = Depends(get_ingestion_queue)
+):
+    """
+    Returns a job's status with per-file progress (pages extracted, chunks
+    embedded and written), errors and throughput.
+    """
+    job = ingestion.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return job.report()
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_ingestion_job(
+    job_id: str, ingestion: IngestionJobQueue = Depends(get_ingestion_queue)
+):
+    """
+    Cancels a queued or running job. Chunks of a file being indexed are removed.
+    """
+    if ingestion.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    if not ingestion.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' already finished.")
+    return {"job_id": job_id, "status": "cancelling"}
@@ -1,9 +1,11 @@
 import json
 import time
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
+from routes.dependencies import get_embedder
 from routes.utils import clean_result
+from services.ragutils.embedder import EmbeddingService
 from services.ragutils.web_search import DuckDuckGoSearchService
 from workflow.web_search_indexing import WebSearchIndexingWorkflow
 
@@ -20,7 +22,9 @@ class WebSearchRequest(BaseModel):
 
 
 @router.post("/search/")
-async def perform_web_search(request: WebSearchRequest):
+async def perform_web_search(
+    request: WebSearchRequest, embedder: EmbeddingService = Depends(get_embedder)
+):
     """
     Perform a web search using DuckDuckGo and return indexed results.
 
@@ -35,7 +39,9 @@ async def perform_web_search(request: WebSearchRequest):
 
         # Initialize web search
         search_service = DuckDuckGoSearchService(max_results=request.max_results)
-        web_search_workflow = WebSearchIndexingWorkflow(search_service=search_service)
+        web_search_workflow = WebSearchIndexingWorkflow(
+            search_service=search_service, embedder=embedder
+        )
 
         # Run workflow
         indexed_data = await web_search_workflow.search_and_index(request.query)
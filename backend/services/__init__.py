@@ -1,3 +1,36 @@
-from .ollama import async_chat_with_model, fetch_models
+from .conversation import ConversationStore, get_conversation_store
+from .ollama import (
+    BATCH,
+    INTERACTIVE,
+    ModelCatalog,
+    OllamaClient,
+    OllamaOverloaded,
+    OllamaScheduler,
+    SchedulerLease,
+    async_chat_with_model,
+    fetch_models,
+    get_model_catalog,
+    get_ollama_client,
+    get_ollama_scheduler,
+)
+from .prompt_builder import PromptBuilder, TokenEstimator, get_prompt_builder
 
-__all__ = ["async_chat_with_model", "fetch_models"]
+__all__ = [
+    "ConversationStore",
+    "get_conversation_store",
+    "OllamaClient",
+    "ModelCatalog",
+    "get_ollama_client",
+    "get_model_catalog",
+    "OllamaScheduler",
+    "OllamaOverloaded",
+    "SchedulerLease",
+    "get_ollama_scheduler",
+    "INTERACTIVE",
+    "BATCH",
+    "async_chat_with_model",
+    "fetch_models",
+    "PromptBuilder",
+    "TokenEstimator",
+    "get_prompt_builder",
+]
@@ -0,0 +1,351 @@
+"""
+Per-session conversation memory for the chat endpoint.
+
+Each session keeps its most recent messages in a bounded window. When the window is
+full, its older half is compacted: folded into a short extractive summary, so the
+history given to the model stays bounded however long the conversation gets.
+Between compactions messages are only appended and the summary does not change, so
+the model's prompt keeps the same prefix from one turn to the next. Idle sessions are
+evicted from memory, and sessions can be persisted in SQLite to survive evictions
+and restarts.
+
+Methods block on SQLite when persistence is enabled; async callers should run them
+in a thread.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.config import CONVERSATION_CONFIG, ConversationConfig
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+_CONTENT_WORD = re.compile(r"\w{4,}")
+
+# Longest sentence kept in a summary, in characters
+MAX_SUMMARY_SENTENCE_CHARS = 300
+
+SPEAKERS = {"user": "User", "ai": "AI"}
+
+
+class _Session:
+    """
+    A session's window of recent messages and the summary of the older ones.
+    """
+
+    def __init__(self) -> None:
+        # (sequence number, message)
+        self.messages: List[Tuple[int, Dict[str, str]]] = []
+        # (sequence number, sentence), in conversation order
+        self.summary: List[Tuple[int, str]] = []
+        self.next_seq = 0
+        self.last_active = time.monotonic()
+
+
+class ConversationStore:
+    """
+    Session-keyed conversation memory with a bounded window per session.
+    """
+
+    def __init__(self, config: ConversationConfig = CONVERSATION_CONFIG) -> None:
+        """
+        Initializes the store, opening the SQLite file if persistence is enabled.
+
+        Args:
+            config (ConversationConfig): Window size, summary size, eviction limits
+                and optional database location.
+        """
+        self.config = config
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self._counters = {
+            "idle_evictions": 0,
+            "capacity_evictions": 0,
+            "compactions": 0,
+            "summarized": 0,
+        }
+
+        self._conn: Optional[sqlite3.Connection] = None
+        if config.db_path:
+            os.makedirs(os.path.dirname(config.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(config.db_path, check_same_thread=False)
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS messages (
+                    session_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    PRIMARY KEY (session_id, seq)
+                );
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    next_seq INTEGER NOT NULL,
+                    summary TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                """
+            )
+            self._conn.commit()
+
+    def history(self, session_id: str) -> Tuple[Optional[str], List[Dict[str, str]]]:
+        """
+        Returns the summary of a session's older messages and its recent messages.
+
+        Args:
+            session_id (str): The conversation's identifier.
+
+        Returns:
+            Tuple[Optional[str], List[dict]]: The summary (None if nothing was
+            summarized yet) and the recent messages ({"role", "content"}), oldest first.
+        """
+        with self._lock:
+            session = self._session(session_id)
+            summary = (
+                "Summary of earlier messages: "
+                + " ".join(sentence for _, sentence in session.summary)
+                if session.summary
+                else None
+            )
+            return summary, [dict(message) for _, message in session.messages]
+
+    def append(self, session_id: str, role: str, content: str) -> None:
+        """
+        Adds a message to a session, compacting the session if its window is full.
+
+        Args:
+            session_id (str): The conversation's identifier.
+            role (str): "user" or "ai".
+            content (str): The message text.
+        """
+        self._append(session_id, [(role, content)])
+
+    def append_exchange(self, session_id: str, question: str, answer: str) -> None:
+        """
+        Adds a user message and the AI's answer to a session in one step, so the
+        history never holds a question whose answer failed or was abandoned.
+
+        Args:
+            session_id (str): The conversation's identifier.
+            question (str): The user's message.
+            answer (str): The AI's complete answer.
+        """
+        self._append(session_id, [("user", question), ("ai", answer)])
+
+    def compact(self, session_id: str, keep: int) -> None:
+        """
+        Folds all but the `keep` most recent messages of a session into its summary,
+        e.g. when they no longer fit in the prompt. The kept part starts with a
+        user message.
+
+        Args:
+            session_id (str): The conversation's identifier.
+            keep (int): Number of recent messages to keep at most.
+        """
+        with self._lock:
+            session = self._session(session_id)
+            evicted = self._compact(session, keep)
+            if evicted:
+                self._persist(session_id, session, [], evicted)
+
+    def clear(self, session_id: str) -> None:
+        """Forgets a session, including its persisted messages."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "DELETE FROM messages WHERE session_id = ?", (session_id,)
+                    )
+                    self._conn.execute(
+                        "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+                    )
+
+    def evict_idle(self) -> int:
+        """
+        Drops sessions idle for longer than `idle_ttl_s` from memory (persisted
+        sessions are reloaded on their next use).
+
+        Returns:
+            int: The number of sessions evicted.
+        """
+        with self._lock:
+            return self._evict_idle()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the number of sessions and messages in memory and eviction counters."""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "messages": sum(len(s.messages) for s in self._sessions.values()),
+                "persistent": self._conn is not None,
+                **self._counters,
+            }
+
+    def close(self) -> None:
+        """Closes the SQLite file."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _session(self, session_id: str) -> _Session:
+        """Returns a session (loading or creating it) and marks it as used."""
+        now = time.monotonic()
+        if now - self._last_sweep > min(60.0, self.config.idle_ttl_s):
+            self._evict_idle()
+
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._load(session_id)
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.config.max_sessions:
+                self._sessions.popitem(last=False)
+                self._counters["capacity_evictions"] += 1
+        self._sessions.move_to_end(session_id)
+        session.last_active = now
+        return session
+
+    def _append(self, session_id: str, messages: List[Tuple[str, str]]) -> None:
+        """Appends (role, content) messages, compacting the session when it is full."""
+        with self._lock:
+            session = self._session(session_id)
+            added = []
+            for role, content in messages:
+                seq = session.next_seq
+                session.next_seq += 1
+                session.messages.append((seq, {"role": role, "content": content}))
+                added.append((session_id, seq, role, content))
+            evicted = []
+            if len(session.messages) > self.config.window_messages:
+                evicted = self._compact(session, self.config.window_messages // 2)
+            self._persist(session_id, session, added, evicted)
+
+    def _compact(
+        self, session: _Session, keep: int
+    ) -> List[Tuple[int, Dict[str, str]]]:
+        """Summarizes and removes the oldest messages; returns the removed ones."""
+        cut = max(len(session.messages) - keep, 0)
+        while (
+            cut < len(session.messages) and session.messages[cut][1]["role"] != "user"
+        ):
+            cut += 1
+        evicted = session.messages[:cut]
+        del session.messages[:cut]
+        for seq, message in evicted:
+            self._summarize(session, seq, message)
+        if evicted:
+            self._counters["compactions"] += 1
+        return evicted
+
+    def _persist(
+        self,
+        session_id: str,
+        session: _Session,
+        added: List[Tuple[str, int, str, str]],
+        evicted: List[Tuple[int, Dict[str, str]]],
+    ) -> None:
+        """Writes new and removed messages and the session's summary in one step."""
+        if self._conn is None:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?)", added
+            )
+            self._conn.executemany(
+                "DELETE FROM messages WHERE session_id = ? AND seq = ?",
+                [(session_id, seq) for seq, _ in evicted],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                (
+                    session_id,
+                    session.next_seq,
+                    json.dumps(session.summary),
+                    time.time(),
+                ),
+            )
+
+    def _evict_idle(self) -> int:
+        now = time.monotonic()
+        self._last_sweep = now
+        idle = [
+            session_id
+            for session_id, session in self._sessions.items()
+            if now - session.last_active > self.config.idle_ttl_s
+        ]
+        for session_id in idle:
+            del self._sessions[session_id]
+        self._counters["idle_evictions"] += len(idle)
+        return len(idle)
+
+    def _load(self, session_id: str) -> _Session:
+        """Restores a persisted session, or starts an empty one."""
+        session = _Session()
+        if self._conn is None:
+            return session
+        row = self._conn.execute(
+            "SELECT next_seq, summary FROM sessions WHERE session_id = ?",
+            (session_id,),
+        ).fetchone()
+        if row is None:
+            return session
+        session.next_seq = row[0]
+        session.summary = [tuple(item) for item in json.loads(row[1])]
+        rows = self._conn.execute(
+            "SELECT seq, role, content FROM messages WHERE session_id = ? "
+            "ORDER BY seq",
+            (session_id,),
+        ).fetchall()
+        for seq, role, content in rows:
+            session.messages.append((seq, {"role": role, "content": content}))
+        return session
+
+    def _summarize(self, session: _Session, seq: int, message: Dict[str, str]) -> None:
+        """
+        Folds a message removed by a compaction into the session's summary.
+
+        The summary is extractive: it keeps the `summary_max_sentences` sentences
+        whose words recur most across the summarized part of the conversation
+        (with a small bonus for recent ones), in conversation order.
+        """
+        speaker = SPEAKERS.get(message["role"], message["role"])
+        for sentence in _SENTENCE_SPLIT.split(message["content"].strip()):
+            if sentence.strip():
+                text = f"{speaker}: {sentence.strip()}"
+                if len(text) > MAX_SUMMARY_SENTENCE_CHARS:
+                    text = text[: MAX_SUMMARY_SENTENCE_CHARS - 1] + "…"
+                session.summary.append((seq, text))
+        self._counters["summarized"] += 1
+
+        limit = self.config.summary_max_sentences
+        if len(session.summary) <= limit:
+            return
+        words = [set(_CONTENT_WORD.findall(s.lower())) for _, s in session.summary]
+        frequency = Counter(word for sentence in words for word in sentence)
+        newest = session.summary[-1][0] or 1
+
+        def score(i: int) -> float:
+            centrality = sum(frequency[word] for word in words[i]) / (len(words[i]) + 1)
+            return centrality + 0.5 * session.summary[i][0] / newest
+
+        keep = sorted(range(len(session.summary)), key=score, reverse=True)[:limit]
+        session.summary = [session.summary[i] for i in sorted(keep)]
+
+
+@lru_cache(maxsize=None)
+def get_conversation_store() -> ConversationStore:
+    """
+    Returns the process-wide ConversationStore.
+    """
+    return ConversationStore()
@@ -0,0 +1,232 @@
+"""
+Background ingestion jobs: submitted files are indexed by a bounded pool of workers
+while clients poll for per-file progress.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from config.config import INGESTION_CONFIG, IngestionConfig
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class FileProgress(BaseModel):
+    """
+    Progress of one file of an ingestion job, updated in place while it is indexed.
+    """
+
+    filename: str
+    status: str = QUEUED
+    pages_extracted: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    chunks_written: int = 0
+    # Unchanged chunks of a previous version, kept without being embedded again
+    chunks_reused: int = 0
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def chunks_per_second(self) -> float:
+        """Write throughput of the file so far."""
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return round(self.chunks_written / elapsed, 2) if elapsed > 0 else 0.0
+
+
+class IngestionJob(BaseModel):
+    """
+    A batch of files submitted together for indexing.
+    """
+
+    job_id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = QUEUED
+    files: List[FileProgress]
+    created_at: float = Field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def report(self) -> Dict[str, Any]:
+        """Returns the job status with per-file progress and throughput."""
+        return {
+            **self.model_dump(exclude={"files"}),
+            "chunks_written": sum(f.chunks_written for f in self.files),
+            "files": [
+                {**f.model_dump(), "chunks_per_second": f.chunks_per_second()}
+                for f in self.files
+            ],
+        }
+
+
+# Indexes one file, updating its FileProgress as it goes
+ProcessFile = Callable[[str, FileProgress], Awaitable[Dict[str, Any]]]
+
+
+class IngestionJobQueue:
+    """
+    Bounded queue of ingestion jobs processed by a fixed number of worker tasks.
+    """
+
+    def __init__(
+        self, process_file: ProcessFile, config: IngestionConfig = INGESTION_CONFIG
+    ) -> None:
+        """
+        Initializes the queue. Call `start()` from the running event loop.
+
+        Args:
+            process_file (Callable): Coroutine indexing one file of a job.
+            config (IngestionConfig): Worker count and queue/retention limits.
+        """
+        self.process_file = process_file
+        self.config = config
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._queue: Optional["asyncio.Queue[IngestionJob]"] = None
+        self._workers: List["asyncio.Task[None]"] = []
+        self._running: Dict[str, "asyncio.Task[None]"] = {}
+
+    async def start(self) -> None:
+        """Starts the worker tasks."""
+        self._queue = asyncio.Queue(maxsize=self.config.max_queued_jobs)
+        self._workers = [
+            asyncio.create_task(self._work()) for _ in range(self.config.workers)
+        ]
+
+    async def stop(self) -> None:
+        """Cancels running jobs and stops the workers."""
+        for task in [*self._running.values(), *self._workers]:
+            task.cancel()
+        await asyncio.gather(
+            *self._running.values(), *self._workers, return_exceptions=True
+        )
+        self._workers = []
+
+    def submit(self, filenames: List[str]) -> IngestionJob:
+        """
+        Queues a job for the given files.
+
+        Raises:
+            asyncio.QueueFull: If `max_queued_jobs` jobs are already waiting.
+            RuntimeError: If the queue has not been started.
+        """
+        if self._queue is None:
+            raise RuntimeError("The ingestion queue is not started.")
+        job = IngestionJob(files=[FileProgress(filename=name) for name in filenames])
+        self._queue.put_nowait(job)
+        self._jobs[job.job_id] = job
+        self._forget_finished_jobs()
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        """Returns a job by ID, or None if it is unknown (or was forgotten)."""
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[IngestionJob]:
+        """Returns every retained job, newest first."""
+        return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancels a queued or running job.
+
+        Returns:
+            bool: False if the job is unknown or already finished.
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.status not in (QUEUED, RUNNING):
+            return False
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        else:
+            self._finish(job, CANCELLED)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the queue depth and job counts by status."""
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": len(self._running),
+            "workers": len(self._workers),
+            "jobs_by_status": counts,
+        }
+
+    async def _work(self) -> None:
+        """Worker loop: runs one job at a time."""
+        assert self._queue is not None  # nosec B101
+        while True:
+            job = await self._queue.get()
+            if job.status != QUEUED:
+                continue
+            task = asyncio.create_task(self._run(job))
+            self._running[job.job_id] = task
+            try:
+                await asyncio.wait([task])
+            finally:
+                self._running.pop(job.job_id, None)
+
+    async def _run(self, job: IngestionJob) -> None:
+        """Indexes the files of a job one after the other."""
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            for progress in job.files:
+                progress.status = RUNNING
+                progress.started_at = time.time()
+                try:
+                    progress.result = await self.process_file(
+                        progress.filename, progress
+                    )
+                    progress.status = COMPLETED
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Ingestion of {progress.filename} failed: {e}")
+                    progress.status = FAILED
+                    progress.error = str(e)
+                progress.finished_at = time.time()
+        except asyncio.CancelledError:
+            logger.info(f"Ingestion job {job.job_id} cancelled.")
+            self._finish(job, CANCELLED)
+            return
+        self._finish(
+            job,
+            FAILED if all(f.status == FAILED for f in job.files) else COMPLETED,
+        )
+
+    @staticmethod
+    def _finish(job: IngestionJob, status: str) -> None:
+        """Marks a job, and any file not yet finished, as done."""
+        now = time.time()
+        job.status = status
+        job.finished_at = now
+        for progress in job.files:
+            if progress.status in (QUEUED, RUNNING):
+                progress.status = status
+                progress.finished_at = now
+
+    def _forget_finished_jobs(self) -> None:
+        """Drops the oldest finished jobs beyond `max_retained_jobs`."""
+        finished = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.status not in (QUEUED, RUNNING)
+        ]
+        for job_id in finished[: max(len(finished) - self.config.max_retained_jobs, 0)]:
+            del self._jobs[job_id]
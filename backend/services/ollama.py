@@ -2,60 +2,502 @@
 Provides functions to interact with the Ollama API using async streaming via httpx.
 """
 
+import asyncio
+import heapq
+import itertools
 import json
+import logging
+import time
+from collections import Counter, deque
+from functools import lru_cache
+from typing import Any, AsyncGenerator, Callable, Deque, Dict, List, Optional, Tuple
 
 import httpx  # Using httpx for async streaming
-from config.config import OLLAMA_CHAT_URL, OLLAMA_MODELS_URL
+from config.config import (
+    OLLAMA_CHAT_URL,
+    OLLAMA_CLIENT_CONFIG,
+    OLLAMA_GENERATE_URL,
+    OLLAMA_MODELS_URL,
+    OLLAMA_SCHEDULER_CONFIG,
+    OllamaClientConfig,
+    OllamaSchedulerConfig,
+)
 
+logger = logging.getLogger(__name__)
 
-async def fetch_models():
-    """
-    Asynchronously fetch the list of available models from Ollama.
+# Unknown model names trigger at most one catalog refresh per this many seconds
+MIN_INVALIDATION_INTERVAL_S = 2.0
 
-    Returns:
-        list[str]: A list of model names dynamically available in Ollama.
+# Scheduling priorities: lower values are served first
+INTERACTIVE = 0
+BATCH = 1
+
+
+class OllamaClient:
     """
-    try:
-        async with httpx.AsyncClient(timeout=60) as client:
-            response = await client.get(OLLAMA_MODELS_URL)
+    Long-lived Ollama client sharing one pooled `httpx.AsyncClient`, so chats reuse
+    kept-alive connections instead of opening a new one per call.
+    """
+
+    def __init__(self, config: OllamaClientConfig = OLLAMA_CLIENT_CONFIG) -> None:
+        """
+        Initializes the client. The underlying connection pool is opened lazily.
+
+        Args:
+            config (OllamaClientConfig): Pool limits and connect/read timeouts.
+        """
+        self.config = config
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        """Returns the pooled HTTP client, (re)creating it on the running loop."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(
+                    self.config.read_timeout_s, connect=self.config.connect_timeout_s
+                ),
+                limits=httpx.Limits(
+                    max_connections=self.config.max_connections,
+                    max_keepalive_connections=self.config.max_keepalive_connections,
+                    keepalive_expiry=self.config.keepalive_expiry_s,
+                ),
+            )
+            self._loop = loop
+        return self._client
+
+    async def fetch_models(self) -> List[str]:
+        """
+        Fetches the list of available models from Ollama.
+
+        Returns:
+            list[str]: A list of model names dynamically available in Ollama.
+        """
+        try:
+            response = await self._http().get(OLLAMA_MODELS_URL)
             response.raise_for_status()
-    except httpx.RequestError as e:
-        raise ConnectionError(f"Error fetching models from Ollama: {e}")
+        except httpx.RequestError as e:
+            raise ConnectionError(f"Error fetching models from Ollama: {e}")
 
-    data = response.json()
-    return [model["name"] for model in data.get("models", [])]
+        data = response.json()
+        return [model["name"] for model in data.get("models", [])]
 
+    async def chat_stream(
+        self,
+        model_name: str,
+        messages: List[Dict[str, str]],
+        stats: Optional[Dict[str, Any]] = None,
+    ) -> AsyncGenerator[str, None]:
+        """
+        Sends a chat request (`/api/chat`) to Ollama with streaming enabled.
 
-async def async_chat_with_model(model_name: str, prompt: str):
-    """
-    Send a chat request to Ollama with streaming enabled (async).
+        Ollama reuses its cache for the part of the conversation it has already
+        evaluated while the model stays loaded, so keep earlier messages unchanged
+        from one turn to the next.
 
-    Args:
-        model_name (str): The name of the model to use (must exist in Ollama).
-        prompt (str): The conversation or instructions.
+        Args:
+            model_name (str): The name of the model to use (must exist in Ollama).
+            messages (List[dict]): The conversation ({"role", "content"}), where
+                role is "system", "user" or "assistant".
+            stats (dict, optional): Filled with Ollama's final statistics (token
+                counts and durations) once the answer is complete.
 
-    Yields:
-        str: The response text (no fixed chunk size). Each yielded piece
-             is one portion of Ollama's streaming response.
-    """
-    payload = {"model": model_name, "prompt": prompt, "stream": True}
-    headers = {"Content-Type": "application/json"}
+        Yields:
+            str: Each portion of Ollama's streaming response.
+        """
+        payload = {"model": model_name, "messages": messages, "stream": True}
+        async for chunk in self._stream(
+            OLLAMA_CHAT_URL,
+            payload,
+            lambda data: data.get("message", {}).get("content", ""),
+            stats,
+        ):
+            yield chunk
 
-    try:
-        async with httpx.AsyncClient(timeout=60) as client:
-            async with client.stream(
-                "POST", OLLAMA_CHAT_URL, json=payload, headers=headers
+    async def generate_stream(
+        self,
+        model_name: str,
+        prompt: str,
+        stats: Optional[Dict[str, Any]] = None,
+    ) -> AsyncGenerator[str, None]:
+        """
+        Sends a completion request (`/api/generate`) to Ollama with streaming enabled.
+
+        Args:
+            model_name (str): The name of the model to use (must exist in Ollama).
+            prompt (str): The complete prompt.
+            stats (dict, optional): Filled with Ollama's final statistics (token
+                counts and durations) once the answer is complete.
+
+        Yields:
+            str: Each portion of Ollama's streaming response.
+        """
+        payload = {"model": model_name, "prompt": prompt, "stream": True}
+        async for chunk in self._stream(
+            OLLAMA_GENERATE_URL, payload, lambda data: data.get("response", ""), stats
+        ):
+            yield chunk
+
+    async def _stream(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        extract: Callable[[Dict[str, Any]], str],
+        stats: Optional[Dict[str, Any]],
+    ) -> AsyncGenerator[str, None]:
+        """Posts a streaming request and yields the text of each line."""
+        payload["keep_alive"] = self.config.keep_alive
+        if self.config.num_ctx:
+            payload["options"] = {"num_ctx": self.config.num_ctx}
+        headers = {"Content-Type": "application/json"}
+
+        try:
+            async with self._http().stream(
+                "POST", url, json=payload, headers=headers
             ) as resp:
                 resp.raise_for_status()
                 async for line in resp.aiter_lines():
-                    # Each line from Ollama should be a JSON object with {"response": "..."}
+                    # Each line from Ollama should be a JSON object
                     if not line.strip():
                         continue
                     try:
                         data = json.loads(line)
-                        yield data.get("response", "")
                     except json.JSONDecodeError:
                         # Malformed line - skip
                         continue
-    except httpx.RequestError as e:
-        raise ConnectionError(f"Error connecting to Ollama: {e}")
+                    if data.get("done") and stats is not None:
+                        stats.update(
+                            (key, value)
+                            for key, value in data.items()
+                            if key not in ("message", "response", "context")
+                        )
+                    yield extract(data)
+        except httpx.RequestError as e:
+            raise ConnectionError(f"Error connecting to Ollama: {e}")
+
+    async def aclose(self) -> None:
+        """Closes the pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+    async def __aenter__(self) -> "OllamaClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+
+class ModelCatalog:
+    """
+    TTL cache of the models available in Ollama.
+
+    A stale list is served immediately while it is refreshed in the background, and
+    concurrent refreshes share a single upstream `/api/tags` call.
+    """
+
+    def __init__(self, client: OllamaClient, ttl_s: Optional[float] = None) -> None:
+        """
+        Initializes an empty catalog.
+
+        Args:
+            client (OllamaClient): Client used to fetch the model list.
+            ttl_s (float, optional): Freshness window; defaults to the client config.
+        """
+        self.client = client
+        self.ttl_s = client.config.models_ttl_s if ttl_s is None else ttl_s
+        self._models: Optional[List[str]] = None
+        self._fetched_at = 0.0
+        # Last fetch attempt, successful or not: paces retries while Ollama fails
+        self._attempted_at = 0.0
+        self._refresh_task: Optional["asyncio.Task[List[str]]"] = None
+
+    async def get_models(self) -> List[str]:
+        """
+        Returns the cached model names, fetching them only when nothing is cached.
+
+        Returns:
+            list[str]: The models available in Ollama.
+        """
+        if self._models is None:
+            return await self.refresh()
+        now = time.monotonic()
+        # While Ollama fails, retry at most every MIN_INVALIDATION_INTERVAL_S
+        retry_s = min(self.ttl_s, MIN_INVALIDATION_INTERVAL_S)
+        if now - self._fetched_at > self.ttl_s and now - self._attempted_at >= retry_s:
+            self._start_refresh()
+        return self._models
+
+    async def has_model(self, model_name: str) -> bool:
+        """
+        Checks that a model exists, re-fetching the list once if the name is unknown
+        (the model may have been pulled since the last refresh).
+        """
+        if model_name in await self.get_models():
+            return True
+        if time.monotonic() - self._attempted_at < MIN_INVALIDATION_INTERVAL_S:
+            return False
+        self.invalidate()
+        return model_name in await self.refresh()
+
+    async def refresh(self) -> List[str]:
+        """Re-fetches the model list, joining a refresh already in flight."""
+        return await asyncio.shield(self._start_refresh())
+
+    def invalidate(self) -> None:
+        """Marks the cached list as stale."""
+        self._fetched_at = 0.0
+
+    def _start_refresh(self) -> "asyncio.Task[List[str]]":
+        """Starts a refresh task unless one is already running."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(self._fetch())
+        return self._refresh_task
+
+    async def _fetch(self) -> List[str]:
+        """Fetches the list from Ollama, keeping the previous one on failure."""
+        self._attempted_at = time.monotonic()
+        try:
+            models = await self.client.fetch_models()
+        except Exception as e:
+            if self._models is None:
+                raise
+            logger.warning(f"Keeping the cached Ollama model list: {e}")
+            return self._models
+        self._models = models
+        self._fetched_at = time.monotonic()
+        return models
+
+
+class OllamaOverloaded(Exception):
+    """
+    Raised when a generation is not admitted: the wait queue is full (429) or no
+    slot freed up in time (503).
+    """
+
+    def __init__(self, message: str, status_code: int, retry_after_s: int) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after_s = retry_after_s
+
+
+class SchedulerLease:
+    """
+    A generation slot held for one model; release it once the answer is complete.
+    Releasing more than once is harmless.
+    """
+
+    def __init__(self, scheduler: "OllamaScheduler", model_name: str) -> None:
+        self.scheduler = scheduler
+        self.model_name = model_name
+        self.released = False
+
+    def release(self) -> None:
+        """Frees the slot for the next waiting request."""
+        if not self.released:
+            self.released = True
+            self.scheduler._release(self.model_name)
+
+    def cancel(self) -> None:
+        """Frees the slot of a generation abandoned by its client."""
+        if not self.released:
+            self.scheduler._counters["cancelled"] += 1
+            self.release()
+
+
+class _ModelSlots:
+    """Running generations and waiting requests of one model."""
+
+    def __init__(self) -> None:
+        self.active = 0
+        # (priority, arrival order, future resolved when a slot is handed over)
+        self.waiters: List[Tuple[int, int, "asyncio.Future[None]"]] = []
+
+
+class OllamaScheduler:
+    """
+    Admission control in front of Ollama.
+
+    Each model runs at most a configured number of generations at once. Further
+    requests wait in a bounded queue, interactive ones ahead of batch ones (first
+    come, first served within a priority); when the queue is full they are
+    rejected at once rather than piling up until they all time out.
+    """
+
+    def __init__(self, config: OllamaSchedulerConfig = OLLAMA_SCHEDULER_CONFIG) -> None:
+        """
+        Args:
+            config (OllamaSchedulerConfig): Concurrency limits, queue bound and
+                maximum wait.
+        """
+        self.config = config
+        self._models: Dict[str, _ModelSlots] = {}
+        self._queued = 0
+        self._arrivals = itertools.count()
+        self._counters: Counter = Counter()
+        self._waits_ms: Deque[float] = deque(maxlen=1000)
+        self._max_queued_seen = 0
+
+    def limit(self, model_name: str) -> int:
+        """Returns the number of concurrent generations allowed for a model."""
+        limit: int = self.config.model_limits.get(
+            model_name, self.config.max_concurrent_per_model
+        )
+        return limit
+
+    async def acquire(
+        self, model_name: str, priority: int = INTERACTIVE
+    ) -> SchedulerLease:
+        """
+        Waits for a generation slot of `model_name`.
+
+        Args:
+            model_name (str): The model that will run the generation.
+            priority (int): INTERACTIVE or BATCH.
+
+        Returns:
+            SchedulerLease: The slot, to be released when the generation ends.
+
+        Raises:
+            OllamaOverloaded: If the queue is full or the wait exceeds `max_wait_s`.
+        """
+        slots = self._models.setdefault(model_name, _ModelSlots())
+        start = time.perf_counter()
+        if slots.active < self.limit(model_name) and not slots.waiters:
+            slots.active += 1
+            return self._admitted(model_name, start)
+
+        if self._queued >= self.config.max_queued:
+            self._counters["rejected"] += 1
+            raise OllamaOverloaded(
+                f"Too many requests waiting for Ollama ({self._queued} queued).",
+                status_code=429,
+                retry_after_s=max(1, round(self.config.max_wait_s / 4)),
+            )
+
+        future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        heapq.heappush(slots.waiters, (priority, next(self._arrivals), future))
+        self._queued += 1
+        self._max_queued_seen = max(self._max_queued_seen, self._queued)
+        try:
+            await asyncio.wait_for(future, self.config.max_wait_s)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                self._release(model_name)
+            self._counters["timed_out"] += 1
+            raise OllamaOverloaded(
+                f"No Ollama slot for '{model_name}' freed up within "
+                f"{self.config.max_wait_s}s.",
+                status_code=503,
+                retry_after_s=max(1, round(self.config.max_wait_s)),
+            )
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before the cancellation
+            if future.done() and not future.cancelled():
+                self._release(model_name)
+            raise
+        finally:
+            self._queued -= 1
+        return self._admitted(model_name, start)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns per-model running/queued counts, admission counters and wait times.
+        """
+        waits = sorted(self._waits_ms)
+
+        def percentile(p: float) -> float:
+            return round(waits[int(p * (len(waits) - 1))], 1) if waits else 0.0
+
+        return {
+            "models": {
+                name: {
+                    "active": slots.active,
+                    "queued": sum(1 for *_, f in slots.waiters if not f.done()),
+                    "limit": self.limit(name),
+                }
+                for name, slots in self._models.items()
+            },
+            "queued": self._queued,
+            "max_queued": self.config.max_queued,
+            "max_queued_seen": self._max_queued_seen,
+            "admitted": self._counters["admitted"],
+            "rejected": self._counters["rejected"],
+            "timed_out": self._counters["timed_out"],
+            "cancelled": self._counters["cancelled"],
+            "wait_ms": {"p50": percentile(0.5), "p95": percentile(0.95)},
+        }
+
+    def _admitted(self, model_name: str, start: float) -> SchedulerLease:
+        self._counters["admitted"] += 1
+        self._waits_ms.append((time.perf_counter() - start) * 1000)
+        return SchedulerLease(self, model_name)
+
+    def _release(self, model_name: str) -> None:
+        """Hands the slot to the next waiter, or frees it."""
+        slots = self._models[model_name]
+        while slots.waiters:
+            _, _, future = heapq.heappop(slots.waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        slots.active -= 1
+
+
+@lru_cache(maxsize=None)
+def get_ollama_client() -> OllamaClient:
+    """
+    Returns the process-wide OllamaClient.
+    """
+    return OllamaClient()
+
+
+@lru_cache(maxsize=None)
+def get_ollama_scheduler() -> OllamaScheduler:
+    """
+    Returns the process-wide OllamaScheduler.
+    """
+    return OllamaScheduler()
+
+
+@lru_cache(maxsize=None)
+def get_model_catalog() -> ModelCatalog:
+    """
+    Returns the process-wide ModelCatalog backed by the shared OllamaClient.
+    """
+    return ModelCatalog(get_ollama_client())
+
+
+async def fetch_models():
+    """
+    Asynchronously fetch the list of available models from Ollama.
+
+    Returns:
+        list[str]: A list of model names dynamically available in Ollama.
+    """
+    return await get_ollama_client().fetch_models()
+
+
+async def async_chat_with_model(
+    model_name: str,
+    prompt: str,
+    stats: Optional[Dict[str, Any]] = None,
+):
+    """
+    Send a prompt to Ollama with streaming enabled (async).
+
+    Args:
+        model_name (str): The name of the model to use (must exist in Ollama).
+        prompt (str): The conversation or instructions.
+        stats (dict, optional): Filled with Ollama's final statistics.
+
+    Yields:
+        str: The response text (no fixed chunk size). Each yielded piece
+             is one portion of Ollama's streaming response.
+    """
+    async for chunk in get_ollama_client().generate_stream(
+        model_name, prompt, stats=stats
+    ):
+        yield chunk
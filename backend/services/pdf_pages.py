@@ -0,0 +1,48 @@
+"""
+Page-range PDF extraction, run inside TextExtractor's process pool.
+
+This module is deliberately kept outside `services.ragutils` so that spawned worker
+processes only import pdfplumber, not the embedding stack (torch, models, ...).
+"""
+
+from typing import Any, Dict, List, Optional
+
+import pdfplumber
+
+
+def extract_pdf_pages(
+    file_path: str,
+    first_page: int = 1,
+    last_page: Optional[int] = None,
+    extract_tables: bool = True,
+) -> Dict[str, Any]:
+    """
+    Extracts the text (and optionally the first table) of a range of PDF pages.
+
+    Args:
+        file_path (str): Path to the PDF file.
+        first_page (int): First page to extract (1-based, inclusive).
+        last_page (int, optional): Last page to extract (inclusive). Defaults to the
+            last page of the document.
+        extract_tables (bool): Whether to run table extraction on each page.
+
+    Returns:
+        dict: {"texts": [page text, ...], "tables": [{"page", "table"}, ...],
+               "metadata": {...}}
+    """
+    pages = list(range(first_page, last_page + 1)) if last_page is not None else None
+    texts: List[str] = []
+    tables: List[Dict[str, Any]] = []
+    with pdfplumber.open(file_path, pages=pages) as pdf:
+        metadata = pdf.metadata
+        for page in pdf.pages:
+            if page.page_number < first_page:
+                continue
+            texts.append(page.extract_text() or "")
+            if extract_tables:
+                table = page.extract_table()
+                if table:
+                    tables.append({"page": page.page_number, "table": table})
+            # Release the page's parsed objects as soon as we are done with it
+            page.close()
+    return {"texts": texts, "tables": tables, "metadata": metadata}
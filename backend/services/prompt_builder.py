@@ -0,0 +1,284 @@
+"""
+Token-budgeted assembly of the chat prompt.
+
+The system prompt and the user's message always go in. What is left of the model's
+context window, minus room for the answer, is shared between conversation history,
+web results and document results: chunks are packed best-first within each
+section's budget, and chunks that mostly repeat what is already in the prompt are
+left out. History is packed as whole exchanges from the most recent one, without
+gaps, and the summary of older messages only gets the budget left over.
+"""
+
+import math
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from config.config import PROMPT_BUDGET_CONFIG, PromptBudgetConfig
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+SECTION_HEADERS = {
+    "web": "🔍 **Web Search Results:**",
+    "rag": "📂 **Document Results:**",
+}
+
+
+class TokenEstimator:
+    """
+    Fast token count estimate, without loading the model's tokenizer.
+
+    Subword tokenizers produce at least one token per word or punctuation mark, and
+    on average about one token per `chars_per_token` characters; the estimate is
+    the larger of the two.
+    """
+
+    def __init__(self, chars_per_token: float = PROMPT_BUDGET_CONFIG.chars_per_token):
+        """
+        Args:
+            chars_per_token (float): Average characters per token of the model.
+        """
+        self.chars_per_token = chars_per_token
+
+    def count(self, text: str) -> int:
+        """Returns the estimated number of tokens of `text`."""
+        if not text:
+            return 0
+        return max(
+            len(_TOKEN_PATTERN.findall(text)),
+            math.ceil(len(text) / self.chars_per_token),
+        )
+
+
+def _shingles(text: str) -> Set[Tuple[str, ...]]:
+    """Returns the word trigrams of a text, used to detect overlapping chunks."""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < 3:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i : i + 3]) for i in range(len(words) - 2)}
+
+
+class PromptBuilder:
+    """
+    Builds the chat prompt within the token budget described by a PromptBudgetConfig.
+    """
+
+    def __init__(
+        self,
+        config: PromptBudgetConfig = PROMPT_BUDGET_CONFIG,
+        estimator: Optional[TokenEstimator] = None,
+    ) -> None:
+        """
+        Args:
+            config (PromptBudgetConfig): Context size, answer reserve and shares.
+            estimator (TokenEstimator, optional): Defaults to one calibrated by config.
+        """
+        self.config = config
+        self.estimator = estimator or TokenEstimator(config.chars_per_token)
+
+    def build(
+        self,
+        system_prompt: str,
+        user_message: str,
+        web_chunks: Sequence[Dict[str, Any]] = (),
+        rag_chunks: Sequence[Dict[str, Any]] = (),
+        history: Sequence[Dict[str, str]] = (),
+        summary: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Selects what fits in the budget and assembles the prompt.
+
+        Args:
+            system_prompt (str): The personality's system prompt (always included).
+            user_message (str): The user's message (always included).
+            web_chunks (Sequence[dict]): Web chunks with "content", "score", "metadata".
+            rag_chunks (Sequence[dict]): Document chunks, same shape.
+            history (Sequence[dict]): Earlier turns ({"role", "content"}), oldest first.
+            summary (str, optional): Summary of turns older than `history`.
+
+        Returns:
+            dict: "prompt", the same content as chat "messages", its parts
+            ("context", "history"), the number of "history_messages" included,
+            the selected "web" and "rag" chunks (best first), estimated "tokens"
+            per section and the number of items "dropped" for lack of budget or as
+            duplicates.
+        """
+        count = self.estimator.count
+        tokens = {"system": count(system_prompt), "user": count(user_message)}
+        available = max(
+            self.config.context_tokens
+            - self.config.answer_tokens
+            - tokens["system"]
+            - tokens["user"]
+            - count(self._render("", "", "", "")),
+            0,
+        )
+
+        candidates = {
+            "rag": self._by_score(rag_chunks),
+            "web": self._by_score(web_chunks),
+            # Most recent exchange first
+            "history": [
+                {
+                    "content": "".join(f"{self._render_turn(t)}\n" for t in turns),
+                    "turns": turns,
+                }
+                for turns in reversed(self._exchanges(history))
+            ],
+        }
+        shares = {
+            "rag": self.config.rag_share,
+            "web": self.config.web_share,
+            "history": self.config.history_share,
+        }
+        total_share = sum(shares[name] for name in candidates if candidates[name])
+        budgets = {
+            name: (
+                int(available * shares[name] / total_share) if candidates[name] else 0
+            )
+            for name in candidates
+        }
+
+        selected: Dict[str, List[Dict[str, Any]]] = {name: [] for name in candidates}
+        used = {name: 0 for name in candidates}
+        seen: Set[Tuple[str, ...]] = set()
+        dropped = {"budget": 0, "duplicates": 0}
+        remaining = {name: list(items) for name, items in candidates.items()}
+
+        # First within each section's share, then with whatever budget is left
+        for extra_pass in (False, True):
+            for name in candidates:
+                budget = budgets[name]
+                if extra_pass:
+                    budget = used[name] + available - sum(used.values())
+                left = []
+                for position, item in enumerate(remaining[name]):
+                    item_tokens = count(item["content"]) + 1
+                    if name != "history":
+                        shingles = _shingles(item["content"])
+                        if shingles and len(shingles & seen) > (
+                            self.config.max_overlap * len(shingles)
+                        ):
+                            dropped["duplicates"] += 1
+                            continue
+                    if used[name] + item_tokens > budget:
+                        if name == "history":
+                            # Older exchanges are not used past one that does not fit
+                            left.extend(remaining[name][position:])
+                            break
+                        left.append(item)
+                        continue
+                    selected[name].append(item)
+                    used[name] += item_tokens
+                    if name != "history":
+                        seen |= shingles
+                remaining[name] = left
+        dropped["budget"] = sum(len(items) for items in remaining.values())
+
+        # The summary of older messages only takes the budget left over
+        summary_item = None
+        if summary:
+            summary_tokens = count(summary) + 1
+            if summary_tokens <= available - sum(used.values()):
+                summary_item = {"content": summary, "summary": True}
+                used["history"] += summary_tokens
+            else:
+                dropped["budget"] += 1
+
+        context = ""
+        for name in ("web", "rag"):
+            if selected[name]:
+                context += f"\n\n{SECTION_HEADERS[name]}\n"
+                context += "".join(f"{c['content']}\n" for c in selected[name])
+        # Back to chronological order, the summary first
+        history_items = ([summary_item] if summary_item else []) + list(
+            reversed(selected["history"])
+        )
+        history_text = "".join(
+            f"{item['content']}\n" if item.get("summary") else item["content"]
+            for item in history_items
+        )
+        tokens.update(used)
+        tokens["total"] = sum(tokens.values())
+        return {
+            "prompt": self._render(system_prompt, context, history_text, user_message),
+            "messages": self._messages(
+                system_prompt, context, history_items, user_message
+            ),
+            "context": context,
+            "history": history_text,
+            "history_messages": sum(len(item["turns"]) for item in selected["history"]),
+            "web": selected["web"],
+            "rag": selected["rag"],
+            "tokens": tokens,
+            "dropped": dropped,
+        }
+
+    @staticmethod
+    def _by_score(chunks: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Returns the non-empty chunks, highest score first (stable)."""
+        chunks = [chunk for chunk in chunks if chunk.get("content", "").strip()]
+        return sorted(chunks, key=lambda chunk: -chunk.get("score", 0.0))
+
+    @staticmethod
+    def _exchanges(history: Sequence[Dict[str, str]]) -> List[List[Dict[str, str]]]:
+        """
+        Groups history into exchanges: a user message and the replies that follow
+        it. Replies whose question is no longer in the history are left out.
+        """
+        exchanges: List[List[Dict[str, str]]] = []
+        for turn in history:
+            if turn.get("role") == "user":
+                exchanges.append([turn])
+            elif exchanges:
+                exchanges[-1].append(turn)
+        return exchanges
+
+    @staticmethod
+    def _render_turn(turn: Dict[str, str]) -> str:
+        speaker = "👤 User" if turn.get("role") == "user" else "🤖 AI"
+        return f"{speaker}: {turn.get('content', '')}"
+
+    @staticmethod
+    def _messages(
+        system_prompt: str,
+        context: str,
+        history_items: List[Dict[str, Any]],
+        user_message: str,
+    ) -> List[Dict[str, str]]:
+        """
+        Lays out the prompt as chat messages. This turn's context goes in its own
+        message just before the user's, and history messages are sent exactly as
+        stored, so everything before it stays identical from one turn to the next
+        and Ollama can reuse what it already evaluated.
+        """
+        messages = [{"role": "system", "content": system_prompt}]
+        for item in history_items:
+            if item.get("summary"):
+                messages.append({"role": "system", "content": item["content"]})
+                continue
+            for turn in item["turns"]:
+                role = "user" if turn.get("role") == "user" else "assistant"
+                messages.append({"role": role, "content": turn["content"]})
+        if context.strip():
+            messages.append(
+                {"role": "system", "content": f"### Context:\n{context.strip()}"}
+            )
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    @staticmethod
+    def _render(system_prompt: str, context: str, history: str, user_message: str):
+        """Lays out the final prompt."""
+        prompt = f"{system_prompt}\n\n### Context:\n{context}\n\n"
+        if history:
+            prompt += f"### Conversation so far:\n{history}\n"
+        return prompt + f"👤 User: {user_message}\n🤖 AI: "
+
+
+@lru_cache(maxsize=None)
+def get_prompt_builder() -> PromptBuilder:
+    """
+    Returns the process-wide PromptBuilder.
+    """
+    return PromptBuilder()
@@ -1,10 +1,24 @@
 from .chroma_service import (
+    close_chroma_client,
+    delete_chunks,
+    get_chroma_client,
     get_chroma_collection,
+    get_chunks_by_document_ids,
     query_by_embedding,
+    reset_chroma_collection,
+    update_chunk_metadatas,
     upsert_documents_with_embeddings,
 )
-from .embedder import EmbeddingModel, EmbeddingService
+from .embedder import (
+    EmbeddingModel,
+    EmbeddingModelRegistry,
+    EmbeddingService,
+    get_embedding_service,
+)
+from .embedding_cache import EmbeddingCache, get_embedding_cache
 from .indexer import Indexer
+from .manifest import DocumentManifest, get_document_manifest, release_chunks
+from .micro_batcher import QueryMicroBatcher
 from .segment import CustomSegment
 from .text_extractor import ExtractionResult, TextExtractor
 
@@ -12,18 +26,36 @@ from .text_extractor import ExtractionResult, TextExtractor
 from .web_search import (
     DuckDuckGoSearchService,
     WebSearchService,
+    close_http_client,
+    get_http_client,
 )
 
 __all__ = [
     "EmbeddingService",
     "EmbeddingModel",
+    "EmbeddingModelRegistry",
+    "get_embedding_service",
+    "EmbeddingCache",
+    "get_embedding_cache",
+    "QueryMicroBatcher",
     "Indexer",
     "CustomSegment",
     "TextExtractor",
     "ExtractionResult",
     "WebSearchService",
     "DuckDuckGoSearchService",
+    "get_http_client",
+    "close_http_client",
+    "get_chroma_client",
     "get_chroma_collection",
+    "close_chroma_client",
+    "reset_chroma_collection",
+    "DocumentManifest",
+    "get_document_manifest",
+    "release_chunks",
     "upsert_documents_with_embeddings",
+    "get_chunks_by_document_ids",
+    "update_chunk_metadatas",
+    "delete_chunks",
     "query_by_embedding",
 ]
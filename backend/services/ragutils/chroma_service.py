@@ -1,20 +1,45 @@
 """
 Manages a ChromaDB collection using your custom SentenceTransformer embeddings.
+
+A single PersistentClient is opened per process and collection handles are cached by
+name, so the hot path never re-opens the SQLite store or reloads the HNSW index.
 """
 
-from typing import Any, Dict, List
+import threading
+from typing import Any, Dict, List, Optional, Union
 
 import chromadb
+import numpy as np
 
 # Where Chroma will store data
 CHROMA_DB_PATH = "./chroma_db"
 COLLECTION_NAME = "rag_collection"
 
+_client: Optional[Any] = None
+_collections: Dict[str, Any] = {}
+_client_lock = threading.RLock()
+
+
+def get_chroma_client():
+    """
+    Returns the process-wide Chroma PersistentClient, opening it on first use.
+
+    Returns:
+        chromadb.ClientAPI: The shared ChromaDB client.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+    return _client
+
 
 def get_chroma_collection(collection_name: str = COLLECTION_NAME):
     """
     Returns a Chroma collection, creating one if necessary.
     We'll pass embeddings in manually (rather than using an embedding_function).
+    Handles are cached by name and shared across requests.
 
     Args:
         collection_name (str): The name of the ChromaDB collection to retrieve or create.
@@ -22,65 +47,106 @@ def get_chroma_collection(collection_name: str = COLLECTION_NAME):
     Returns:
         chromadb.Collection: The ChromaDB collection object.
     """
-    client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-    collection = client.get_or_create_collection(collection_name)
+    collection = _collections.get(collection_name)
+    if collection is None:
+        with _client_lock:
+            collection = _collections.get(collection_name)
+            if collection is None:
+                collection = get_chroma_client().get_or_create_collection(
+                    collection_name
+                )
+                _collections[collection_name] = collection
     return collection
 
 
+def reset_chroma_collection(collection_name: str = COLLECTION_NAME):
+    """
+    Drops a collection and recreates it empty, refreshing the cached handle.
+    Much cheaper than fetching and deleting every ID.
+
+    Args:
+        collection_name (str): The name of the ChromaDB collection to reset.
+
+    Returns:
+        chromadb.Collection: The new, empty collection.
+    """
+    with _client_lock:
+        client = get_chroma_client()
+        _collections.pop(collection_name, None)
+        if collection_name in [
+            c if isinstance(c, str) else c.name for c in client.list_collections()
+        ]:
+            client.delete_collection(collection_name)
+        collection = client.get_or_create_collection(collection_name)
+        _collections[collection_name] = collection
+    return collection
+
+
+def close_chroma_client() -> None:
+    """
+    Drops the cached collection handles and closes the shared client.
+    Called from the application lifespan on shutdown.
+    """
+    global _client
+    with _client_lock:
+        _collections.clear()
+        if _client is not None:
+            close = getattr(_client, "close", None)
+            if close is not None:
+                close()
+            else:
+                _client.clear_system_cache()
+            _client = None
+
+
 def upsert_documents_with_embeddings(
     texts: List[str],
-    embeddings: List[List[float]],
+    embeddings: Union[np.ndarray, List[List[float]]],
     metadatas: List[Dict[str, Any]],
     ids: List[str],
     collection_name: str = COLLECTION_NAME,
+    batch_size: Optional[int] = None,
 ):
     """
-    Upserts (adds) text + precomputed embeddings into a ChromaDB collection.
+    Upserts text + precomputed embeddings into a ChromaDB collection.
 
-    If documents with the same IDs already exist in ChromaDB, they will be deleted before
-    inserting new entries. This prevents duplicate data and ensures the latest embeddings
-    are stored.
+    Uses Chroma's native upsert, so entries whose IDs already exist are replaced in
+    place and only the IDs being written are touched; the cost scales with the
+    document being indexed, not with the size of the collection. Large inputs are
+    written in chunks that respect the client's maximum batch size.
 
     Args:
         texts (List[str]): List of document chunks' textual content.
-        embeddings (List[List[float]]): List of embedding vectors corresponding to `texts`.
+        embeddings (np.ndarray | List[List[float]]): Embedding vectors corresponding to `texts`.
         metadatas (List[Dict[str, Any]]): Metadata associated with each chunk (e.g., source, title).
         ids (List[str]): Unique identifiers for each chunk.
         collection_name (str): The name of the ChromaDB collection where the data will be stored.
+        batch_size (int, optional): Number of entries per write. Defaults to the
+            client's maximum batch size.
 
     Returns:
         None
     """
     collection = get_chroma_collection(collection_name)
-
-    # Fetch metadata to get existing IDs, since "ids" is not a valid include field
-    existing_data = collection.get(include=["metadatas"])
-
-    # Extract existing IDs from metadata if they exist
-    existing_ids = set(
-        meta["id"] for meta in existing_data.get("metadatas", []) if "id" in meta
-    )
-
-    # Identify IDs that are already present in the collection
-    ids_to_delete = [doc_id for doc_id in ids if doc_id in existing_ids]
-
-    if ids_to_delete:
-        collection.delete(ids=ids_to_delete)
-        print(f"Removed {len(ids_to_delete)} old entries before inserting new ones.")
-
-    # Insert new document chunks along with their embeddings and metadata
-    collection.add(
-        documents=texts,
-        embeddings=embeddings,
-        metadatas=[{**meta, "id": doc_id} for meta, doc_id in zip(metadatas, ids)],
-        ids=ids,
-    )
+    batch_size = batch_size or get_chroma_client().get_max_batch_size()
+
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        collection.upsert(
+            documents=texts[start:end],
+            embeddings=embeddings[start:end],
+            metadatas=[
+                {**meta, "id": doc_id}
+                for meta, doc_id in zip(metadatas[start:end], ids[start:end])
+            ],
+            ids=ids[start:end],
+        )
 
     print(f"Upserted {len(texts)} documents into Chroma collection '{collection_name}'")
 
 
 def query_by_embedding(
-    query_embedding: List[float],
+    query_embedding: Union[np.ndarray, List[float]],
     n_results: int = 5,
     collection_name: str = COLLECTION_NAME,
 ):
@@ -88,7 +154,7 @@ def query_by_embedding(
     Query the ChromaDB collection by passing in your precomputed query embedding.
 
     Args:
-        query_embedding (List[float]): Embedding vector for the search query.
+        query_embedding (np.ndarray | List[float]): Embedding vector for the search query.
         n_results (int): The number of most relevant results to retrieve.
         collection_name (str): The name of the ChromaDB collection to query.
 
@@ -101,3 +167,85 @@ def query_by_embedding(
     results = collection.query(query_embeddings=[query_embedding], n_results=n_results)
 
     return results
+
+
+def get_chunks_by_document_ids(
+    document_ids: List[str],
+    include: Optional[List[str]] = None,
+    collection_name: str = COLLECTION_NAME,
+) -> Dict[str, Dict[str, list]]:
+    """
+    Fetches the stored chunks of several documents with one filtered read.
+
+    Args:
+        document_ids (List[str]): Values of the chunks' "document_id" metadata.
+        include (List[str], optional): Fields to return (metadatas are always returned).
+        collection_name (str): The name of the ChromaDB collection to read.
+
+    Returns:
+        dict: document_id -> {"ids": [...], "metadatas": [...], ...other fields}.
+    """
+    if not document_ids:
+        return {}
+    fields = sorted({"metadatas", *(include or [])})
+    results = get_chroma_collection(collection_name).get(
+        where={"document_id": {"$in": list(document_ids)}}, include=fields
+    )
+
+    grouped: Dict[str, Dict[str, list]] = {}
+    for i, chunk_id in enumerate(results["ids"]):
+        document_id = results["metadatas"][i]["document_id"]
+        entry = grouped.setdefault(
+            document_id, {"ids": [], **{field: [] for field in fields}}
+        )
+        entry["ids"].append(chunk_id)
+        for field in fields:
+            entry[field].append(results[field][i])
+    return grouped
+
+
+def update_chunk_metadatas(
+    ids: List[str],
+    metadatas: List[Dict[str, Any]],
+    collection_name: str = COLLECTION_NAME,
+    batch_size: Optional[int] = None,
+) -> None:
+    """
+    Rewrites the metadata of existing chunks, leaving their text and embeddings as is.
+
+    Args:
+        ids (List[str]): IDs of the chunks to update.
+        metadatas (List[Dict[str, Any]]): The new metadata of each chunk.
+        collection_name (str): The name of the ChromaDB collection.
+        batch_size (int, optional): Number of chunks per update. Defaults to the
+            client's maximum batch size.
+    """
+    if not ids:
+        return
+    collection = get_chroma_collection(collection_name)
+    batch_size = batch_size or get_chroma_client().get_max_batch_size()
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        collection.update(ids=ids[start:end], metadatas=metadatas[start:end])
+
+
+def delete_chunks(
+    ids: List[str],
+    collection_name: str = COLLECTION_NAME,
+    batch_size: Optional[int] = None,
+) -> None:
+    """
+    Deletes chunks by ID.
+
+    Args:
+        ids (List[str]): IDs of the chunks to delete.
+        collection_name (str): The name of the ChromaDB collection.
+        batch_size (int, optional): Number of chunks per delete. Defaults to the
+            client's maximum batch size.
+    """
+    if not ids:
+        return
+    collection = get_chroma_collection(collection_name)
+    batch_size = batch_size or get_chroma_client().get_max_batch_size()
+    for start in range(0, len(ids), batch_size):
+        collection.delete(ids=ids[start : start + batch_size])
@@ -1,13 +1,20 @@
 import asyncio
 import logging
+import os
+import resource
+import threading
 from concurrent.futures import ThreadPoolExecutor
-from typing import Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
+import numpy as np
 import torch
-from config.config import AVAILABLE_EMBEDDING_MODELS
+from config.config import AVAILABLE_EMBEDDING_MODELS, EMBEDDING_BATCH_CONFIG
 from langdetect import DetectorFactory
 from pydantic import BaseModel
 from sentence_transformers import SentenceTransformer
+from services.ragutils.embedding_cache import EmbeddingCache, get_embedding_cache
+from services.ragutils.micro_batcher import QueryMicroBatcher
 
 # Ensure consistent results from langdetect
 DetectorFactory.seed = 0
@@ -33,15 +40,100 @@ class EmbeddingModel(BaseModel):
     description: Optional[str] = None
 
 
+def _current_rss_bytes() -> int:
+    """Returns the resident set size of the current process, in bytes."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Non-Linux fallback: peak RSS (reported in KiB on Linux, bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class EmbeddingModelRegistry:
+    """
+    Process-wide registry that loads each SentenceTransformer model exactly once
+    and hands out the shared instance to every EmbeddingService.
+    """
+
+    def __init__(self, device: str = DEVICE) -> None:
+        self.device = device
+        self._models: Dict[str, SentenceTransformer] = {}
+        self._memory: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def get_model(self, model: EmbeddingModel) -> SentenceTransformer:
+        """
+        Returns the loaded SentenceTransformer for `model`, loading it on first use.
+
+        Args:
+            model (EmbeddingModel): Configuration of the model to load.
+
+        Returns:
+            SentenceTransformer: The shared model instance.
+        """
+        st_model = self._models.get(model.name)
+        if st_model is not None:
+            return st_model
+
+        with self._lock:
+            st_model = self._models.get(model.name)
+            if st_model is None:
+                logger.info(f"Loading SentenceTransformer model: {model.name}")
+                rss_before = _current_rss_bytes()
+                st_model = SentenceTransformer(model.model_path, device=self.device)
+                self._memory[model.name] = {
+                    "parameter_bytes": sum(
+                        t.numel() * t.element_size()
+                        for t in (*st_model.parameters(), *st_model.buffers())
+                    ),
+                    "rss_delta_bytes": max(_current_rss_bytes() - rss_before, 0),
+                }
+                self._models[model.name] = st_model
+        return st_model
+
+    def memory_report(self) -> Dict[str, Any]:
+        """
+        Reports the memory held by each loaded model and by the whole process.
+
+        Returns:
+            dict: Per-model parameter size and RSS growth measured at load time,
+            plus the current process RSS.
+        """
+        return {
+            "models": {name: dict(stats) for name, stats in self._memory.items()},
+            "process_rss_bytes": _current_rss_bytes(),
+        }
+
+
+# Shared by every EmbeddingService created in this process
+MODEL_REGISTRY = EmbeddingModelRegistry()
+
+
 class EmbeddingService:
     """Service to manage and generate embeddings using multiple SentenceTransformer models."""
 
-    def __init__(self) -> None:
-        """Initializes the EmbeddingService by loading available models and preloading them."""
+    def __init__(
+        self,
+        registry: Optional[EmbeddingModelRegistry] = None,
+        cache: Optional[EmbeddingCache] = None,
+    ) -> None:
+        """
+        Initializes the EmbeddingService with models from the shared registry.
+
+        Args:
+            registry (EmbeddingModelRegistry, optional): Registry holding the loaded
+                models. Defaults to the process-wide MODEL_REGISTRY.
+            cache (EmbeddingCache, optional): Embedding cache consulted before
+                encoding. Defaults to the process-wide cache (if enabled).
+        """
+        self.registry = registry if registry else MODEL_REGISTRY
+        self.cache = cache if cache else get_embedding_cache()
         self.models: Dict[str, SentenceTransformer] = {}
         self.embedding_models: List[EmbeddingModel] = self._load_available_models()
         self._initialize_models()
         self.executor = ThreadPoolExecutor(max_workers=torch.cuda.device_count() or 4)
+        self.query_batcher = QueryMicroBatcher(self._embed_queries)
 
     def _load_available_models(self) -> List[EmbeddingModel]:
         """Loads available embedding models from the configuration."""
@@ -58,15 +150,10 @@ class EmbeddingService:
         return embedding_models
 
     def _initialize_models(self) -> None:
-        """Preloads all embedding models to optimize performance during runtime."""
+        """Fetches all embedding models from the registry (loading them only once)."""
         for model in self.embedding_models:
             try:
-                logger.info(f"Loading SentenceTransformer model: {model.name}")
-                st_model = SentenceTransformer(
-                    model.model_path,
-                    device=DEVICE,
-                )
-                self.models[model.name] = st_model
+                self.models[model.name] = self.registry.get_model(model)
             except Exception as e:
                 logger.error(
                     f"Failed to load SentenceTransformer model {model.name}: {str(e)}"
@@ -76,30 +163,152 @@ class EmbeddingService:
         """Retrieves the list of available embedding models."""
         return self.embedding_models
 
-    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generates embeddings for a list of texts using the appropriate models with GPU optimization."""
+    async def get_embeddings(self, texts: List[str]) -> np.ndarray:
+        """
+        Generates embeddings for a list of texts.
+
+        Cached embeddings are reused; the remaining texts are encoded in a single
+        executor call, in length-sorted batches sized by a token budget, and the rows
+        are returned in the original input order.
+
+        Returns:
+            np.ndarray: A float32 matrix with one embedding row per input text
+            (empty if any text is blank).
+        """
         if not texts or not all(
             isinstance(text, str) and text.strip() for text in texts
         ):
-            return []
-
-        embeddings: List[List[float]] = []
-
-        async def process_batch(
-            batch_texts: List[str], model: SentenceTransformer
-        ) -> List[List[float]]:
-            """Processes a batch of texts asynchronously."""
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(
-                self.executor,
-                lambda: model.encode(
-                    batch_texts, show_progress_bar=False, batch_size=32
-                ),
+            return np.empty((0, 0), dtype=np.float32)
+
+        return await self._embed(texts, persist=True)
+
+    async def embed_query(self, text: str) -> np.ndarray:
+        """
+        Embeds a single search query, micro-batched with concurrent queries.
+
+        Args:
+            text (str): The query text.
+
+        Returns:
+            np.ndarray: The float32 query embedding (empty if the text is blank).
+        """
+        embedding: np.ndarray = await self.query_batcher.embed(text)
+        return embedding
+
+    async def _embed_queries(self, texts: List[str]) -> np.ndarray:
+        """Embeds a batch of (non-blank) queries, cached in memory only."""
+        return await self._embed(texts, persist=False)
+
+    async def _embed(self, texts: List[str], persist: bool) -> np.ndarray:
+        """Runs `_embed_with_cache` on the executor."""
+        model_name = self.embedding_models[0].name
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self.executor, self._embed_with_cache, model_name, texts, persist
+        )
+
+    async def aclose(self) -> None:
+        """
+        Stops background work (the query micro-batcher) and closes the embedding
+        cache, writing its pending `last_used` refreshes.
+        """
+        await self.query_batcher.close()
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.close)
+
+    def _embed_with_cache(
+        self, model_name: str, texts: List[str], persist: bool = True
+    ) -> np.ndarray:
+        """
+        Serves `texts` from the cache and encodes only the misses (blocking).
+
+        With `persist` off (search queries) the disk tier is neither read nor
+        written, keeping SQLite off the chat latency path.
+        """
+        model = self.models[model_name]
+        if self.cache is None:
+            return self._encode_batched(model, texts)
+
+        cached = self.cache.get_many(model_name, texts, use_disk=persist)
+        # Encode each distinct missing text once
+        missing = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+        if not missing:
+            return np.vstack(cached).astype(np.float32, copy=False)
+
+        encoded = self._encode_batched(model, missing)
+        self.cache.put_many(model_name, missing, encoded, persist=persist)
+        if len(missing) == len(texts):
+            return encoded
+
+        rows = dict(zip(missing, encoded))
+        return np.vstack(
+            [
+                vector if vector is not None else rows[text]
+                for text, vector in zip(texts, cached)
+            ]
+        ).astype(np.float32, copy=False)
+
+    def _encode_batched(
+        self, model: SentenceTransformer, texts: List[str]
+    ) -> np.ndarray:
+        """Encodes `texts` batch by batch and restores the input order (blocking)."""
+        max_tokens = model.max_seq_length or 512
+        lengths = [self._estimate_tokens(text, max_tokens) for text in texts]
+        order = sorted(range(len(texts)), key=lambda i: lengths[i], reverse=True)
+
+        embeddings: Optional[np.ndarray] = None
+        for batch in self._plan_batches(order, lengths):
+            batch_embeddings = model.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                show_progress_bar=False,
+                convert_to_numpy=True,
             )
+            if embeddings is None:
+                embeddings = np.empty(
+                    (len(texts), batch_embeddings.shape[1]), dtype=np.float32
+                )
+            embeddings[batch] = batch_embeddings
+
+        return embeddings if embeddings is not None else np.empty((0, 0), np.float32)
+
+    @staticmethod
+    def _estimate_tokens(text: str, max_tokens: int) -> int:
+        """Cheap token count estimate, capped at the model's truncation length."""
+        estimate = int(len(text) / EMBEDDING_BATCH_CONFIG.chars_per_token) + 2
+        return min(estimate, max_tokens)
+
+    @staticmethod
+    def _plan_batches(order: List[int], lengths: List[int]) -> List[List[int]]:
+        """
+        Groups length-sorted indices into batches whose padded size
+        (batch length x longest text) stays within the configured token budget.
+        """
+        budget = EMBEDDING_BATCH_CONFIG.token_budget
+        max_batch_size = EMBEDDING_BATCH_CONFIG.max_batch_size
+
+        batches: List[List[int]] = []
+        current: List[int] = []
+        for index in order:
+            # Indices are sorted longest first, so current[0] sets the padded width
+            longest = lengths[current[0]] if current else lengths[index]
+            if current and (
+                (len(current) + 1) * longest > budget or len(current) >= max_batch_size
+            ):
+                batches.append(current)
+                current = []
+            current.append(index)
+        if current:
+            batches.append(current)
+        return batches
+
 
-        for text in texts:
-            model = self.models[self.embedding_models[0].name]
-            batch_embeddings = await process_batch([text], model)
-            embeddings.extend(batch_embeddings)
+@lru_cache(maxsize=None)
+def get_embedding_service() -> EmbeddingService:
+    """
+    Returns the process-wide EmbeddingService shared by routes and workflows.
 
-        return embeddings
+    Returns:
+        EmbeddingService: The shared embedding service.
+    """
+    return EmbeddingService()
@@ -0,0 +1,258 @@
+"""
+Content-addressed cache for chunk embeddings, keyed by (model name, SHA-256 of the text).
+
+Two tiers are used: an in-memory LRU for hot entries and an optional SQLite file
+so that re-indexing unchanged documents survives process restarts. One-off vectors
+(search queries) are kept in memory only.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from config.config import EMBEDDING_CACHE_CONFIG, EmbeddingCacheConfig
+from services.ragutils.utils import sha256_text
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str]
+
+# Disk hits refresh `last_used` in one write once this many have accumulated (or
+# with the next insert), instead of a commit per lookup
+TOUCH_FLUSH_SIZE = 1024
+
+
+class EmbeddingCache:
+    """
+    Two-tier (memory LRU + SQLite) cache of float32 embedding vectors.
+
+    All methods are blocking and thread-safe; call them from an executor thread.
+    """
+
+    def __init__(self, config: EmbeddingCacheConfig = EMBEDDING_CACHE_CONFIG) -> None:
+        """
+        Initializes the cache tiers described by `config`.
+
+        Args:
+            config (EmbeddingCacheConfig): Size limits and on-disk location.
+        """
+        self.config = config
+        self._memory: "OrderedDict[CacheKey, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_entries = 0
+        # Disk hits whose `last_used` has not been written yet
+        self._touched: Dict[CacheKey, float] = {}
+        if config.disk_path:
+            os.makedirs(os.path.dirname(config.disk_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(config.disk_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used "
+                "ON embeddings (last_used)"
+            )
+            self._conn.commit()
+            self._disk_entries = self._conn.execute(
+                "SELECT COUNT(*) FROM embeddings"
+            ).fetchone()[0]
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """Returns the content address (SHA-256 hex digest) of a chunk of text."""
+        digest: str = sha256_text(text)
+        return digest
+
+    def get_many(
+        self, model_name: str, texts: List[str], use_disk: bool = True
+    ) -> List[Optional[np.ndarray]]:
+        """
+        Looks up cached embeddings for `texts`.
+
+        Args:
+            model_name (str): Name of the embedding model.
+            texts (List[str]): Texts to look up.
+            use_disk (bool): Whether memory misses are looked up on disk.
+
+        Returns:
+            List[Optional[np.ndarray]]: One vector per text, or None on a miss.
+        """
+        keys = [(model_name, self.text_hash(text)) for text in texts]
+        found: List[Optional[np.ndarray]] = [None] * len(texts)
+        disk_lookups: Dict[str, List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[i] = vector
+                    self._counters["memory_hits"] += 1
+                else:
+                    disk_lookups.setdefault(key[1], []).append(i)
+
+            if disk_lookups and use_disk and self._conn is not None:
+                for text_hash, vector in self._read_disk(model_name, disk_lookups):
+                    self._remember((model_name, text_hash), vector)
+                    for i in disk_lookups.pop(text_hash):
+                        found[i] = vector
+                        self._counters["disk_hits"] += 1
+
+            self._counters["misses"] += sum(len(idx) for idx in disk_lookups.values())
+        return found
+
+    def put_many(
+        self,
+        model_name: str,
+        texts: List[str],
+        vectors: np.ndarray,
+        persist: bool = True,
+    ) -> None:
+        """
+        Stores freshly computed embeddings.
+
+        Args:
+            model_name (str): Name of the embedding model.
+            texts (List[str]): Texts that were embedded.
+            vectors (np.ndarray): One embedding row per text.
+            persist (bool): Whether they are also written to the disk tier.
+        """
+        if not texts:
+            return
+        # Copy: the caller gets the same matrix back and may modify it
+        vectors = np.array(vectors, dtype=np.float32)
+        hashes = [self.text_hash(text) for text in texts]
+
+        with self._lock:
+            for text_hash, vector in zip(hashes, vectors):
+                self._remember((model_name, text_hash), vector)
+
+            if persist and self._conn is not None:
+                self._flush_touched()
+                now = time.time()
+                cursor = self._conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?, ?)",
+                    [
+                        (model_name, text_hash, vector.tobytes(), now)
+                        for text_hash, vector in zip(hashes, vectors)
+                    ],
+                )
+                self._disk_entries += max(cursor.rowcount, 0)
+                self._evict_disk()
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Returns hit/miss/eviction counters and the size of each tier."""
+        with self._lock:
+            return {
+                **self._counters,
+                "memory_entries": len(self._memory),
+                "disk_entries": self._disk_entries,
+            }
+
+    def close(self) -> None:
+        """Closes the on-disk tier."""
+        with self._lock:
+            if self._conn is not None:
+                self._flush_touched()
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+
+    def _remember(self, key: CacheKey, vector: np.ndarray) -> None:
+        """Inserts into the memory LRU, evicting the least recently used entries."""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.config.memory_max_entries:
+            self._memory.popitem(last=False)
+            self._counters["memory_evictions"] += 1
+
+    def _read_disk(self, model_name: str, lookups: Dict[str, List[int]]):
+        """Reads the requested hashes from SQLite and marks them as recently used."""
+        assert self._conn is not None  # nosec B101
+        hashes = list(lookups)
+        rows = []
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(hashes), 500):
+            part = hashes[start : start + 500]
+            placeholders = ",".join("?" * len(part))
+            rows.extend(
+                self._conn.execute(
+                    "SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",  # nosec B608
+                    [model_name, *part],
+                ).fetchall()
+            )
+
+        now = time.time()
+        for text_hash, _ in rows:
+            self._touched[(model_name, text_hash)] = now
+        if len(self._touched) >= TOUCH_FLUSH_SIZE:
+            self._flush_touched()
+            self._conn.commit()
+        return [
+            (text_hash, np.frombuffer(blob, dtype=np.float32))
+            for text_hash, blob in rows
+        ]
+
+    def _flush_touched(self) -> None:
+        """Writes the pending `last_used` refreshes (the caller commits)."""
+        assert self._conn is not None  # nosec B101
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [
+                    (now, model, text_hash)
+                    for (model, text_hash), now in self._touched.items()
+                ],
+            )
+            self._touched.clear()
+
+    def _evict_disk(self) -> None:
+        """Drops the least recently used rows once the disk tier exceeds its limit."""
+        assert self._conn is not None  # nosec B101
+        excess = self._disk_entries - self.config.disk_max_entries
+        if excess <= 0:
+            return
+        cursor = self._conn.execute(
+            "DELETE FROM embeddings WHERE (model, text_hash) IN ("
+            "SELECT model, text_hash FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        evicted = max(cursor.rowcount, 0)
+        self._disk_entries -= evicted
+        self._counters["disk_evictions"] += evicted
+
+
+@lru_cache(maxsize=None)
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Returns the process-wide embedding cache, or None when caching is disabled.
+    """
+    if not EMBEDDING_CACHE_CONFIG.enabled:
+        return None
+    return EmbeddingCache()
@@ -0,0 +1,397 @@
+"""
+Per-file manifest of what is indexed in ChromaDB.
+
+For every indexed file the manifest keeps its content hash, its chunk IDs (with a
+hash of each chunk's text) and when it was indexed, so that listing, fetching and
+deleting a document never require scanning the whole collection.
+
+Files with identical content share one set of chunks: a chunk is only deleted from
+ChromaDB once no file in the manifest refers to it any more. The content hash of
+every upload is kept too, so identical uploads can be stored only once.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.ragutils.chroma_service import (
+    CHROMA_DB_PATH,
+    COLLECTION_NAME,
+    delete_chunks,
+    update_chunk_metadatas,
+)
+from services.ragutils.utils import sha256_text
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_DB_PATH = os.path.join(CHROMA_DB_PATH, "manifest.sqlite3")
+
+# Page size used when backfilling the manifest from an existing collection
+BACKFILL_PAGE_SIZE = 1000
+
+
+class DocumentManifest:
+    """
+    SQLite-backed mapping of filename -> chunk IDs, chunk count, indexed-at and
+    content hash, kept per Chroma collection.
+    """
+
+    def __init__(self, db_path: str = MANIFEST_DB_PATH) -> None:
+        """
+        Opens (or creates) the manifest database.
+
+        Args:
+            db_path (str): Location of the SQLite file.
+        """
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    collection TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    content_hash TEXT,
+                    chunk_count INTEGER NOT NULL,
+                    indexed_at REAL NOT NULL,
+                    PRIMARY KEY (collection, filename)
+                );
+                CREATE TABLE IF NOT EXISTS chunks (
+                    collection TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    chunk_index INTEGER NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    chunk_hash TEXT,
+                    PRIMARY KEY (collection, filename, chunk_index)
+                );
+                CREATE INDEX IF NOT EXISTS idx_documents_content_hash
+                    ON documents (collection, content_hash);
+                CREATE INDEX IF NOT EXISTS idx_chunks_chunk_id
+                    ON chunks (collection, chunk_id);
+                CREATE TABLE IF NOT EXISTS uploads (
+                    filename TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    uploaded_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_uploads_content_hash
+                    ON uploads (content_hash);
+                CREATE TABLE IF NOT EXISTS backfills (
+                    collection TEXT PRIMARY KEY,
+                    backfilled_at REAL NOT NULL
+                );
+                """
+            )
+            self._conn.commit()
+
+    def record_document(
+        self,
+        filename: str,
+        content_hash: Optional[str],
+        chunk_ids: List[str],
+        chunk_hashes: List[Optional[str]],
+        collection_name: str = COLLECTION_NAME,
+    ) -> None:
+        """
+        Records (or replaces) the manifest entry of an indexed file.
+
+        Args:
+            filename (str): The indexed file.
+            content_hash (str, optional): SHA-256 of the file's bytes.
+            chunk_ids (List[str]): Chroma IDs of the file's chunks, in chunk order.
+            chunk_hashes (List[Optional[str]]): SHA-256 of each chunk's text.
+            collection_name (str): The Chroma collection holding the chunks.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM chunks WHERE collection = ? AND filename = ?",
+                (collection_name, filename),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?)",
+                (collection_name, filename, content_hash, len(chunk_ids), time.time()),
+            )
+            self._conn.executemany(
+                "INSERT INTO chunks VALUES (?, ?, ?, ?, ?)",
+                [
+                    (collection_name, filename, index, chunk_id, chunk_hash)
+                    for index, (chunk_id, chunk_hash) in enumerate(
+                        zip(chunk_ids, chunk_hashes)
+                    )
+                ],
+            )
+
+    def get_document(
+        self, filename: str, collection_name: str = COLLECTION_NAME
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Returns the manifest entry of a file, including its ordered chunk IDs.
+
+        Args:
+            filename (str): The indexed file.
+            collection_name (str): The Chroma collection holding the chunks.
+
+        Returns:
+            dict | None: The entry, or None if the file is not in the manifest.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM documents WHERE collection = ? AND filename = ?",
+                (collection_name, filename),
+            ).fetchone()
+            if row is None:
+                return None
+            chunks = self._conn.execute(
+                "SELECT chunk_id, chunk_hash FROM chunks "
+                "WHERE collection = ? AND filename = ? ORDER BY chunk_index",
+                (collection_name, filename),
+            ).fetchall()
+        return {
+            **self._document_row(row),
+            "chunk_ids": [chunk["chunk_id"] for chunk in chunks],
+            "chunk_hashes": [chunk["chunk_hash"] for chunk in chunks],
+        }
+
+    def find_by_content_hash(
+        self,
+        content_hash: str,
+        exclude_filename: Optional[str] = None,
+        collection_name: str = COLLECTION_NAME,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Returns an indexed file with the given content hash, if there is one.
+
+        Args:
+            content_hash (str): SHA-256 of the file's bytes.
+            exclude_filename (str, optional): A file to leave out of the search.
+            collection_name (str): The Chroma collection holding the chunks.
+
+        Returns:
+            dict | None: The entry of the first matching file, as `get_document`.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT filename FROM documents "
+                "WHERE collection = ? AND content_hash = ? AND filename != ? "
+                "ORDER BY indexed_at LIMIT 1",
+                (collection_name, content_hash, exclude_filename or ""),
+            ).fetchone()
+        if row is None:
+            return None
+        return self.get_document(row["filename"], collection_name=collection_name)
+
+    def chunk_references(
+        self, chunk_ids: List[str], collection_name: str = COLLECTION_NAME
+    ) -> Dict[str, str]:
+        """
+        Finds which of `chunk_ids` are still referenced by a file in the manifest.
+
+        Args:
+            chunk_ids (List[str]): The chunk IDs to look up.
+            collection_name (str): The Chroma collection holding the chunks.
+
+        Returns:
+            Dict[str, str]: Referenced chunk ID -> one file referring to it.
+        """
+        references: Dict[str, str] = {}
+        unique_ids = list(dict.fromkeys(chunk_ids))
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique_ids), 500):
+                part = unique_ids[start : start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    "SELECT chunk_id, MIN(filename) AS filename FROM chunks "
+                    f"WHERE collection = ? AND chunk_id IN ({placeholders}) "  # nosec B608
+                    "GROUP BY chunk_id",
+                    [collection_name, *part],
+                ).fetchall()
+                references.update((row["chunk_id"], row["filename"]) for row in rows)
+        return references
+
+    def list_documents(
+        self, offset: int = 0, limit: int = 100, collection_name: str = COLLECTION_NAME
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Lists indexed files, ordered by filename.
+
+        Args:
+            offset (int): Number of entries to skip.
+            limit (int): Maximum number of entries to return.
+            collection_name (str): The Chroma collection holding the chunks.
+
+        Returns:
+            Tuple[int, List[dict]]: The total number of files and the requested page.
+        """
+        with self._lock:
+            total = self._conn.execute(
+                "SELECT COUNT(*) FROM documents WHERE collection = ?",
+                (collection_name,),
+            ).fetchone()[0]
+            rows = self._conn.execute(
+                "SELECT * FROM documents WHERE collection = ? "
+                "ORDER BY filename LIMIT ? OFFSET ?",
+                (collection_name, limit, offset),
+            ).fetchall()
+        return total, [self._document_row(row) for row in rows]
+
+    def remove_document(
+        self, filename: str, collection_name: str = COLLECTION_NAME
+    ) -> None:
+        """Removes a file from the manifest."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM chunks WHERE collection = ? AND filename = ?",
+                (collection_name, filename),
+            )
+            self._conn.execute(
+                "DELETE FROM documents WHERE collection = ? AND filename = ?",
+                (collection_name, filename),
+            )
+
+    def clear(self, collection_name: str = COLLECTION_NAME) -> None:
+        """Removes every file of a collection from the manifest."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM chunks WHERE collection = ?", (collection_name,)
+            )
+            self._conn.execute(
+                "DELETE FROM documents WHERE collection = ?", (collection_name,)
+            )
+
+    def record_upload(self, filename: str, content_hash: str, size: int) -> None:
+        """Records (or replaces) the content hash of an uploaded file."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?)",
+                (filename, content_hash, size, time.time()),
+            )
+
+    def find_uploads(self, content_hash: str) -> List[str]:
+        """Returns the uploaded files with the given content hash, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filename FROM uploads WHERE content_hash = ? "
+                "ORDER BY uploaded_at",
+                (content_hash,),
+            ).fetchall()
+        return [row["filename"] for row in rows]
+
+    def remove_upload(self, filename: str) -> None:
+        """Forgets an uploaded file."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM uploads WHERE filename = ?", (filename,))
+
+    def backfill(self, collection, collection_name: str = COLLECTION_NAME) -> int:
+        """
+        Builds the manifest from an existing collection, page by page.
+        Runs only once per collection.
+
+        Args:
+            collection (chromadb.Collection): The collection to read.
+            collection_name (str): Name under which entries are recorded.
+
+        Returns:
+            int: The number of files added to the manifest.
+        """
+        with self._lock:
+            done = self._conn.execute(
+                "SELECT 1 FROM backfills WHERE collection = ?", (collection_name,)
+            ).fetchone()
+        if done:
+            return 0
+
+        files: Dict[str, Dict[int, Tuple[str, str]]] = {}
+        offset = 0
+        while True:
+            page = collection.get(
+                include=["documents", "metadatas"],
+                limit=BACKFILL_PAGE_SIZE,
+                offset=offset,
+            )
+            if not page["ids"]:
+                break
+            for chunk_id, text, meta in zip(
+                page["ids"], page["documents"], page["metadatas"]
+            ):
+                if meta and "filename" in meta:
+                    index = meta.get(
+                        "chunk_index", len(files.get(meta["filename"], {}))
+                    )
+                    files.setdefault(meta["filename"], {})[index] = (
+                        chunk_id,
+                        sha256_text(text or ""),
+                    )
+            offset += len(page["ids"])
+
+        for filename, chunks in files.items():
+            ordered = [chunks[index] for index in sorted(chunks)]
+            self.record_document(
+                filename,
+                None,
+                [chunk_id for chunk_id, _ in ordered],
+                [chunk_hash for _, chunk_hash in ordered],
+                collection_name=collection_name,
+            )
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO backfills VALUES (?, ?)",
+                (collection_name, time.time()),
+            )
+        logger.info(f"Backfilled the document manifest with {len(files)} files.")
+        return len(files)
+
+    @staticmethod
+    def _document_row(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "filename": row["filename"],
+            "content_hash": row["content_hash"],
+            "chunk_count": row["chunk_count"],
+            "indexed_at": row["indexed_at"],
+        }
+
+
+@lru_cache(maxsize=None)
+def get_document_manifest() -> DocumentManifest:
+    """
+    Returns the process-wide document manifest.
+    """
+    return DocumentManifest()
+
+
+def release_chunks(
+    chunk_ids: List[str],
+    manifest: Optional[DocumentManifest] = None,
+    collection_name: str = COLLECTION_NAME,
+) -> int:
+    """
+    Deletes the chunks no file in the manifest refers to any more. Chunks that are
+    still shared are attributed to one of the files that keep them.
+
+    Call it after the file that held `chunk_ids` was removed from (or replaced in)
+    the manifest.
+
+    Args:
+        chunk_ids (List[str]): The chunk IDs the file used to hold.
+        manifest (DocumentManifest, optional): Defaults to the process-wide one.
+        collection_name (str): The Chroma collection holding the chunks.
+
+    Returns:
+        int: The number of chunks deleted.
+    """
+    manifest = manifest or get_document_manifest()
+    references = manifest.chunk_references(chunk_ids, collection_name=collection_name)
+    orphans = [chunk_id for chunk_id in chunk_ids if chunk_id not in references]
+    delete_chunks(orphans, collection_name=collection_name)
+    update_chunk_metadatas(
+        list(references),
+        [{"filename": filename} for filename in references.values()],
+        collection_name=collection_name,
+    )
+    return len(orphans)
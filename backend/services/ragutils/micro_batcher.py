@@ -0,0 +1,163 @@
+"""
+Cross-request micro-batching of query embeddings.
+
+Queries arriving within a few milliseconds of each other are embedded together in a
+single batched call, and each caller gets its own row back.
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+from config.config import QUERY_BATCHER_CONFIG, QueryBatcherConfig
+
+logger = logging.getLogger(__name__)
+
+# (query text, caller's future, enqueue time)
+_PendingQuery = Tuple[str, "asyncio.Future[np.ndarray]", float]
+
+
+class QueryMicroBatcher:
+    """
+    Collects single-query embedding requests and resolves them with one batched call.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], Awaitable[np.ndarray]],
+        config: QueryBatcherConfig = QUERY_BATCHER_CONFIG,
+    ) -> None:
+        """
+        Initializes the batcher.
+
+        Args:
+            embed_fn (Callable): Coroutine embedding a list of texts into a matrix.
+            config (QueryBatcherConfig): Maximum wait and maximum batch size.
+        """
+        self.embed_fn = embed_fn
+        self.config = config
+        self._queue: Optional["asyncio.Queue[_PendingQuery]"] = None
+        self._worker: Optional["asyncio.Task[None]"] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._batch_sizes: Counter = Counter()
+        self._queue_delays_ms: Deque[float] = deque(maxlen=1000)
+        self._queries = 0
+
+    async def embed(self, text: str) -> np.ndarray:
+        """
+        Embeds a single query, batching it with concurrent callers.
+
+        Args:
+            text (str): The query text.
+
+        Returns:
+            np.ndarray: The query embedding (empty if the text is blank).
+        """
+        if not text or not text.strip():
+            return np.empty((0,), dtype=np.float32)
+
+        queue = self._ensure_worker()
+        future: "asyncio.Future[np.ndarray]" = (
+            asyncio.get_running_loop().create_future()
+        )
+        await queue.put((text, future, time.perf_counter()))
+        return await future
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the batch size distribution and queueing delay percentiles.
+        """
+        delays = sorted(self._queue_delays_ms)
+
+        def percentile(p: float) -> float:
+            return round(delays[int(p * (len(delays) - 1))], 3) if delays else 0.0
+
+        return {
+            "queries": self._queries,
+            "batches": sum(self._batch_sizes.values()),
+            "batch_size_distribution": dict(sorted(self._batch_sizes.items())),
+            "queue_delay_ms": {
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": round(delays[-1], 3) if delays else 0.0,
+            },
+        }
+
+    async def close(self) -> None:
+        """Stops the worker and fails any query still waiting in the queue."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Query batcher is shut down."))
+
+    def _ensure_worker(self) -> "asyncio.Queue[_PendingQuery]":
+        """Starts the worker task on the running event loop if needed."""
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run(self._queue))
+        return self._queue
+
+    async def _run(self, queue: "asyncio.Queue[_PendingQuery]") -> None:
+        """Forms batches: waits for a first query, then up to `max_wait_ms` for more."""
+        loop = asyncio.get_running_loop()
+        max_wait = self.config.max_wait_ms / 1000
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + max_wait
+            while len(batch) < self.config.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._dispatch(batch)
+
+    async def _dispatch(self, batch: List[_PendingQuery]) -> None:
+        """Embeds one batch and resolves every caller's future."""
+        now = time.perf_counter()
+        self._batch_sizes[len(batch)] += 1
+        self._queries += len(batch)
+        self._queue_delays_ms.extend(
+            (now - enqueued) * 1000 for _, _, enqueued in batch
+        )
+
+        try:
+            vectors = await self.embed_fn([text for text, _, _ in batch])
+            if len(vectors) != len(batch):
+                raise RuntimeError(
+                    f"Expected {len(batch)} query embeddings, got {len(vectors)}."
+                )
+        except asyncio.CancelledError:
+            # Shut down mid-batch: do not leave these callers waiting forever
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Query batcher is shut down."))
+            raise
+        except Exception as e:
+            logger.error(f"Batched query embedding failed: {str(e)}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
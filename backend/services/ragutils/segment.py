@@ -1,4 +1,14 @@
 import re
+from itertools import islice
+from typing import Optional
+
+# Patterns are compiled once at import time
+_LINE_BREAKS_RE = re.compile(r"\n+")
+_PARAGRAPH_RE = re.compile(r"\n{2,}")
+_SENTENCE_RE = re.compile(r"(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\?|\!)\s")
+_TOKEN_RE = re.compile(r"\b\w+\b")
+# Matches exactly the same word runs as _TOKEN_RE, but is cheaper to scan
+_TOKEN_COUNT_RE = re.compile(r"\w+")
 
 
 class CustomSegment:
@@ -31,42 +41,69 @@ class CustomSegment:
             list: A list of segmented text chunks.
         """
         # Normalize multiple line breaks to single
-        text = re.sub(r"\n+", "\n", text)
+        text = _LINE_BREAKS_RE.sub("\n", text)
         paragraphs = self._split_into_paragraphs(text)
 
         chunks = []
-        current_chunk = ""
+        # Short paragraphs are merged until they reach `min_tokens`
+        current_parts: list = []
+        current_tokens = 0
 
         for paragraph in paragraphs:
-            tokens = self._tokenize(paragraph)
+            # Long paragraphs are re-counted sentence by sentence, so stop early
+            paragraph_tokens = self._count_tokens(paragraph, limit=self.max_tokens + 1)
 
-            if self.min_tokens <= len(tokens) <= self.max_tokens:
+            if self.min_tokens <= paragraph_tokens <= self.max_tokens:
                 chunks.append(paragraph.strip())
-            elif len(tokens) > self.max_tokens:
-                sentences = self._split_into_sentences(paragraph)
-                temp_chunk = ""
-                for sentence in sentences:
-                    temp_tokens = self._tokenize(temp_chunk + " " + sentence)
-                    if len(temp_tokens) <= self.max_tokens:
-                        temp_chunk += " " + sentence
-                    else:
-                        if temp_chunk:
-                            chunks.append(temp_chunk.strip())
-                        temp_chunk = sentence
-                if temp_chunk:
-                    chunks.append(temp_chunk.strip())
-            elif len(tokens) < self.min_tokens:
-                current_chunk += " " + paragraph
-                tokens_in_chunk = self._tokenize(current_chunk)
-                if len(tokens_in_chunk) >= self.min_tokens:
-                    chunks.append(current_chunk.strip())
-                    current_chunk = ""
-
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+            elif paragraph_tokens > self.max_tokens:
+                chunks.extend(self._pack_sentences(paragraph))
+            else:
+                current_parts.append(paragraph)
+                current_tokens += paragraph_tokens
+                if current_tokens >= self.min_tokens:
+                    chunks.append(self._join(current_parts))
+                    current_parts = []
+                    current_tokens = 0
+
+        if current_parts:
+            chunks.append(self._join(current_parts))
+
+        return chunks
+
+    def stream(self) -> "IncrementalSegmenter":
+        """
+        Returns a segmenter that accepts the text piece by piece (e.g. page by page).
+        """
+        return IncrementalSegmenter(self)
 
+    def _pack_sentences(self, paragraph: str) -> list:
+        """
+        Greedily packs the sentences of a long paragraph into chunks of at most
+        `max_tokens` tokens, keeping a running token count so that each sentence is
+        tokenized exactly once.
+
+        Args:
+            paragraph (str): A paragraph longer than `max_tokens`.
+
+        Returns:
+            list: The paragraph's chunks.
+        """
+        packer = _SentencePacker(self)
+        chunks = [
+            chunk
+            for chunk in map(packer.add, self._split_into_sentences(paragraph))
+            if chunk is not None
+        ]
+        last = packer.finish()
+        if last is not None:
+            chunks.append(last)
         return chunks
 
+    @staticmethod
+    def _join(parts: list) -> str:
+        """Joins accumulated pieces with single spaces and strips the result."""
+        return " ".join(parts).strip()
+
     def _split_into_paragraphs(self, text: str) -> list:
         """
         Splits text into individual paragraphs.
@@ -77,7 +114,7 @@ class CustomSegment:
         Returns:
             list: A list of paragraphs.
         """
-        paragraphs = re.split(r"\n{2,}", text)
+        paragraphs = _PARAGRAPH_RE.split(text)
         return [para.strip() for para in paragraphs if para.strip()]
 
     def _split_into_sentences(self, text: str) -> list:
@@ -90,7 +127,7 @@ class CustomSegment:
         Returns:
             list: A list of sentences.
         """
-        return re.split(r"(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\?|\!)\s", text)
+        return _SENTENCE_RE.split(text)
 
     def _tokenize(self, text: str) -> list:
         """
@@ -102,4 +139,126 @@ class CustomSegment:
         Returns:
             list: A list of tokens.
         """
-        return re.findall(r"\b\w+\b", text)
+        return _TOKEN_RE.findall(text)
+
+    def _count_tokens(self, text: str, limit: Optional[int] = None) -> int:
+        """
+        Counts the tokens of a text without building the token list.
+
+        Token counts are additive over space-joined pieces, which is what lets the
+        segmenter keep running totals instead of re-tokenizing accumulated chunks.
+
+        Args:
+            text (str): The input text.
+            limit (int, optional): Stop counting once this many tokens are found.
+
+        Returns:
+            int: The number of tokens (at most `limit`).
+        """
+        return sum(1 for _ in islice(_TOKEN_COUNT_RE.finditer(text), limit))
+
+
+class _SentencePacker:
+    """
+    Running state of CustomSegment._pack_sentences: sentences go in one at a time and
+    a chunk comes out whenever the next sentence would exceed `max_tokens`.
+    """
+
+    def __init__(self, segmenter: CustomSegment) -> None:
+        self.segmenter = segmenter
+        self.parts: list = []
+        self.tokens = 0
+        # Mirrors the truthiness of the accumulated chunk string: a chunk started
+        # from an empty sentence is empty until another sentence is appended.
+        self.has_content = False
+
+    def add(self, sentence: str) -> Optional[str]:
+        """Adds a sentence; returns the chunk it closed, if any."""
+        sentence_tokens = self.segmenter._count_tokens(sentence)
+        if self.tokens + sentence_tokens <= self.segmenter.max_tokens:
+            self.parts.append(sentence)
+            self.tokens += sentence_tokens
+            self.has_content = True
+            return None
+
+        chunk = self.segmenter._join(self.parts) if self.has_content else None
+        self.parts = [sentence]
+        self.tokens = sentence_tokens
+        self.has_content = bool(sentence)
+        return chunk
+
+    def finish(self) -> Optional[str]:
+        """Returns the last, partially filled chunk, if any."""
+        return self.segmenter._join(self.parts) if self.has_content else None
+
+
+class IncrementalSegmenter:
+    """
+    Streaming counterpart of CustomSegment.hybrid_segmentation.
+
+    Text is fed piece by piece and chunks are returned as soon as they are final, so
+    only the current sentence is buffered. Feeding the pieces of a text gives the
+    same chunks as segmenting the concatenated text at once.
+    """
+
+    def __init__(self, segmenter: CustomSegment) -> None:
+        """
+        Args:
+            segmenter (CustomSegment): Provides the token limits and helpers.
+        """
+        self.segmenter = segmenter
+        # Text seen so far, until it is known to exceed `max_tokens`
+        self._text = ""
+        self._packer: Optional[_SentencePacker] = None
+        # Unfinished last sentence (plus trailing whitespace) once packing started
+        self._tail = ""
+
+    def feed(self, text: str) -> list:
+        """
+        Adds the next piece of text.
+
+        Args:
+            text (str): The piece, appended verbatim to the previous ones.
+
+        Returns:
+            list: The chunks completed by this piece.
+        """
+        if self._packer is not None:
+            return self._pack(text)
+
+        self._text = _LINE_BREAKS_RE.sub("\n", self._text + text).lstrip()
+        limit = self.segmenter.max_tokens + 1
+        if self.segmenter._count_tokens(self._text, limit=limit) < limit:
+            return []
+
+        # Longer than `max_tokens`: the text is packed sentence by sentence
+        self._packer = _SentencePacker(self.segmenter)
+        text, self._text = self._text, ""
+        return self._pack(text)
+
+    def finish(self) -> list:
+        """
+        Returns the remaining chunks once all of the text has been fed.
+        """
+        if self._packer is None:
+            paragraph = self._text.strip()
+            self._text = ""
+            return [paragraph] if paragraph else []
+
+        chunks = [self._packer.add(self._tail.rstrip()), self._packer.finish()]
+        self._packer = None
+        self._tail = ""
+        return [chunk for chunk in chunks if chunk is not None]
+
+    def _pack(self, text: str) -> list:
+        """Packs every sentence that can no longer change, keeping the last one."""
+        buffer = _LINE_BREAKS_RE.sub("\n", self._tail + text)
+        # Splits only look behind, so any split before the trailing whitespace is
+        # final; the whitespace itself may still merge with the next piece.
+        end = len(buffer.rstrip())
+        sentences = self.segmenter._split_into_sentences(buffer[:end])
+        self._tail = sentences.pop() + buffer[end:]
+        assert self._packer is not None  # nosec B101
+        return [
+            chunk for chunk in map(self._packer.add, sentences) if chunk is not None
+        ]
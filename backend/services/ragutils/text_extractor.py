@@ -1,9 +1,11 @@
 import asyncio
 import logging
+import multiprocessing
 import os
 import sys
-from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Dict, Optional
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Deque, Dict, Optional
 
 import chardet
 import json_log_formatter
@@ -11,6 +13,7 @@ import pdfplumber
 from bs4 import BeautifulSoup
 from config.config import TEXT_EXTRACTOR_CONFIG
 from pydantic import BaseModel
+from services.pdf_pages import extract_pdf_pages
 
 # Configure structured logging with JSON formatter
 formatter = json_log_formatter.JSONFormatter()
@@ -22,6 +25,13 @@ logger.addHandler(json_handler)
 logger.setLevel(logging.INFO)
 
 
+def _usable_cpus() -> int:
+    """Number of CPUs this process may run on (respects affinity masks)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
 class ExtractionResult(BaseModel):
     """
     Model to represent the result of a text extraction process.
@@ -30,11 +40,13 @@ class ExtractionResult(BaseModel):
         text (Optional[str]): Extracted textual content.
         tables (Optional[list]): Extracted tables from the document.
         metadata (Optional[Dict[str, Any]]): Metadata extracted from the document.
+        page_count (Optional[int]): Number of pages extracted (PDF only).
     """
 
     text: Optional[str] = None
     tables: Optional[list] = None
     metadata: Optional[Dict[str, Any]] = None
+    page_count: Optional[int] = None
 
 
 class TextExtractor:
@@ -53,14 +65,23 @@ class TextExtractor:
         """
         self.config = config
         self.executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4)
+        # Created on first use: only large PDFs need it
+        self.process_pool: Optional[ProcessPoolExecutor] = None
         logger.info("TextExtractor initialized with configuration: %s", self.config)
 
-    async def extract_text(self, file_path: str) -> ExtractionResult:
+    async def extract_text(
+        self, file_path: str, extract_tables: bool = True
+    ) -> ExtractionResult:
         """
         Asynchronously extracts text from the given file based on its type.
 
+        Large PDFs are split into page ranges extracted in parallel processes
+        (pdfplumber is pure Python, so threads would not run concurrently).
+
         Args:
             file_path (str): Path to the file.
+            extract_tables (bool): Whether to extract tables as well (PDF only).
+                Disabling it roughly halves PDF extraction time.
 
         Returns:
             ExtractionResult: Extracted text, tables, and metadata.
@@ -89,15 +110,164 @@ class TextExtractor:
             )
 
         try:
-            result = await asyncio.get_event_loop().run_in_executor(
-                self.executor, extraction_method, file_path
-            )
+            if extraction_method_name == "extract_text_from_pdf":
+                result = await self._extract_pdf(file_path, extract_tables)
+            else:
+                result = await asyncio.get_event_loop().run_in_executor(
+                    self.executor, extraction_method, file_path
+                )
             logger.info("Successfully extracted data from: %s", file_path)
             return ExtractionResult(**result)
         except Exception as e:
             logger.error("Failed to extract text from %s: %s", file_path, str(e))
             raise e
 
+    async def _extract_pdf(self, file_path: str, extract_tables: bool) -> dict:
+        """
+        Extracts a PDF serially in a thread, or across the process pool by page
+        range when it has at least `pdf_parallel_min_pages` pages and more than
+        one CPU is available.
+
+        Args:
+            file_path (str): Path to the PDF file.
+            extract_tables (bool): Whether to extract tables.
+
+        Returns:
+            dict: Extracted text, tables, and metadata (pages joined in order).
+        """
+        loop = asyncio.get_event_loop()
+        page_count, metadata = await loop.run_in_executor(
+            self.executor, self._read_pdf_info, file_path
+        )
+
+        if page_count < self.config.pdf_parallel_min_pages or self._pool_size() < 2:
+            return await loop.run_in_executor(
+                self.executor, self.extract_text_from_pdf, file_path, extract_tables
+            )
+
+        step = self.config.pdf_pages_per_task
+        pool = self._get_process_pool()
+        parts = await asyncio.gather(
+            *[
+                loop.run_in_executor(
+                    pool,
+                    extract_pdf_pages,
+                    file_path,
+                    first_page,
+                    min(first_page + step - 1, page_count),
+                    extract_tables,
+                )
+                for first_page in range(1, page_count + 1, step)
+            ]
+        )
+        logger.info(
+            "Extracted %d PDF pages in %d parallel tasks: %s",
+            page_count,
+            len(parts),
+            file_path,
+        )
+        return {
+            "text": "\n".join(text for part in parts for text in part["texts"]).strip(),
+            "tables": [table for part in parts for table in part["tables"]],
+            "metadata": metadata,
+            "page_count": page_count,
+        }
+
+    async def iter_pages(self, file_path: str) -> AsyncIterator[str]:
+        """
+        Yields the text of a document page by page, as soon as each page range is
+        extracted. Joining the pages with "\n" gives `extract_text(...).text`
+        (before stripping).
+
+        PDF page ranges of `pdf_pages_per_task` pages are extracted a few ranges
+        ahead of the consumer (across the process pool for large PDFs), without
+        tables; other file types are yielded as a single page.
+
+        Args:
+            file_path (str): Path to the file.
+
+        Yields:
+            str: The text of each page, in order.
+        """
+        if self._detect_file_type(file_path) != "pdf":
+            result = await self.extract_text(file_path, extract_tables=False)
+            yield result.text or ""
+            return
+
+        if not os.path.exists(file_path):
+            logger.error("File not found: %s", file_path)
+            raise FileNotFoundError(f"File not found: {file_path}")
+
+        loop = asyncio.get_event_loop()
+        page_count, _ = await loop.run_in_executor(
+            self.executor, self._read_pdf_info, file_path
+        )
+        parallel = (
+            page_count >= self.config.pdf_parallel_min_pages and self._pool_size() >= 2
+        )
+        executor = self._get_process_pool() if parallel else self.executor
+        lookahead = self._pool_size() if parallel else 2
+
+        step = self.config.pdf_pages_per_task
+        ranges = iter(range(1, page_count + 1, step))
+        in_flight: Deque["asyncio.Future[Dict[str, Any]]"] = deque()
+
+        def submit_next() -> None:
+            first_page = next(ranges, None)
+            if first_page is not None:
+                in_flight.append(
+                    loop.run_in_executor(
+                        executor,
+                        extract_pdf_pages,
+                        file_path,
+                        first_page,
+                        min(first_page + step - 1, page_count),
+                        False,
+                    )
+                )
+
+        for _ in range(lookahead):
+            submit_next()
+        try:
+            while in_flight:
+                part = await in_flight.popleft()
+                submit_next()
+                for text in part["texts"]:
+                    yield text
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def _read_pdf_info(self, file_path: str) -> tuple:
+        """
+        Returns the page count and metadata of a PDF without extracting any page.
+        """
+        with pdfplumber.open(file_path) as pdf:
+            return len(pdf.pages), pdf.metadata
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        """
+        Lazily creates the PDF process pool. Workers are spawned (not forked) so they
+        do not inherit the parent's threads and loaded models.
+        """
+        if self.process_pool is None:
+            self.process_pool = ProcessPoolExecutor(
+                max_workers=self._pool_size(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self.process_pool
+
+    def _pool_size(self) -> int:
+        """Configured process pool size, defaulting to the usable CPU count."""
+        return self.config.pdf_process_workers or _usable_cpus()
+
+    def shutdown(self) -> None:
+        """Stops the thread and process pools."""
+        self.executor.shutdown(wait=False)
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
+            self.process_pool = None
+
     def _detect_file_type(self, file_path: str) -> str:
         """
         Detects the file type based on its extension.
@@ -111,29 +281,27 @@ class TextExtractor:
         _, extension = os.path.splitext(file_path)
         return extension.lower().strip(".")
 
-    def extract_text_from_pdf(self, file_path: str) -> dict:
+    def extract_text_from_pdf(
+        self, file_path: str, extract_tables: bool = True
+    ) -> dict:
         """
         Extracts text and simple tables from a PDF file.
 
         Args:
             file_path (str): Path to the PDF file.
+            extract_tables (bool): Whether to extract tables as well.
 
         Returns:
             dict: Extracted text, tables, and metadata.
         """
-        text = ""
-        tables = []
-        metadata = {}
         try:
-            with pdfplumber.open(file_path) as pdf:
-                metadata = pdf.metadata
-                for page_number, page in enumerate(pdf.pages, start=1):
-                    page_text = page.extract_text() or ""
-                    text += page_text + "\n"
-                    table = page.extract_table()
-                    if table:
-                        tables.append({"page": page_number, "table": table})
-            return {"text": text.strip(), "tables": tables, "metadata": metadata}
+            pages = extract_pdf_pages(file_path, extract_tables=extract_tables)
+            return {
+                "text": "\n".join(pages["texts"]).strip(),
+                "tables": pages["tables"],
+                "metadata": pages["metadata"],
+                "page_count": len(pages["texts"]),
+            }
         except Exception as e:
             logger.error("Error extracting PDF: %s", str(e))
             raise e
@@ -0,0 +1,57 @@
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Read size used when hashing files on disk
+HASH_READ_SIZE = 1024 * 1024
+
+
+def sha256_text(text: str) -> str:
+    """
+    Returns the SHA-256 hex digest of a text (UTF-8 encoded).
+
+    Args:
+        text (str): The text to hash.
+
+    Returns:
+        str: The hex digest.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def sha256_file(file_path: str) -> str:
+    """
+    Returns the SHA-256 hex digest of a file, read in fixed-size blocks.
+
+    Args:
+        file_path (str): Path to the file.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalizes a URL so that trivially different spellings of the same page match:
+    lower-cased scheme and host, default port, fragment and trailing slash dropped,
+    query parameters sorted.
+
+    Args:
+        url (str): The URL to normalize.
+
+    Returns:
+        str: The normalized URL.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
@@ -1,10 +1,100 @@
+import asyncio
+import logging
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import urlsplit
 
+import httpx
 import requests
 from bs4 import BeautifulSoup
+from config.config import WEB_SCRAPE_CONFIG, WebScrapeConfig
 from duckduckgo_search import DDGS
 
+logger = logging.getLogger(__name__)
+
+# Shared, pooled HTTP client used by every async scrape
+_http_client: Optional[httpx.AsyncClient] = None
+# Per-host concurrency limits of the hosts being fetched, bound to the shared
+# client's event loop
+_host_limits: Dict[str, "_HostLimit"] = {}
+_http_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_client(config: WebScrapeConfig = WEB_SCRAPE_CONFIG) -> httpx.AsyncClient:
+    """
+    Returns the process-wide async HTTP client, creating it on the running loop.
+    Connections are pooled and kept alive across requests.
+    """
+    global _http_client, _http_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client.is_closed or _http_loop is not loop:
+        _http_client = httpx.AsyncClient(
+            headers={"User-Agent": config.user_agent},
+            timeout=httpx.Timeout(
+                config.read_timeout_s, connect=config.connect_timeout_s
+            ),
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_connections,
+            ),
+            follow_redirects=True,
+        )
+        _http_loop = loop
+        _host_limits.clear()
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Closes the shared async HTTP client, if one was created."""
+    global _http_client, _http_loop
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _http_loop = None
+    _host_limits.clear()
+
+
+class _HostLimit:
+    """A host's semaphore and the number of requests holding or awaiting it."""
+
+    def __init__(self, limit: int) -> None:
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0
+
+
+@asynccontextmanager
+async def _host_limit(url: str, config: WebScrapeConfig) -> AsyncIterator[None]:
+    """
+    Holds a slot of the URL's host for the duration of the block. A host's entry is
+    dropped once no request uses it, so the table only holds hosts being fetched.
+    """
+    host = urlsplit(url).netloc.lower()
+    entry = _host_limits.get(host)
+    if entry is None:
+        entry = _host_limits[host] = _HostLimit(config.max_connections_per_host)
+    entry.users += 1
+    try:
+        async with entry.semaphore:
+            yield
+    finally:
+        entry.users -= 1
+        if entry.users == 0 and _host_limits.get(host) is entry:
+            del _host_limits[host]
+
+
+def _html_to_text(content: bytes) -> str:
+    """Extracts the visible text of an HTML page."""
+    soup = BeautifulSoup(content, "lxml")
+
+    # Remove scripts and styles
+    for tag in soup(["script", "style", "noscript", "meta", "link"]):
+        tag.extract()
+
+    text = soup.get_text(separator="\n").strip()
+
+    return text if text else ""
+
 
 class WebSearchService(ABC):
     """
@@ -29,6 +119,13 @@ class WebSearchService(ABC):
         """
         pass
 
+    async def asearch_and_scrape(self, query: str) -> List[Dict]:
+        """
+        Async variant of `search_and_scrape`, returning the same list of dicts.
+        The default runs the blocking implementation in a worker thread.
+        """
+        return await asyncio.to_thread(self.search_and_scrape, query)
+
 
 class DuckDuckGoSearchService(WebSearchService):
     """
@@ -36,8 +133,11 @@ class DuckDuckGoSearchService(WebSearchService):
     *without* using LangChain.
     """
 
-    def __init__(self, max_results: int = 5):
+    def __init__(
+        self, max_results: int = 5, config: WebScrapeConfig = WEB_SCRAPE_CONFIG
+    ):
         self.max_results = max_results
+        self.config = config
 
     def _search_duckduckgo(self, query: str) -> List[Dict]:
         results = []
@@ -63,15 +163,28 @@ class DuckDuckGoSearchService(WebSearchService):
             print(f"Error fetching {url}: {e}")
             return ""  # ✅ Ensures a string is always returned
 
-        soup = BeautifulSoup(resp.content, "lxml")
+        return _html_to_text(resp.content)
 
-        # Remove scripts and styles
-        for tag in soup(["script", "style", "noscript", "meta", "link"]):
-            tag.extract()
-
-        text = soup.get_text(separator="\n").strip()
+    async def _afetch_webpage(self, client: httpx.AsyncClient, url: str) -> str:
+        """
+        Downloads at most `max_bytes` of a page, holding its host's semaphore,
+        and parses it off the event loop.
+        """
+        try:
+            async with _host_limit(url, self.config):
+                async with client.stream("GET", url) as resp:
+                    resp.raise_for_status()
+                    content = bytearray()
+                    async for part in resp.aiter_bytes():
+                        content.extend(part)
+                        if len(content) >= self.config.max_bytes:
+                            del content[self.config.max_bytes :]
+                            break
+        except httpx.HTTPError as e:
+            logger.warning(f"Error fetching {url}: {e}")
+            return ""
 
-        return text if text else ""
+        return await asyncio.to_thread(_html_to_text, bytes(content))
 
     def search_and_scrape(self, query: str) -> List[Dict]:
         raw_results = self._search_duckduckgo(query)
@@ -91,3 +204,54 @@ class DuckDuckGoSearchService(WebSearchService):
                 }
             )
         return output
+
+    async def asearch_and_scrape(self, query: str) -> List[Dict]:
+        """
+        Searches, then fetches every result concurrently over the shared connection
+        pool. Pages still downloading when the overall deadline expires are dropped.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.config.total_deadline_s
+        try:
+            raw_results = await asyncio.wait_for(
+                asyncio.to_thread(self._search_duckduckgo, query),
+                self.config.total_deadline_s,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Web search for {query!r} timed out.")
+            return []
+
+        items = [item for item in raw_results if item.get("href")]
+        if not items:
+            return []
+
+        client = get_http_client(self.config)
+        tasks = [
+            asyncio.create_task(self._afetch_webpage(client, item["href"]))
+            for item in items
+        ]
+        _, pending = await asyncio.wait(tasks, timeout=max(deadline - loop.time(), 0))
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(
+                f"Dropped {len(pending)} of {len(tasks)} pages after the "
+                f"{self.config.total_deadline_s}s deadline."
+            )
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        output = []
+        for item, task in zip(items, tasks):
+            if task.cancelled():
+                continue
+            if task.exception() is not None:
+                logger.warning(f"Error fetching {item['href']}: {task.exception()}")
+            output.append(
+                {
+                    "title": item.get("title", ""),
+                    "url": item["href"],
+                    "body_snippet": item.get("body", ""),
+                    "raw_text": task.result() if task.exception() is None else "",
+                }
+            )
+        return output
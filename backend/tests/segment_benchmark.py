@@ -0,0 +1,163 @@
+"""
+CLI benchmark for CustomSegment.hybrid_segmentation throughput (MB/s).
+
+It also runs the previous quadratic implementation on the same input and checks that
+both produce identical chunks.
+
+Usage:
+    python backend/tests/segment_benchmark.py --size-mb 5
+    python backend/tests/segment_benchmark.py --file ./big_manual.txt --legacy-max-mb 0.5
+"""
+
+import argparse
+import logging
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(__file__, "../../")))
+
+from services.ragutils.segment import CustomSegment
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WORDS = (
+    "the model segment chunk token sentence paragraph document index vector "
+    "embedding query retrieval Dr. Mr. e.g. U.S. 3.14 context answer question"
+).split()
+
+
+def legacy_hybrid_segmentation(text: str, min_tokens=50, max_tokens=200) -> list:
+    """
+    The previous implementation, which re-tokenizes the accumulated chunk for
+    every sentence. Kept here only as the reference for the equivalence check.
+    """
+
+    def tokenize(value):
+        return re.findall(r"\b\w+\b", value)
+
+    text = re.sub(r"\n+", "\n", text)
+    paragraphs = [p.strip() for p in re.split(r"\n{2,}", text) if p.strip()]
+    chunks = []
+    current_chunk = ""
+    for paragraph in paragraphs:
+        tokens = tokenize(paragraph)
+        if min_tokens <= len(tokens) <= max_tokens:
+            chunks.append(paragraph.strip())
+        elif len(tokens) > max_tokens:
+            sentences = re.split(
+                r"(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\?|\!)\s", paragraph
+            )
+            temp_chunk = ""
+            for sentence in sentences:
+                if len(tokenize(temp_chunk + " " + sentence)) <= max_tokens:
+                    temp_chunk += " " + sentence
+                else:
+                    if temp_chunk:
+                        chunks.append(temp_chunk.strip())
+                    temp_chunk = sentence
+            if temp_chunk:
+                chunks.append(temp_chunk.strip())
+        elif len(tokens) < min_tokens:
+            current_chunk += " " + paragraph
+            if len(tokenize(current_chunk)) >= min_tokens:
+                chunks.append(current_chunk.strip())
+                current_chunk = ""
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+    return chunks
+
+
+def generate_text(size_bytes: int, seed: int = 0) -> str:
+    """
+    Generates pseudo-document text of roughly `size_bytes` bytes.
+    """
+    rng = random.Random(seed)
+    pieces = []
+    total = 0
+    while total < size_bytes:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 30)))
+        sentence = sentence.capitalize() + rng.choice([".", ".", "?", "!"])
+        sentence += rng.choice([" ", " ", " ", "\n", "\n\n"])
+        pieces.append(sentence)
+        total += len(sentence)
+    return "".join(pieces)
+
+
+def measure(func, text: str):
+    """
+    Runs `func(text)` once and returns (chunks, seconds).
+    """
+    start = time.perf_counter()
+    chunks = func(text)
+    return chunks, time.perf_counter() - start
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark CustomSegment.hybrid_segmentation."
+    )
+    parser.add_argument(
+        "--file", type=str, default=None, help="Text file to segment (optional)."
+    )
+    parser.add_argument(
+        "--size-mb",
+        type=float,
+        default=5.0,
+        help="Size of the generated text when no file is given.",
+    )
+    parser.add_argument(
+        "--legacy-max-mb",
+        type=float,
+        default=1.0,
+        help="Only run the (quadratic) legacy implementation on this many MB.",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.file:
+        with open(args.file, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    else:
+        text = generate_text(int(args.size_mb * 1024 * 1024))
+
+    size_mb = len(text.encode("utf-8")) / (1024 * 1024)
+    segmenter = CustomSegment()
+
+    chunks, elapsed = measure(segmenter.hybrid_segmentation, text)
+    logger.info(
+        "hybrid_segmentation: %.2f MB -> %d chunks in %.3fs (%.2f MB/s)",
+        size_mb,
+        len(chunks),
+        elapsed,
+        size_mb / elapsed if elapsed else float("inf"),
+    )
+
+    # Compare with the legacy implementation on a prefix it can finish in time
+    sample = text[: int(args.legacy_max_mb * 1024 * 1024)]
+    sample_mb = len(sample.encode("utf-8")) / (1024 * 1024)
+    new_chunks, new_elapsed = measure(segmenter.hybrid_segmentation, sample)
+    old_chunks, old_elapsed = measure(legacy_hybrid_segmentation, sample)
+    logger.info(
+        "on %.2f MB: new %.3fs (%.2f MB/s) vs legacy %.3fs (%.2f MB/s)",
+        sample_mb,
+        new_elapsed,
+        sample_mb / new_elapsed if new_elapsed else float("inf"),
+        old_elapsed,
+        sample_mb / old_elapsed if old_elapsed else float("inf"),
+    )
+
+    if new_chunks != old_chunks:
+        logger.error("Chunks differ from the legacy implementation!")
+        sys.exit(1)
+    logger.info("Chunks are identical to the legacy implementation.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import types
+
+import pytest
+import services.ragutils.chroma_service as chroma_service
+from services.ragutils.chroma_service import delete_chunks, update_chunk_metadatas
+
+
+class RecordingCollection:
+    def __init__(self):
+        self.calls = []
+
+    def update(self, ids, metadatas):
+        self.calls.append(("update", ids, metadatas))
+
+    def delete(self, ids):
+        self.calls.append(("delete", ids))
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    """A collection recording its writes, behind a client limited to 4 ids a call."""
+    recording = RecordingCollection()
+    client = types.SimpleNamespace(get_max_batch_size=lambda: 4)
+    monkeypatch.setattr(chroma_service, "get_chroma_client", lambda: client)
+    monkeypatch.setattr(chroma_service, "get_chroma_collection", lambda _: recording)
+    return recording
+
+
+def test_metadata_updates_respect_the_max_batch_size(collection):
+    ids = [f"c{i}" for i in range(10)]
+    metadatas = [{"chunk_index": i} for i in range(10)]
+
+    update_chunk_metadatas(ids, metadatas)
+
+    assert [len(call[1]) for call in collection.calls] == [4, 4, 2]  # nosec B101
+    # Each id keeps its own metadata
+    assert collection.calls[2] == (  # nosec B101
+        "update",
+        ["c8", "c9"],
+        [{"chunk_index": 8}, {"chunk_index": 9}],
+    )
+
+
+def test_deletes_respect_the_max_batch_size(collection):
+    delete_chunks([f"c{i}" for i in range(9)], batch_size=3)
+    delete_chunks([])
+
+    assert collection.calls == [  # nosec B101
+        ("delete", ["c0", "c1", "c2"]),
+        ("delete", ["c3", "c4", "c5"]),
+        ("delete", ["c6", "c7", "c8"]),
+    ]
@@ -0,0 +1,46 @@
+import asyncio
+
+import chromadb
+import pytest
+import routes.chromadb as chromadb_routes
+import services.ragutils.chroma_service as chroma_service
+from fastapi import HTTPException
+from routes.chromadb import get_extracted_text
+from services.ragutils.manifest import DocumentManifest
+
+
+@pytest.fixture
+def indexed(tmp_path, monkeypatch):
+    """A three-chunk document in an in-memory collection and a fresh manifest."""
+    monkeypatch.setattr(chroma_service, "_client", chromadb.EphemeralClient())
+    monkeypatch.setattr(chroma_service, "_collections", {})
+    manifest = DocumentManifest(str(tmp_path / "manifest.sqlite3"))
+    monkeypatch.setattr(chromadb_routes, "get_document_manifest", lambda: manifest)
+
+    ids = ["a-0", "a-1", "a-2"]
+    chroma_service.reset_chroma_collection().add(
+        ids=ids,
+        documents=["first", "second", "third"],
+        embeddings=[[float(i), 1.0] for i in range(3)],
+        metadatas=[{"filename": "a.txt"}] * 3,
+    )
+    manifest.record_document("a.txt", "h", ids, [None] * 3)
+
+
+def test_pages_follow_the_chunk_order(indexed):
+    page = asyncio.run(get_extracted_text("a.txt", offset=1, limit=5))
+
+    assert page["chunks"] == ["second", "third"] and page["total"] == 3  # nosec B101
+
+
+def test_offset_past_the_end_returns_an_empty_page(indexed):
+    page = asyncio.run(get_extracted_text("a.txt", offset=3, limit=5))
+
+    assert page["chunks"] == [] and page["total"] == 3  # nosec B101
+
+
+def test_unknown_file_is_not_found(indexed):
+    with pytest.raises(HTTPException) as missing:
+        asyncio.run(get_extracted_text("b.txt", offset=0, limit=5))
+
+    assert missing.value.status_code == 404  # nosec B101
@@ -0,0 +1,136 @@
+import time
+
+from config.config import ConversationConfig
+from services.conversation import ConversationStore
+
+
+def chat(store, session_id, *contents):
+    """Appends alternating user and AI messages."""
+    for i, content in enumerate(contents):
+        store.append(session_id, "user" if i % 2 == 0 else "ai", content)
+
+
+def test_full_window_is_compacted_to_its_newer_half():
+    store = ConversationStore(ConversationConfig(window_messages=4))
+    chat(store, "s", "Tell me about llamas.", "Llamas live in the Andes.", "3", "4")
+    assert store.history("s")[0] is None  # nosec B101
+
+    chat(store, "s", "5", "6")
+    summary, messages = store.history("s")
+
+    assert [m["content"] for m in messages] == ["5", "6"]  # nosec B101
+    assert summary.startswith(  # nosec B101
+        "Summary of earlier messages: User: Tell me about llamas. AI: Llamas live"
+    )
+    stats = store.stats()
+    assert stats["compactions"] == 1 and stats["summarized"] == 4  # nosec B101
+
+
+def test_history_only_grows_between_compactions():
+    store = ConversationStore(ConversationConfig(window_messages=4))
+    chat(store, "s", *"abcdef")
+    summary, messages = store.history("s")
+
+    store.append_exchange("s", "g", "h")
+
+    # Same summary, same messages, one more exchange: the prompt prefix is stable
+    assert store.history("s") == (  # nosec B101
+        summary,
+        messages + [{"role": "user", "content": "g"}, {"role": "ai", "content": "h"}],
+    )
+
+
+def test_compaction_keeps_whole_exchanges():
+    store = ConversationStore(ConversationConfig())
+    chat(store, "s", "q1", "a1", "q2", "a2")
+
+    # Keeping 3 messages would start with an answer
+    store.compact("s", keep=3)
+
+    assert store.history("s")[1] == [  # nosec B101
+        {"role": "user", "content": "q2"},
+        {"role": "ai", "content": "a2"},
+    ]
+
+
+def test_summary_keeps_a_bounded_number_of_sentences():
+    store = ConversationStore(
+        ConversationConfig(window_messages=2, summary_max_sentences=3)
+    )
+
+    chat(store, "s", *(f"Sentence {i} about llamas. Another one." for i in range(10)))
+    summary, _ = store.history("s")
+
+    # Two sentences per summarized message, only three of them kept
+    assert summary.count("User: ") + summary.count("AI: ") == 3  # nosec B101
+
+
+def test_idle_sessions_are_evicted():
+    store = ConversationStore(ConversationConfig(idle_ttl_s=0.01))
+    chat(store, "s", "hello")
+    time.sleep(0.02)
+
+    assert store.evict_idle() == 1  # nosec B101
+    assert store.stats()["sessions"] == 0  # nosec B101
+    # Without persistence, the session is gone
+    assert store.history("s") == (None, [])  # nosec B101
+
+
+def test_least_recently_used_session_is_evicted_at_capacity():
+    store = ConversationStore(ConversationConfig(max_sessions=2))
+    chat(store, "a", "first")
+    chat(store, "b", "second")
+    store.history("a")
+
+    chat(store, "c", "third")
+
+    stats = store.stats()
+    assert stats["sessions"] == 2 and stats["capacity_evictions"] == 1  # nosec B101
+    assert store.history("a")[1] == [{"role": "user", "content": "first"}]  # nosec B101
+
+
+def test_persisted_sessions_are_reloaded(tmp_path):
+    config = ConversationConfig(window_messages=2, db_path=str(tmp_path / "chat.db"))
+    store = ConversationStore(config)
+    chat(store, "s", "Tell me about llamas.", "They hum.", "Why?", "To talk.")
+    before = store.history("s")
+    store.close()
+
+    reopened = ConversationStore(config)
+
+    assert reopened.history("s") == before  # nosec B101
+    assert reopened.stats()["persistent"]  # nosec B101
+    reopened.close()
+
+
+def test_evicted_persisted_session_comes_back(tmp_path):
+    store = ConversationStore(
+        ConversationConfig(max_sessions=1, db_path=str(tmp_path / "chat.db"))
+    )
+    chat(store, "a", "first")
+    chat(store, "b", "second")
+
+    assert store.history("a")[1] == [{"role": "user", "content": "first"}]  # nosec B101
+    store.clear("a")
+    assert store.history("a") == (None, [])  # nosec B101
+    store.close()
+
+
+def test_exchanges_and_compactions_are_persisted(tmp_path):
+    config = ConversationConfig(window_messages=4, db_path=str(tmp_path / "chat.db"))
+    store = ConversationStore(config)
+    store.append_exchange("s", "Is it raining?", "No.")
+    store.append_exchange("s", "And tomorrow?", "Maybe.")
+    store.append_exchange("s", "Should I take an umbrella?", "Yes.")
+    store.close()
+
+    summary, messages = ConversationStore(config).history("s")
+
+    assert summary == (  # nosec B101
+        "Summary of earlier messages: User: Is it raining? AI: No. "
+        "User: And tomorrow? AI: Maybe."
+    )
+    assert messages == [  # nosec B101
+        {"role": "user", "content": "Should I take an umbrella?"},
+        {"role": "ai", "content": "Yes."},
+    ]
@@ -0,0 +1,196 @@
+import asyncio
+import sqlite3
+import threading
+
+import numpy as np
+import pytest
+import services.ragutils.embedder as embedder
+import torch
+from config.config import EmbeddingBatchConfig, EmbeddingCacheConfig
+from services.ragutils.embedder import (
+    EmbeddingModel,
+    EmbeddingModelRegistry,
+    EmbeddingService,
+)
+from services.ragutils.embedding_cache import EmbeddingCache
+
+MODEL = EmbeddingModel(name="m1", model_path="path/m1")
+
+
+class FakeModel:
+    max_seq_length = 512
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, batch_size, show_progress_bar, convert_to_numpy):
+        self.batches.append(list(texts))
+        # One row per text, holding its length so the order can be checked
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def service():
+    # Batching needs no loaded model
+    return EmbeddingService.__new__(EmbeddingService)
+
+
+@pytest.fixture
+def batch_config(monkeypatch):
+    # 4 characters per token, plus the 2 special tokens
+    config = EmbeddingBatchConfig(token_budget=100, max_batch_size=4, chars_per_token=4)
+    monkeypatch.setattr(embedder, "EMBEDDING_BATCH_CONFIG", config)
+    return config
+
+
+def test_batches_stay_within_the_token_budget(batch_config):
+    lengths = [50, 50, 30, 30, 30, 10]
+
+    batches = EmbeddingService._plan_batches(list(range(6)), lengths)
+
+    assert batches == [[0, 1], [2, 3, 4], [5]]  # nosec B101
+    for batch in batches:
+        padded = len(batch) * max(lengths[i] for i in batch)
+        assert padded <= batch_config.token_budget  # nosec B101
+
+
+def test_batches_are_capped_at_max_batch_size(batch_config):
+    batches = EmbeddingService._plan_batches(list(range(6)), [2] * 6)
+
+    assert batches == [[0, 1, 2, 3], [4, 5]]  # nosec B101
+
+
+def test_text_longer_than_the_budget_gets_its_own_batch(batch_config):
+    batches = EmbeddingService._plan_batches([0, 1, 2], [300, 20, 20])
+
+    assert batches == [[0], [1, 2]]  # nosec B101
+
+
+def test_encode_batched_returns_rows_in_input_order(service, batch_config):
+    # Mixed lengths: encoding happens longest first, in several batches
+    texts = ["a" * 8, "b" * 190, "c" * 40, "d" * 4, "e" * 120, "f" * 40]
+    model = FakeModel()
+
+    embeddings = service._encode_batched(model, texts)
+
+    assert embeddings.dtype == np.float32  # nosec B101
+    assert embeddings[:, 0].tolist() == [len(text) for text in texts]  # nosec B101
+    encoded = [len(text) for batch in model.batches for text in batch]
+    assert len(model.batches) == 2  # nosec B101
+    assert encoded == sorted(encoded, reverse=True)  # nosec B101
+
+
+def test_encode_batched_truncates_estimates_at_the_model_limit(service, batch_config):
+    model = FakeModel()
+    model.max_seq_length = 20
+    # Estimated at 1000+ tokens, but the model truncates to 20
+    texts = ["x" * 4000, "y" * 4000]
+
+    service._encode_batched(model, texts)
+
+    assert len(model.batches) == 1  # nosec B101
+
+
+class FakeSentenceTransformer:
+    loads = 0
+
+    def __init__(self, model_path, device=None):
+        FakeSentenceTransformer.loads += 1
+        self.model_path = model_path
+        self.device = device
+        self.weight = torch.zeros(4, 8)
+
+    def parameters(self):
+        return [self.weight]
+
+    def buffers(self):
+        return []
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    FakeSentenceTransformer.loads = 0
+    monkeypatch.setattr(embedder, "SentenceTransformer", FakeSentenceTransformer)
+    monkeypatch.setattr(embedder, "AVAILABLE_EMBEDDING_MODELS", [MODEL.model_dump()])
+    # Services built without a cache must not open the process-wide one on disk
+    monkeypatch.setattr(embedder, "get_embedding_cache", lambda: None)
+    return EmbeddingModelRegistry(device="cpu")
+
+
+def test_registry_loads_each_model_once(registry):
+    first = registry.get_model(MODEL)
+    second = registry.get_model(MODEL)
+
+    assert first is second  # nosec B101
+    assert FakeSentenceTransformer.loads == 1  # nosec B101
+    assert first.model_path == "path/m1" and first.device == "cpu"  # nosec B101
+
+
+def test_registry_loads_once_under_concurrent_callers(registry):
+    start = threading.Barrier(8)
+    loaded = []
+
+    def load():
+        start.wait()
+        loaded.append(registry.get_model(MODEL))
+
+    threads = [threading.Thread(target=load) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert FakeSentenceTransformer.loads == 1  # nosec B101
+    assert all(model is loaded[0] for model in loaded)  # nosec B101
+
+
+def test_registry_reports_model_memory(registry):
+    registry.get_model(MODEL)
+
+    report = registry.memory_report()
+
+    # 4 x 8 float32 parameters
+    assert report["models"]["m1"]["parameter_bytes"] == 128  # nosec B101
+    assert report["process_rss_bytes"] > 0  # nosec B101
+
+
+def test_services_share_the_registry_models(registry):
+    first = EmbeddingService(registry=registry)
+    second = EmbeddingService(registry=registry)
+
+    assert first.models["m1"] is second.models["m1"]  # nosec B101
+    assert FakeSentenceTransformer.loads == 1  # nosec B101
+
+
+def test_only_cache_misses_are_encoded(registry):
+    cache = EmbeddingCache(EmbeddingCacheConfig(disk_path=None))
+    service = EmbeddingService(registry=registry, cache=cache)
+    model = FakeModel()
+    service.models["m1"] = model
+
+    service._embed_with_cache("m1", ["aa", "b"])
+    embeddings = service._embed_with_cache("m1", ["b", "ccc", "aa", "ccc"])
+
+    # The repeated miss is encoded once
+    assert model.batches[1:] == [["ccc"]]  # nosec B101
+    assert embeddings[:, 0].tolist() == [1, 3, 2, 3]  # nosec B101
+
+
+def test_aclose_writes_pending_cache_refreshes(registry, tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    seed = EmbeddingCache(EmbeddingCacheConfig(disk_path=path))
+    seed.put_many("m1", ["a"], np.ones((1, 2), dtype=np.float32))
+    seed.close()
+
+    def last_used():
+        with sqlite3.connect(path) as conn:
+            return conn.execute("SELECT last_used FROM embeddings").fetchone()[0]
+
+    stored = last_used()
+    cache = EmbeddingCache(EmbeddingCacheConfig(disk_path=path))
+    service = EmbeddingService(registry=registry, cache=cache)
+    cache.get_many("m1", ["a"])
+
+    asyncio.run(service.aclose())
+
+    assert last_used() > stored  # nosec B101
@@ -0,0 +1,137 @@
+import sqlite3
+
+import numpy as np
+import pytest
+from config.config import EmbeddingCacheConfig
+from services.ragutils.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache.sqlite3")
+
+
+@pytest.fixture
+def cache(cache_path):
+    cache = EmbeddingCache(EmbeddingCacheConfig(disk_path=cache_path))
+    yield cache
+    cache.close()
+
+
+def rows(*values):
+    return np.array([[value, value] for value in values], dtype=np.float32)
+
+
+def test_cache_misses_then_hits_memory(cache):
+    assert cache.get_many("m", ["a", "b"]) == [None, None]  # nosec B101
+
+    cache.put_many("m", ["a", "b"], rows(1, 2))
+    found = cache.get_many("m", ["b", "a", "b"])
+
+    assert [vector[0] for vector in found] == [2, 1, 2]  # nosec B101
+    stats = cache.stats()
+    assert stats["misses"] == 2 and stats["memory_hits"] == 3  # nosec B101
+
+
+def test_cache_is_keyed_by_model(cache):
+    cache.put_many("m1", ["a"], rows(1))
+
+    assert cache.get_many("m2", ["a"]) == [None]  # nosec B101
+
+
+def test_memory_lru_evicts_least_recently_used():
+    cache = EmbeddingCache(EmbeddingCacheConfig(memory_max_entries=2, disk_path=None))
+    cache.put_many("m", ["a", "b"], rows(1, 2))
+    cache.get_many("m", ["a"])
+    cache.put_many("m", ["c"], rows(3))
+
+    found = cache.get_many("m", ["a", "b", "c"])
+
+    assert found[1] is None  # nosec B101
+    assert found[0] is not None and found[2] is not None  # nosec B101
+    assert cache.stats()["memory_evictions"] == 1  # nosec B101
+
+
+def test_disk_tier_survives_a_restart(cache, cache_path):
+    cache.put_many("m", ["a"], rows(1))
+    cache.close()
+
+    reopened = EmbeddingCache(EmbeddingCacheConfig(disk_path=cache_path))
+    found = reopened.get_many("m", ["a"])
+    reopened.close()
+
+    assert found[0] is not None and found[0][0] == 1  # nosec B101
+    stats = reopened.stats()
+    assert stats["disk_hits"] == 1 and stats["disk_entries"] == 1  # nosec B101
+
+
+def test_disk_tier_evicts_least_recently_used(cache_path):
+    config = EmbeddingCacheConfig(
+        memory_max_entries=1, disk_path=cache_path, disk_max_entries=2
+    )
+    cache = EmbeddingCache(config)
+    cache.put_many("m", ["a"], rows(1))
+    cache.put_many("m", ["b"], rows(2))
+    # A disk hit on "a" leaves "b" as the least recently used row
+    cache.get_many("m", ["a"])
+    cache.put_many("m", ["c"], rows(3))
+    cache.close()
+
+    reopened = EmbeddingCache(config)
+    found = reopened.get_many("m", ["a", "b", "c"])
+    reopened.close()
+
+    assert found[1] is None  # nosec B101
+    assert found[0] is not None and found[2] is not None  # nosec B101
+    assert cache.stats()["disk_evictions"] == 1  # nosec B101
+
+
+def last_used(cache_path):
+    with sqlite3.connect(cache_path) as conn:
+        return conn.execute("SELECT last_used FROM embeddings").fetchone()[0]
+
+
+def test_cache_stores_a_copy_of_the_vectors(cache):
+    vectors = rows(1)
+    cache.put_many("m", ["a"], vectors)
+
+    vectors[0, 0] = 99
+
+    assert cache.get_many("m", ["a"])[0][0] == 1  # nosec B101
+
+
+def test_query_vectors_bypass_the_disk_tier(cache, cache_path):
+    cache.put_many("m", ["query"], rows(1), persist=False)
+
+    assert cache.get_many("m", ["query"], use_disk=False)[0] is not None  # nosec B101
+    assert cache.stats()["disk_entries"] == 0  # nosec B101
+    cache.close()
+
+    reopened = EmbeddingCache(EmbeddingCacheConfig(disk_path=cache_path))
+    assert reopened.get_many("m", ["query"]) == [None]  # nosec B101
+    reopened.close()
+
+
+def test_memory_miss_skips_disk_when_asked(cache, cache_path):
+    cache.put_many("m", ["a"], rows(1))
+    cache.close()
+
+    reopened = EmbeddingCache(EmbeddingCacheConfig(disk_path=cache_path))
+    found = reopened.get_many("m", ["a"], use_disk=False)
+    reopened.close()
+
+    assert found == [None] and reopened.stats()["disk_hits"] == 0  # nosec B101
+
+
+def test_disk_hits_refresh_last_used_in_one_deferred_write(cache, cache_path):
+    cache.put_many("m", ["a"], rows(1))
+    cache.close()
+    stored = last_used(cache_path)
+
+    reopened = EmbeddingCache(EmbeddingCacheConfig(disk_path=cache_path))
+    reopened.get_many("m", ["a"])
+    pending = last_used(cache_path)
+    reopened.close()
+
+    assert pending == stored  # nosec B101
+    assert last_used(cache_path) > stored  # nosec B101
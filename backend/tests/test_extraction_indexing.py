@@ -0,0 +1,180 @@
+import asyncio
+import shutil
+import types
+
+import chromadb
+import numpy as np
+import pytest
+import services.ragutils.chroma_service as chroma_service
+import services.ragutils.manifest as manifest_module
+import workflow.extraction_indexing as extraction_indexing
+from config.config import TEXT_EXTRACTOR_CONFIG
+from services.ragutils import TextExtractor
+from services.ragutils.manifest import DocumentManifest
+from workflow.extraction_indexing import ExtractionIndexingWorkflow
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.texts = []
+
+    async def get_embeddings(self, texts):
+        self.texts.extend(texts)
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def document(topics):
+    return "\n\n".join(
+        f"Paragraph {topic} talks about topic {topic} in some detail. " * 8
+        for topic in topics
+    )
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """An in-memory Chroma collection, a fresh manifest and an upload directory."""
+    monkeypatch.setattr(chroma_service, "_client", chromadb.EphemeralClient())
+    monkeypatch.setattr(chroma_service, "_collections", {})
+    manifest = DocumentManifest(str(tmp_path / "manifest.sqlite3"))
+    monkeypatch.setattr(manifest_module, "get_document_manifest", lambda: manifest)
+    monkeypatch.setattr(extraction_indexing, "get_document_manifest", lambda: manifest)
+    monkeypatch.setattr(TEXT_EXTRACTOR_CONFIG, "temp_upload_dir", str(tmp_path))
+    return chroma_service.reset_chroma_collection(), manifest, tmp_path
+
+
+@pytest.fixture
+def embedder():
+    return FakeEmbedder()
+
+
+def index(embedder, *filenames):
+    workflow = ExtractionIndexingWorkflow(extractor=TextExtractor(), embedder=embedder)
+    return asyncio.run(workflow.index_uploads(list(filenames)))
+
+
+def test_identical_file_reuses_the_indexed_chunks(store, embedder):
+    collection, manifest, uploads = store
+    (uploads / "a.txt").write_text(document(range(12)))
+    shutil.copy(uploads / "a.txt", uploads / "b.txt")
+
+    first = index(embedder, "a.txt")[0]
+    embedded = len(embedder.texts)
+    second = index(embedder, "b.txt")[0]
+
+    assert first["status"] == "Indexed in ChromaDB"  # nosec B101
+    assert second["status"] == "Linked to an indexed copy"  # nosec B101
+    assert second["linked_to"] == "a.txt"  # nosec B101
+    assert len(embedder.texts) == embedded  # nosec B101
+    original = manifest.get_document("a.txt")["chunk_ids"]
+    assert manifest.get_document("b.txt")["chunk_ids"] == original  # nosec B101
+    assert collection.count() == len(original)  # nosec B101
+
+
+def test_unchanged_file_is_not_indexed_again(store, embedder):
+    _, _, uploads = store
+    (uploads / "a.txt").write_text(document(range(12)))
+    index(embedder, "a.txt")
+    embedded = len(embedder.texts)
+
+    again = index(embedder, "a.txt")[0]
+
+    assert again["status"] == "Already indexed"  # nosec B101
+    assert len(embedder.texts) == embedded  # nosec B101
+
+
+def test_duplicates_in_one_request_are_embedded_once(store, embedder):
+    collection, manifest, uploads = store
+    (uploads / "a.txt").write_text(document(range(12)))
+    shutil.copy(uploads / "a.txt", uploads / "b.txt")
+
+    results = index(embedder, "a.txt", "b.txt")
+
+    chunks = manifest.get_document("a.txt")["chunk_ids"]
+    assert len(embedder.texts) == len(chunks)  # nosec B101
+    assert results[1]["linked_to"] == "a.txt"  # nosec B101
+    assert collection.count() == len(chunks)  # nosec B101
+
+
+def test_shared_chunks_outlive_one_of_their_files(store, embedder):
+    collection, manifest, uploads = store
+    (uploads / "a.txt").write_text(document(range(12)))
+    shutil.copy(uploads / "a.txt", uploads / "b.txt")
+    index(embedder, "a.txt", "b.txt")
+    chunks = manifest.get_document("a.txt")["chunk_ids"]
+
+    # a.txt now has other content: its old chunks stay for b.txt
+    (uploads / "a.txt").write_text(document(range(100, 112)))
+    index(embedder, "a.txt")
+
+    kept = collection.get(ids=chunks)
+    assert kept["ids"] == chunks  # nosec B101
+    assert {meta["filename"] for meta in kept["metadatas"]} == {"b.txt"}  # nosec B101
+
+
+def test_reindex_embeds_only_the_edited_chunk(store, embedder):
+    collection, manifest, uploads = store
+    (uploads / "doc.txt").write_text(document(range(40)))
+    index(embedder, "doc.txt")
+    before = manifest.get_document("doc.txt")["chunk_ids"]
+    embedder.texts.clear()
+
+    # Same length, different text, in the middle of the document
+    edited = document(range(40)).replace("topic 20 ", "topic X ")
+    (uploads / "doc.txt").write_text(edited)
+    result = index(embedder, "doc.txt")[0]
+
+    after = manifest.get_document("doc.txt")["chunk_ids"]
+    assert (result["added"], result["changed"], result["removed"]) == (
+        0,
+        1,
+        0,
+    )  # nosec B101
+    assert result["unchanged"] == len(before) - 1  # nosec B101
+    assert len(embedder.texts) == 1 and "topic X" in embedder.texts[0]  # nosec B101
+    assert len(set(before) & set(after)) == len(before) - 1  # nosec B101
+    assert collection.count() == len(after)  # nosec B101
+
+
+def test_reindex_removes_vanished_chunks(store, embedder):
+    collection, manifest, uploads = store
+    (uploads / "doc.txt").write_text(document(range(40)))
+    index(embedder, "doc.txt")
+    before = manifest.get_document("doc.txt")["chunk_ids"]
+    embedder.texts.clear()
+
+    (uploads / "doc.txt").write_text(document(range(20)))
+    result = index(embedder, "doc.txt")[0]
+
+    after = manifest.get_document("doc.txt")["chunk_ids"]
+    vanished = [chunk_id for chunk_id in before if chunk_id not in after]
+    assert result["removed"] == len(vanished) - result["changed"] > 0  # nosec B101
+    assert result["unchanged"] == len(after) - len(embedder.texts)  # nosec B101
+    assert collection.get(ids=vanished)["ids"] == []  # nosec B101
+    assert collection.count() == len(after)  # nosec B101
+
+
+def test_reused_chunks_do_not_grow_a_batch_past_its_size(embedder):
+    # An edited document: one new chunk after nine reused ones
+    doc = types.SimpleNamespace(
+        error=None,
+        is_reused=lambda chunk_id: chunk_id != "new",
+        progress=types.SimpleNamespace(chunks_embedded=0),
+    )
+    ids = [f"old-{i}" for i in range(9)] + ["new"]
+
+    async def run():
+        chunks, batches = asyncio.Queue(), asyncio.Queue()
+        for index, chunk_id in enumerate(ids):
+            chunks.put_nowait((doc, index, f"text {index}", chunk_id, None))
+        chunks.put_nowait(None)
+        workflow = ExtractionIndexingWorkflow(
+            extractor=TextExtractor(), embedder=embedder
+        )
+        await workflow._embed_stage(chunks, batches, batch_size=4, linger_s=10.0)
+        sizes = []
+        while (item := batches.get_nowait()) is not None:
+            sizes.append(len(item[0]))
+        return sizes
+
+    assert asyncio.run(run()) == [4, 4, 2]  # nosec B101
+    assert embedder.texts == ["text 9"]  # nosec B101
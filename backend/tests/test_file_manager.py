@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+import routes.file_manager as file_manager
+from config.config import UPLOAD_CONFIG
+from routes.file_manager import (
+    InvalidUpload,
+    MultipartUploadParser,
+    UploadTooLarge,
+    link_duplicate_upload,
+)
+from services.ragutils.manifest import DocumentManifest
+
+BOUNDARY = "x-boundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def multipart(*files, field="files"):
+    """Encodes (filename, bytes) pairs as a multipart/form-data body."""
+    body = b""
+    for filename, data in files:
+        body += (
+            (
+                f"--{BOUNDARY}\r\n"
+                f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+                "Content-Type: application/octet-stream\r\n\r\n"
+            ).encode()
+            + data
+            + b"\r\n"
+        )
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+class Body:
+    """Streams a request body in small chunks, counting what was consumed."""
+
+    def __init__(self, data, chunk_size=16):
+        self.data = data
+        self.chunk_size = chunk_size
+        self.sent = 0
+
+    async def __aiter__(self):
+        for start in range(0, len(self.data), self.chunk_size):
+            chunk = self.data[start : start + self.chunk_size]
+            self.sent += len(chunk)
+            yield chunk
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_manager, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(UPLOAD_CONFIG, "copy_chunk_bytes", 32)
+    monkeypatch.setattr(UPLOAD_CONFIG, "max_file_bytes", 100)
+    return tmp_path
+
+
+def parse(body, content_type=CONTENT_TYPE):
+    saved = []
+
+    async def on_saved(writer):
+        saved.append((writer.filename, writer.size, writer.digest.hexdigest()))
+
+    parser = MultipartUploadParser(content_type)
+    asyncio.run(parser.parse(body.__aiter__(), on_saved))
+    return saved
+
+
+def test_files_are_saved_while_the_body_streams_in(upload_dir):
+    first, second = b"0123456789" * 9, b"hello"
+    saved = parse(Body(multipart(("A.txt", first), ("b.txt", second))))
+
+    assert saved == [  # nosec B101
+        ("a.txt", 90, hashlib.sha256(first).hexdigest()),
+        ("b.txt", 5, hashlib.sha256(second).hexdigest()),
+    ]
+    assert (upload_dir / "a.txt").read_bytes() == first  # nosec B101
+    assert sorted(os.listdir(upload_dir)) == ["a.txt", "b.txt"]  # nosec B101
+
+
+def test_size_limit_stops_reading_the_body(upload_dir):
+    body = Body(multipart(("big.txt", b"x" * 10_000)))
+
+    with pytest.raises(UploadTooLarge):
+        parse(body)
+
+    # The rest of the body was never received, and nothing was stored
+    assert body.sent < 1000  # nosec B101
+    assert os.listdir(upload_dir) == []  # nosec B101
+
+
+def test_body_cut_off_in_a_file_is_rejected(upload_dir):
+    complete = multipart(("a.txt", b"abc"), ("b.txt", b"y" * 80))
+    body = Body(complete[: complete.index(b"y" * 40)])
+
+    with pytest.raises(InvalidUpload):
+        parse(body)
+
+    # The complete first file is kept, the partial second one is discarded
+    assert os.listdir(upload_dir) == ["a.txt"]  # nosec B101
+
+
+def test_too_many_files_are_rejected(upload_dir):
+    files = [
+        (f"{i}.txt", b"data") for i in range(file_manager.MAX_FILES_PER_UPLOAD + 1)
+    ]
+
+    with pytest.raises(InvalidUpload):
+        parse(Body(multipart(*files)))
+
+
+def test_existing_file_is_not_overwritten(upload_dir):
+    (upload_dir / "a.txt").write_bytes(b"original")
+
+    with pytest.raises(FileExistsError):
+        parse(Body(multipart(("a.txt", b"replacement"))))
+
+    assert (upload_dir / "a.txt").read_bytes() == b"original"  # nosec B101
+    assert os.listdir(upload_dir) == ["a.txt"]  # nosec B101
+
+
+def test_other_fields_are_ignored(upload_dir):
+    assert parse(Body(multipart(("a.txt", b"data"), field="note"))) == []  # nosec B101
+    assert os.listdir(upload_dir) == []  # nosec B101
+
+
+def test_non_multipart_body_is_rejected():
+    with pytest.raises(InvalidUpload):
+        MultipartUploadParser("application/json")
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    """An upload directory whose files are tracked by a fresh manifest."""
+    manifest = DocumentManifest(str(tmp_path / "manifest.sqlite3"))
+    directory = tmp_path / "uploads"
+    directory.mkdir()
+    monkeypatch.setattr(file_manager, "UPLOAD_DIR", str(directory))
+    monkeypatch.setattr(file_manager, "get_document_manifest", lambda: manifest)
+    return directory, manifest
+
+
+def test_identical_upload_becomes_a_hard_link(uploads):
+    directory, manifest = uploads
+    (directory / "a.txt").write_bytes(b"same bytes")
+    (directory / "b.txt").write_bytes(b"same bytes")
+    digest = hashlib.sha256(b"same bytes").hexdigest()
+    manifest.record_upload("a.txt", digest, 10)
+
+    linked = link_duplicate_upload(str(directory / "b.txt"), digest, 10)
+
+    assert linked == "a.txt"  # nosec B101
+    original, copy = (directory / "a.txt").stat(), (directory / "b.txt").stat()
+    assert original.st_ino == copy.st_ino  # nosec B101
+    assert sorted(os.listdir(directory)) == ["a.txt", "b.txt"]  # nosec B101
+
+
+def test_upload_is_kept_when_no_earlier_copy_matches(uploads):
+    directory, manifest = uploads
+    (directory / "b.txt").write_bytes(b"same bytes")
+    digest = hashlib.sha256(b"same bytes").hexdigest()
+    # Recorded, but deleted since, or of another size
+    manifest.record_upload("gone.txt", digest, 10)
+    (directory / "short.txt").write_bytes(b"same")
+    manifest.record_upload("short.txt", digest, 4)
+
+    assert (
+        link_duplicate_upload(str(directory / "b.txt"), digest, 10) is None
+    )  # nosec B101
+    assert (directory / "b.txt").stat().st_nlink == 1  # nosec B101
+
+
+def test_sanitize_filename():
+    assert file_manager.sanitize_filename("../My  Report (1).PDF") == (  # nosec B101
+        "my_report_1_.pdf"
+    )
@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+from config.config import IngestionConfig
+from services.ingestion import (
+    CANCELLED,
+    COMPLETED,
+    FAILED,
+    QUEUED,
+    RUNNING,
+    IngestionJobQueue,
+)
+
+
+class FakeIndexer:
+    def __init__(self, fail=(), block=False):
+        self.fail = set(fail)
+        self.processed = []
+        self.release = asyncio.Event()
+        self.block = block
+
+    async def __call__(self, filename, progress):
+        self.processed.append(filename)
+        if self.block:
+            await self.release.wait()
+        if filename in self.fail:
+            raise ValueError(f"cannot read {filename}")
+        progress.chunks_total = progress.chunks_written = 3
+        return {"filename": filename, "chunks": 3}
+
+
+async def _until(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline  # nosec B101
+        await asyncio.sleep(0.005)
+
+
+def test_job_indexes_every_file():
+    async def run():
+        indexer = FakeIndexer()
+        queue = IngestionJobQueue(indexer, IngestionConfig(workers=1))
+        await queue.start()
+        job = queue.submit(["a.txt", "b.txt"])
+        await _until(lambda: job.status == COMPLETED)
+        await queue.stop()
+        return indexer, job
+
+    indexer, job = asyncio.run(run())
+
+    report = job.report()
+    assert indexer.processed == ["a.txt", "b.txt"]  # nosec B101
+    assert report["chunks_written"] == 6  # nosec B101
+    first = report["files"][0]
+    assert first["status"] == report["files"][1]["status"] == COMPLETED  # nosec B101
+    assert first["result"] == {"filename": "a.txt", "chunks": 3}  # nosec B101
+
+
+def test_failed_files_do_not_stop_the_job():
+    async def run():
+        queue = IngestionJobQueue(
+            FakeIndexer(fail=["a.txt"]), IngestionConfig(workers=1)
+        )
+        await queue.start()
+        partial = queue.submit(["a.txt", "b.txt"])
+        failed = queue.submit(["a.txt"])
+        await _until(lambda: failed.status not in (QUEUED, RUNNING))
+        await queue.stop()
+        return partial, failed
+
+    partial, failed = asyncio.run(run())
+
+    assert partial.status == COMPLETED  # nosec B101
+    assert [f.status for f in partial.files] == [FAILED, COMPLETED]  # nosec B101
+    assert partial.files[0].error == "cannot read a.txt"  # nosec B101
+    assert failed.status == FAILED  # nosec B101
+
+
+def test_submit_rejects_jobs_beyond_the_queue_bound():
+    async def run():
+        indexer = FakeIndexer(block=True)
+        queue = IngestionJobQueue(
+            indexer, IngestionConfig(workers=1, max_queued_jobs=1)
+        )
+        await queue.start()
+        queue.submit(["running.txt"])
+        await _until(lambda: indexer.processed)
+        queue.submit(["waiting.txt"])
+        with pytest.raises(asyncio.QueueFull):
+            queue.submit(["rejected.txt"])
+        stats = queue.stats()
+        await queue.stop()
+        return stats
+
+    stats = asyncio.run(run())
+
+    assert stats["queued"] == 1 and stats["running"] == 1  # nosec B101
+
+
+def test_cancel_queued_and_running_jobs():
+    async def run():
+        indexer = FakeIndexer(block=True)
+        queue = IngestionJobQueue(indexer, IngestionConfig(workers=1))
+        await queue.start()
+        running = queue.submit(["a.txt", "b.txt"])
+        queued = queue.submit(["c.txt"])
+        await _until(lambda: indexer.processed)
+
+        assert queue.cancel(queued.job_id)  # nosec B101
+        assert queue.cancel(running.job_id)  # nosec B101
+        await _until(lambda: running.status == CANCELLED)
+        indexer.release.set()
+        # A finished job cannot be cancelled again
+        assert not queue.cancel(running.job_id)  # nosec B101
+        await queue.stop()
+        return indexer, running, queued
+
+    indexer, running, queued = asyncio.run(run())
+
+    assert indexer.processed == ["a.txt"]  # nosec B101
+    assert [f.status for f in running.files] == [CANCELLED, CANCELLED]  # nosec B101
+    assert queued.status == CANCELLED  # nosec B101
+
+
+def test_oldest_finished_jobs_are_forgotten():
+    async def run():
+        queue = IngestionJobQueue(FakeIndexer(), IngestionConfig(max_retained_jobs=1))
+        await queue.start()
+        first = queue.submit(["a.txt"])
+        second = queue.submit(["b.txt"])
+        await _until(lambda: second.status == COMPLETED)
+        third = queue.submit(["c.txt"])
+        await queue.stop()
+        return queue, first, second, third
+
+    queue, first, second, third = asyncio.run(run())
+
+    assert queue.get(first.job_id) is None  # nosec B101
+    retained = [job.job_id for job in queue.list_jobs()]
+    assert retained == [third.job_id, second.job_id]  # nosec B101
+
+
+def test_submit_requires_a_started_queue():
+    queue = IngestionJobQueue(FakeIndexer(), IngestionConfig())
+
+    with pytest.raises(RuntimeError):
+        queue.submit(["a.txt"])
@@ -0,0 +1,129 @@
+import pytest
+import services.ragutils.manifest as manifest_module
+from services.ragutils.manifest import DocumentManifest, release_chunks
+
+
+class FakeCollection:
+    def __init__(self, chunks):
+        # (chunk id, text, metadata)
+        self.chunks = chunks
+        self.pages = 0
+
+    def get(self, include, limit, offset):
+        self.pages += 1
+        page = self.chunks[offset : offset + limit]
+        return {
+            "ids": [chunk_id for chunk_id, _, _ in page],
+            "documents": [text for _, text, _ in page],
+            "metadatas": [meta for _, _, meta in page],
+        }
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    return DocumentManifest(str(tmp_path / "manifest.sqlite3"))
+
+
+def test_record_and_get_document(manifest):
+    manifest.record_document("a.txt", "h1", ["c0", "c1"], ["x0", "x1"], "col")
+
+    document = manifest.get_document("a.txt", "col")
+
+    assert document["chunk_ids"] == ["c0", "c1"]  # nosec B101
+    assert document["chunk_hashes"] == ["x0", "x1"]  # nosec B101
+    assert document["content_hash"] == "h1"  # nosec B101
+    assert document["chunk_count"] == 2  # nosec B101
+    assert manifest.get_document("a.txt", "other") is None  # nosec B101
+
+
+def test_record_document_replaces_the_chunks(manifest):
+    manifest.record_document("a.txt", "h1", ["c0", "c1"], ["x0", "x1"], "col")
+    manifest.record_document("a.txt", "h2", ["c2"], ["x2"], "col")
+
+    document = manifest.get_document("a.txt", "col")
+
+    assert document["chunk_ids"] == ["c2"]  # nosec B101
+    assert document["content_hash"] == "h2"  # nosec B101
+
+
+def test_list_documents_pages_by_filename(manifest):
+    for name in ["c.txt", "a.txt", "b.txt"]:
+        manifest.record_document(name, None, [name], [None], "col")
+
+    total, page = manifest.list_documents(offset=1, limit=1, collection_name="col")
+
+    assert total == 3  # nosec B101
+    assert [document["filename"] for document in page] == ["b.txt"]  # nosec B101
+
+
+def test_find_by_content_hash_skips_the_excluded_file(manifest):
+    manifest.record_document("a.txt", "same", ["c0"], ["x0"], "col")
+
+    found = manifest.find_by_content_hash("same", collection_name="col")
+    excluded = manifest.find_by_content_hash("same", "a.txt", collection_name="col")
+
+    assert found["filename"] == "a.txt"  # nosec B101
+    assert excluded is None  # nosec B101
+
+
+def test_release_chunks_keeps_shared_chunks(manifest, monkeypatch):
+    deleted, reassigned = [], {}
+    monkeypatch.setattr(
+        manifest_module,
+        "delete_chunks",
+        lambda ids, collection_name: deleted.extend(ids),
+    )
+    monkeypatch.setattr(
+        manifest_module,
+        "update_chunk_metadatas",
+        lambda ids, metas, collection_name: reassigned.update(zip(ids, metas)),
+    )
+    manifest.record_document("a.txt", "h", ["c0", "c1"], ["x0", "x1"], "col")
+    manifest.record_document("b.txt", "h", ["c1"], ["x1"], "col")
+    manifest.remove_document("a.txt", "col")
+
+    removed = release_chunks(["c0", "c1"], manifest=manifest, collection_name="col")
+
+    assert removed == 1 and deleted == ["c0"]  # nosec B101
+    assert reassigned == {"c1": {"filename": "b.txt"}}  # nosec B101
+
+
+def test_backfill_reads_the_collection_in_pages(manifest, monkeypatch):
+    monkeypatch.setattr(manifest_module, "BACKFILL_PAGE_SIZE", 2)
+    collection = FakeCollection(
+        [
+            ("a1", "second", {"filename": "a.txt", "chunk_index": 1}),
+            ("b0", "only", {"filename": "b.txt", "chunk_index": 0}),
+            ("a0", "first", {"filename": "a.txt", "chunk_index": 0}),
+            ("x", "no file", {}),
+        ]
+    )
+
+    added = manifest.backfill(collection, collection_name="col")
+
+    assert added == 2 and collection.pages == 3  # nosec B101
+    split = manifest.get_document("a.txt", "col")
+    single = manifest.get_document("b.txt", "col")
+    assert split["chunk_ids"] == ["a0", "a1"]  # nosec B101
+    assert single["chunk_count"] == 1  # nosec B101
+
+
+def test_backfill_runs_once_per_collection(manifest, tmp_path):
+    collection = FakeCollection([("a0", "text", {"filename": "a.txt"})])
+    manifest.backfill(collection, collection_name="col")
+
+    reopened = DocumentManifest(str(tmp_path / "manifest.sqlite3"))
+
+    # The backfill is remembered across restarts
+    assert reopened.backfill(collection, collection_name="col") == 0  # nosec B101
+    assert collection.pages == 2  # nosec B101
+    assert reopened.backfill(collection, collection_name="other") == 1  # nosec B101
+
+
+def test_uploads_are_found_by_content_hash(manifest):
+    manifest.record_upload("a.txt", "same", 10)
+    manifest.record_upload("b.txt", "same", 10)
+    manifest.record_upload("c.txt", "other", 10)
+    manifest.remove_upload("b.txt")
+
+    assert manifest.find_uploads("same") == ["a.txt"]  # nosec B101
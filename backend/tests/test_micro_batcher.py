@@ -0,0 +1,104 @@
+import asyncio
+
+import numpy as np
+import pytest
+from config.config import QueryBatcherConfig
+from services.ragutils.micro_batcher import QueryMicroBatcher
+
+
+class FakeEmbedder:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    async def __call__(self, texts):
+        self.calls.append(list(texts))
+        if self.fail:
+            raise ValueError("model failed")
+        return np.array([[len(text)] for text in texts], dtype=np.float32)
+
+
+def test_concurrent_queries_share_one_batch():
+    async def run():
+        embed = FakeEmbedder()
+        batcher = QueryMicroBatcher(
+            embed, QueryBatcherConfig(max_wait_ms=50, max_batch_size=8)
+        )
+        results = await asyncio.gather(
+            *(batcher.embed(text) for text in ["a", "bb", "ccc"])
+        )
+        await batcher.close()
+        return embed, batcher, results
+
+    embed, batcher, results = asyncio.run(run())
+
+    assert embed.calls == [["a", "bb", "ccc"]]  # nosec B101
+    # Every caller gets its own row back
+    assert [result[0] for result in results] == [1, 2, 3]  # nosec B101
+    stats = batcher.stats()
+    assert stats["queries"] == 3 and stats["batches"] == 1  # nosec B101
+    assert stats["batch_size_distribution"] == {3: 1}  # nosec B101
+
+
+def test_batches_are_capped_at_max_batch_size():
+    async def run():
+        embed = FakeEmbedder()
+        batcher = QueryMicroBatcher(
+            embed, QueryBatcherConfig(max_wait_ms=50, max_batch_size=2)
+        )
+        await asyncio.gather(*(batcher.embed(text) for text in ["a", "b", "c"]))
+        await batcher.close()
+        return embed
+
+    embed = asyncio.run(run())
+
+    assert embed.calls == [["a", "b"], ["c"]]  # nosec B101
+
+
+def test_blank_query_is_not_embedded():
+    async def run():
+        embed = FakeEmbedder()
+        batcher = QueryMicroBatcher(embed, QueryBatcherConfig())
+        result = await batcher.embed("  ")
+        await batcher.close()
+        return embed, result
+
+    embed, result = asyncio.run(run())
+
+    assert embed.calls == [] and len(result) == 0  # nosec B101
+
+
+def test_failed_batch_fails_every_caller():
+    async def run():
+        batcher = QueryMicroBatcher(
+            FakeEmbedder(fail=True), QueryBatcherConfig(max_wait_ms=50)
+        )
+        results = await asyncio.gather(
+            batcher.embed("a"), batcher.embed("b"), return_exceptions=True
+        )
+        await batcher.close()
+        return results
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, ValueError) for result in results)  # nosec B101
+
+
+def test_close_fails_waiting_queries():
+    async def run():
+        async def never(texts):
+            await asyncio.Event().wait()
+
+        batcher = QueryMicroBatcher(
+            never, QueryBatcherConfig(max_wait_ms=1, max_batch_size=1)
+        )
+        first = asyncio.ensure_future(batcher.embed("a"))
+        second = asyncio.ensure_future(batcher.embed("b"))
+        await asyncio.sleep(0.05)
+        await batcher.close()
+        # Both the query being embedded and the one still queued are failed
+        for query in (first, second):
+            with pytest.raises(RuntimeError):
+                await query
+
+    asyncio.run(run())
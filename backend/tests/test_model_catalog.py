@@ -0,0 +1,124 @@
+import asyncio
+import types
+
+import pytest
+import services.ollama as ollama
+from services.ollama import ModelCatalog
+
+
+class FakeClient:
+    def __init__(self, *lists):
+        self.config = types.SimpleNamespace(models_ttl_s=60.0)
+        self.lists = list(lists)
+        self.calls = 0
+        self.fail = False
+
+    async def fetch_models(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise ConnectionError("Ollama is down")
+        return self.lists.pop(0) if len(self.lists) > 1 else self.lists[0]
+
+
+def test_concurrent_callers_share_one_fetch():
+    async def run():
+        client = FakeClient(["m1"])
+        catalog = ModelCatalog(client)
+        results = await asyncio.gather(*(catalog.get_models() for _ in range(5)))
+        return client, results
+
+    client, results = asyncio.run(run())
+
+    assert client.calls == 1  # nosec B101
+    assert all(models == ["m1"] for models in results)  # nosec B101
+
+
+def test_fresh_list_is_served_from_the_cache():
+    async def run():
+        client = FakeClient(["m1"], ["m2"])
+        catalog = ModelCatalog(client)
+        await catalog.get_models()
+        return client, await catalog.get_models()
+
+    client, models = asyncio.run(run())
+
+    assert client.calls == 1 and models == ["m1"]  # nosec B101
+
+
+def test_stale_list_is_served_while_refreshing():
+    async def run():
+        client = FakeClient(["m1"], ["m2"])
+        catalog = ModelCatalog(client, ttl_s=0.0)
+        await catalog.get_models()
+        stale = await catalog.get_models()
+        await asyncio.sleep(0.05)
+        return client, stale, await catalog.get_models()
+
+    client, stale, refreshed = asyncio.run(run())
+
+    assert stale == ["m1"] and refreshed == ["m2"]  # nosec B101
+
+
+def test_unknown_model_invalidates_the_list(monkeypatch):
+    monkeypatch.setattr(ollama, "MIN_INVALIDATION_INTERVAL_S", 0.0)
+
+    async def run():
+        client = FakeClient(["m1"], ["m1", "pulled"])
+        catalog = ModelCatalog(client)
+        await catalog.get_models()
+        return client, await catalog.has_model("pulled")
+
+    client, found = asyncio.run(run())
+
+    assert found and client.calls == 2  # nosec B101
+
+
+def test_invalidation_is_rate_limited():
+    async def run():
+        client = FakeClient(["m1"], ["m1", "pulled"])
+        catalog = ModelCatalog(client)
+        await catalog.get_models()
+        return client, await catalog.has_model("missing")
+
+    client, found = asyncio.run(run())
+
+    # Just fetched: an unknown name does not trigger another request
+    assert not found and client.calls == 1  # nosec B101
+
+
+def test_failed_refresh_keeps_the_cached_list():
+    async def run():
+        client = FakeClient(["m1"])
+        catalog = ModelCatalog(client)
+        await catalog.get_models()
+        client.fail = True
+        return await catalog.refresh()
+
+    assert asyncio.run(run()) == ["m1"]  # nosec B101
+
+
+def test_failed_first_fetch_raises():
+    async def run():
+        client = FakeClient(["m1"])
+        client.fail = True
+        await ModelCatalog(client).get_models()
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(run())
+
+
+def test_invalidation_stays_rate_limited_while_ollama_is_down():
+    async def run():
+        client = FakeClient(["m1"])
+        catalog = ModelCatalog(client)
+        await catalog.get_models()
+        client.fail = True
+        catalog.invalidate()
+        await catalog.refresh()
+        # The failed refresh counts as an attempt: no new request for a while
+        return client, await catalog.has_model("missing")
+
+    client, found = asyncio.run(run())
+
+    assert not found and client.calls == 2  # nosec B101
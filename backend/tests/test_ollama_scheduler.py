@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+from config.config import OllamaSchedulerConfig
+from services.ollama import BATCH, INTERACTIVE, OllamaOverloaded, OllamaScheduler
+
+
+def test_admits_up_to_the_model_limit():
+    async def run():
+        scheduler = OllamaScheduler(
+            OllamaSchedulerConfig(max_concurrent_per_model=2, model_limits={"big": 1})
+        )
+        await scheduler.acquire("m")
+        await scheduler.acquire("m")
+        await scheduler.acquire("big")
+        waiting = asyncio.ensure_future(scheduler.acquire("m"))
+        await asyncio.sleep(0.01)
+        stats = scheduler.stats()
+        waiting.cancel()
+        return stats
+
+    stats = asyncio.run(run())
+
+    assert stats["models"]["m"] == {"active": 2, "queued": 1, "limit": 2}  # nosec B101
+    assert stats["models"]["big"]["limit"] == 1  # nosec B101
+    assert stats["admitted"] == 3  # nosec B101
+
+
+def test_release_hands_the_slot_to_the_next_waiter():
+    async def run():
+        scheduler = OllamaScheduler(OllamaSchedulerConfig(max_concurrent_per_model=1))
+        lease = await scheduler.acquire("m")
+        waiting = asyncio.ensure_future(scheduler.acquire("m"))
+        await asyncio.sleep(0.01)
+        lease.release()
+        # A second release must not free another slot
+        lease.release()
+        await waiting
+        return scheduler.stats()["models"]["m"]
+
+    assert asyncio.run(run()) == {"active": 1, "queued": 0, "limit": 1}  # nosec B101
+
+
+def test_interactive_requests_go_ahead_of_batch_ones():
+    async def run():
+        scheduler = OllamaScheduler(OllamaSchedulerConfig(max_concurrent_per_model=1))
+        lease = await scheduler.acquire("m")
+        order = []
+
+        async def acquire(name, priority):
+            next_lease = await scheduler.acquire("m", priority)
+            order.append(name)
+            next_lease.release()
+
+        tasks = [
+            asyncio.ensure_future(acquire("batch", BATCH)),
+            asyncio.ensure_future(acquire("first", INTERACTIVE)),
+            asyncio.ensure_future(acquire("second", INTERACTIVE)),
+        ]
+        await asyncio.sleep(0.01)
+        lease.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(run()) == ["first", "second", "batch"]  # nosec B101
+
+
+def test_full_queue_is_rejected_with_429():
+    async def run():
+        scheduler = OllamaScheduler(
+            OllamaSchedulerConfig(max_concurrent_per_model=1, max_queued=1)
+        )
+        await scheduler.acquire("m")
+        waiting = asyncio.ensure_future(scheduler.acquire("m"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(OllamaOverloaded) as rejected:
+            await scheduler.acquire("m")
+        waiting.cancel()
+        return rejected.value, scheduler.stats()
+
+    error, stats = asyncio.run(run())
+
+    assert error.status_code == 429 and error.retry_after_s >= 1  # nosec B101
+    assert stats["rejected"] == 1  # nosec B101
+
+
+def test_wait_beyond_max_wait_is_rejected_with_503():
+    async def run():
+        scheduler = OllamaScheduler(
+            OllamaSchedulerConfig(max_concurrent_per_model=1, max_wait_s=0.05)
+        )
+        await scheduler.acquire("m")
+        with pytest.raises(OllamaOverloaded) as timed_out:
+            await scheduler.acquire("m")
+        return timed_out.value, scheduler.stats()
+
+    error, stats = asyncio.run(run())
+
+    assert error.status_code == 503  # nosec B101
+    assert stats["timed_out"] == 1 and stats["queued"] == 0  # nosec B101
+    assert stats["models"]["m"]["active"] == 1  # nosec B101
+
+
+def test_cancelled_waiter_does_not_keep_a_slot():
+    async def run():
+        scheduler = OllamaScheduler(OllamaSchedulerConfig(max_concurrent_per_model=1))
+        lease = await scheduler.acquire("m")
+        abandoned = asyncio.ensure_future(scheduler.acquire("m"))
+        await asyncio.sleep(0.01)
+        abandoned.cancel()
+        await asyncio.sleep(0.01)
+        lease.release()
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+
+    assert stats["models"]["m"] == {"active": 0, "queued": 0, "limit": 1}  # nosec B101
+    assert stats["queued"] == 0  # nosec B101
+
+
+def test_cancelled_generation_frees_its_slot():
+    async def run():
+        scheduler = OllamaScheduler(OllamaSchedulerConfig(max_concurrent_per_model=1))
+        lease = await scheduler.acquire("m")
+        lease.cancel()
+        # Releasing after a cancel is a no-op
+        lease.release()
+        await scheduler.acquire("m")
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+
+    assert stats["cancelled"] == 1 and stats["admitted"] == 2  # nosec B101
+    assert stats["models"]["m"]["active"] == 1  # nosec B101
@@ -0,0 +1,158 @@
+import pytest
+from config.config import PromptBudgetConfig
+from services.prompt_builder import PromptBuilder, TokenEstimator
+
+
+def words(prefix, n):
+    """n distinct words, so chunks never overlap by accident."""
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+
+def chunks(prefix, sizes):
+    return [
+        {"content": words(f"{prefix}{n}x", size), "score": 1.0 - n / 10}
+        for n, size in enumerate(sizes)
+    ]
+
+
+@pytest.fixture
+def builder():
+    # 1000 tokens of context, 200 of them for the answer
+    return PromptBuilder(PromptBudgetConfig(context_tokens=1000, answer_tokens=200))
+
+
+def test_estimate_counts_words_and_long_words():
+    estimator = TokenEstimator(chars_per_token=4.0)
+
+    assert estimator.count("") == 0  # nosec B101
+    assert estimator.count("a, b.") == 4  # nosec B101
+    assert estimator.count("x" * 40) == 10  # nosec B101
+
+
+def test_system_prompt_and_message_always_go_in():
+    tight = PromptBuilder(PromptBudgetConfig(context_tokens=10, answer_tokens=5))
+
+    result = tight.build("Be brief.", "What is new?", rag_chunks=chunks("r", [50]))
+
+    assert "Be brief." in result["prompt"]  # nosec B101
+    assert result["prompt"].endswith("👤 User: What is new?\n🤖 AI: ")  # nosec B101
+    assert result["rag"] == [] and result["dropped"]["budget"] == 1  # nosec B101
+
+
+def test_sections_keep_to_their_shares(builder):
+    result = builder.build(
+        "system",
+        "question",
+        web_chunks=chunks("w", [60] * 8),
+        rag_chunks=chunks("r", [60] * 8),
+    )
+
+    tokens = result["tokens"]
+    assert tokens["total"] <= 800  # nosec B101
+    # Equal shares of an over-full budget give both sections the same room
+    assert len(result["web"]) == len(result["rag"]) > 0  # nosec B101
+    assert result["dropped"]["budget"] == 16 - 2 * len(result["web"])  # nosec B101
+
+
+def test_empty_section_gives_its_share_to_the_others(builder):
+    alone = builder.build("system", "question", rag_chunks=chunks("r", [60] * 8))
+    shared = builder.build(
+        "system",
+        "question",
+        web_chunks=chunks("w", [60] * 8),
+        rag_chunks=chunks("r", [60] * 8),
+    )
+
+    assert len(alone["rag"]) > len(shared["rag"])  # nosec B101
+
+
+def test_chunks_are_packed_best_first(builder):
+    rag = chunks("r", [20, 20, 20])
+    rag.reverse()
+
+    result = builder.build("system", "question", rag_chunks=rag)
+
+    assert [c["score"] for c in result["rag"]] == [1.0, 0.9, 0.8]  # nosec B101
+
+
+def test_overlapping_chunks_are_left_out(builder):
+    page = words("page", 40)
+    web = [{"content": page, "score": 0.9}]
+    # The same page, persisted to Chroma and found again
+    rag = [{"content": page, "score": 0.8}] + chunks("r", [20])
+
+    result = builder.build("system", "question", web_chunks=web, rag_chunks=rag)
+
+    selected = [c["content"] for c in result["web"] + result["rag"]]
+    assert selected.count(page) == 1 and len(selected) == 2  # nosec B101
+    assert result["dropped"]["duplicates"] == 1  # nosec B101
+    assert result["prompt"].count(page) == 1  # nosec B101
+
+
+def exchange(name, size):
+    return [
+        {"role": "user", "content": words(f"{name}q", size)},
+        {"role": "assistant", "content": words(f"{name}a", size)},
+    ]
+
+
+def test_history_is_packed_as_contiguous_exchanges():
+    builder = PromptBuilder(PromptBudgetConfig(context_tokens=400, answer_tokens=0))
+    # The middle exchange is too long: the older one is left out as well
+    history = exchange("old", 10) + exchange("long", 200) + exchange("new", 10)
+
+    result = builder.build("system", "question", history=history)
+
+    assert result["history"] == "".join(  # nosec B101
+        f"{builder._render_turn(turn)}\n" for turn in history[-2:]
+    )
+    assert result["dropped"]["budget"] == 2  # nosec B101
+
+
+def test_orphan_reply_is_left_out(builder):
+    history = [{"role": "assistant", "content": "orphan"}] + exchange("e", 5)
+
+    result = builder.build("system", "question", history=history)
+
+    assert "orphan" not in result["prompt"]  # nosec B101
+    assert [m["role"] for m in result["messages"]] == [  # nosec B101
+        "system",
+        "user",
+        "assistant",
+        "user",
+    ]
+
+
+def test_summary_only_takes_the_budget_left_over():
+    builder = PromptBuilder(PromptBudgetConfig(context_tokens=400, answer_tokens=0))
+    summary = "Summary: " + words("s", 30)
+
+    roomy = builder.build(
+        "system", "question", history=exchange("e", 10), summary=summary
+    )
+    # This exchange leaves less room than the summary needs
+    full = builder.build(
+        "system", "question", history=exchange("e", 140), summary=summary
+    )
+
+    # Chronological: the summary comes before the exchanges it precedes
+    assert roomy["history"].startswith(summary)  # nosec B101
+    assert roomy["messages"][1] == {"role": "system", "content": summary}  # nosec B101
+    assert summary not in full["prompt"] and full["history"]  # nosec B101
+    assert full["dropped"]["budget"] == 1  # nosec B101
+
+
+def test_context_goes_in_its_own_message_before_the_question(builder):
+    history = exchange("e", 5)
+
+    result = builder.build(
+        "system", "question", rag_chunks=chunks("r", [10]), history=history
+    )
+
+    messages = result["messages"]
+    # History is sent as stored, so the prefix stays the same on the next turn
+    assert messages[1:3] == history  # nosec B101
+    assert messages[-2]["role"] == "system"  # nosec B101
+    assert messages[-2]["content"].startswith("### Context:")  # nosec B101
+    assert messages[-1] == {"role": "user", "content": "question"}  # nosec B101
+    assert result["history_messages"] == 2  # nosec B101
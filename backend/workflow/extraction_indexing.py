@@ -1,16 +1,110 @@
 import asyncio
 import logging
-from typing import Any, Dict, List
+import os
+from typing import Any, Dict, List, Optional, Tuple
 
-from services.ragutils import CustomSegment, EmbeddingService, Indexer, TextExtractor
+import numpy as np
+from config.config import INGESTION_CONFIG, TEXT_EXTRACTOR_CONFIG
+from services.ingestion import FileProgress
+from services.ragutils import (
+    CustomSegment,
+    EmbeddingService,
+    TextExtractor,
+    get_document_manifest,
+    get_embedding_service,
+    release_chunks,
+    update_chunk_metadatas,
+    upsert_documents_with_embeddings,
+)
+from services.ragutils.segment import IncrementalSegmenter
+from services.ragutils.utils import sha256_file, sha256_text
 
 logger = logging.getLogger(__name__)
 
 
+class _PipelineDocument:
+    """
+    State of one document flowing through the indexing pipeline.
+    """
+
+    def __init__(
+        self,
+        document_id: str,
+        file_path: str,
+        metadata: Dict[str, Any],
+        chunk_id_prefix: str,
+        progress: Optional[FileProgress] = None,
+        keep_chunks: bool = False,
+        content_hash: Optional[str] = None,
+        previous: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.document_id = document_id
+        self.file_path = file_path
+        self.metadata = metadata
+        self.chunk_id_prefix = chunk_id_prefix
+        self.content_hash = content_hash
+        self.progress = progress or FileProgress(filename=document_id)
+        self.text_length = 0
+        self.chunk_ids: List[str] = []
+        self.chunk_hashes: List[str] = []
+        # Only filled when the caller wants the chunks (and embeddings) back
+        self.chunks: Optional[List[Dict[str, Any]]] = [] if keep_chunks else None
+        self.error: Optional[Exception] = None
+
+        # Chunks of the previously indexed version, reused when their text is unchanged
+        self.previous_ids: Dict[str, int] = {}
+        self._reusable: Dict[str, List[str]] = {}
+        if previous:
+            for index, (chunk_id, chunk_hash) in enumerate(
+                zip(previous["chunk_ids"], previous["chunk_hashes"])
+            ):
+                self.previous_ids[chunk_id] = index
+                self._reusable.setdefault(chunk_hash, []).append(chunk_id)
+        self._content_addressed = previous is not None
+        self._assigned: set = set()
+
+    def assign_chunk_id(self, index: int, chunk_hash: str) -> str:
+        """
+        Returns the ID of the chunk at `index`: the ID of an unchanged chunk of the
+        previous version if there is one left, otherwise a new ID. For documents
+        indexed incrementally, new IDs are derived from the chunk's hash, so an ID
+        always designates the same text.
+        """
+        reusable = self._reusable.get(chunk_hash)
+        if reusable:
+            chunk_id = reusable.pop(0)
+        elif self._content_addressed:
+            occurrence = 0
+            while (
+                chunk_id := f"{self.chunk_id_prefix}{chunk_hash[:16]}_{occurrence}"
+            ) in self._assigned or chunk_id in self.previous_ids:
+                occurrence += 1
+        else:
+            chunk_id = f"{self.chunk_id_prefix}{index}"
+        self._assigned.add(chunk_id)
+        return chunk_id
+
+    def is_reused(self, chunk_id: str) -> bool:
+        """Tells whether a chunk is kept from the previous version."""
+        return chunk_id in self.previous_ids
+
+
+# (document, chunk index, chunk text, chunk ID, chunk hash)
+_Chunk = Tuple[_PipelineDocument, int, str, str, str]
+
+# Placeholder item of the embed stage when no chunk arrived in time
+_NO_CHUNK = object()
+
+
 class ExtractionIndexingWorkflow:
     """
     Workflow for extracting text from documents, generating embeddings,
     and indexing each document with optional GPU support.
+
+    Documents go through a staged pipeline — extraction → segmentation → embedding →
+    storage — connected by bounded queues: pages flow on as soon as they are
+    extracted, the stages overlap across documents, and memory stays bounded by the
+    queue sizes rather than by the size of the corpus.
     """
 
     def __init__(
@@ -18,12 +112,13 @@ class ExtractionIndexingWorkflow:
         extractor: TextExtractor = None,
         segmenter: CustomSegment = None,
         embedder: EmbeddingService = None,
+        max_concurrent_extractions: int = 4,
     ):
         # Allow dependency injection or default to new instances
         self.extractor = extractor if extractor else TextExtractor()
         self.segmenter = segmenter if segmenter else CustomSegment()
-        self.embedder = embedder if embedder else EmbeddingService()
-        self.indexer = Indexer(segmenter=self.segmenter, embedder=self.embedder)
+        self.embedder = embedder if embedder else get_embedding_service()
+        self.extraction_slots = asyncio.Semaphore(max_concurrent_extractions)
 
     async def process_documents(
         self, documents: List[Dict[str, Any]]
@@ -31,7 +126,7 @@ class ExtractionIndexingWorkflow:
         """
         Process multiple documents concurrently:
           - Extract text from each document
-          - Index them (segment + embeddings)
+          - Index them (segment + embeddings + ChromaDB)
 
         Args:
             documents (List[Dict[str, Any]]): A list of documents where each dict has:
@@ -44,52 +139,446 @@ class ExtractionIndexingWorkflow:
         Returns:
             List[Dict[str, Any]]: A list of indexed data for all documents.
         """
-        # Create a coroutine for each document
-        tasks = [self._process_single_document(doc) for doc in documents]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        # Ensure only valid dictionaries are returned and filter out errors
-        final_results: List[Dict[str, Any]] = [
-            result for result in results if isinstance(result, dict)
+        pipeline_documents = [
+            _PipelineDocument(
+                document_id=doc["document_id"],
+                file_path=doc["file_path"],
+                metadata=doc.get("metadata", {}),
+                chunk_id_prefix=f"{doc['document_id']}_",
+                keep_chunks=True,
+            )
+            for doc in documents
         ]
-        return final_results
+        await self._run_pipeline(pipeline_documents)
+
+        results: List[Dict[str, Any]] = []
+        for doc in pipeline_documents:
+            if doc.error is not None:
+                results.append(
+                    {
+                        "document_id": doc.document_id,
+                        "chunks": [],
+                        "error": str(doc.error),
+                    }
+                )
+            else:
+                logger.info(
+                    f"Document {doc.document_id} indexed successfully with {len(doc.chunks or [])} chunks."
+                )
+                results.append({"document_id": doc.document_id, "chunks": doc.chunks})
+        return results
 
-    async def _process_single_document(
-        self, document: Dict[str, Any]
+    async def index_upload(
+        self, filename: str, progress: Optional[FileProgress] = None
     ) -> Dict[str, Any]:
         """
-        Extract and index a single document.
-        This helper method is used by process_documents.
+        Indexes an uploaded file into ChromaDB and records it in the manifest.
+
+        A file whose content is already indexed (under this or another name) is not
+        extracted or embedded again: it is recorded as sharing the existing chunks.
+        When a new version of an indexed file is indexed, only the chunks whose text
+        changed are embedded; vanished chunks are deleted.
+        Chunks written before a failure or cancellation are removed again, so a
+        file never stays half-indexed, and a previously indexed version is only
+        replaced once the new one is complete.
 
         Args:
-            document (Dict[str, Any]): Document data.
+            filename (str): Name of the file in the upload directory.
+            progress (FileProgress, optional): Updated as pages are extracted and
+                chunks are embedded and written.
 
         Returns:
-            Dict[str, Any]: Indexed data for the document.
+            Dict[str, Any]: Filename, text length, chunk count, status, and how many
+                chunks were "added", "changed", "removed" and "unchanged" compared
+                with the previous version (or "linked_to" when the chunks of an
+                identical file were reused).
         """
-        doc_id = document["document_id"]
-        file_path = document["file_path"]
-        metadata = document.get("metadata", {})
+        return (await self.index_uploads([filename], [progress]))[0]
+
+    async def index_uploads(
+        self,
+        filenames: List[str],
+        progresses: Optional[List[Optional[FileProgress]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Indexes several uploaded files through one pipeline run.
+
+        Args:
+            filenames (List[str]): Names of the files in the upload directory.
+            progresses (List[FileProgress], optional): One progress per file.
 
-        logger.info(f"Starting extraction and indexing for document: {doc_id}")
+        Returns:
+            List[Dict[str, Any]]: One result per file (see `index_upload`).
+
+        Raises:
+            FileNotFoundError: If a file is missing from the upload directory.
+            Exception: The first extraction error, after cleaning up every file.
+        """
+        manifest = get_document_manifest()
+        files = []
+        for filename, progress in zip(filenames, progresses or [None] * len(filenames)):
+            file_path = os.path.join(TEXT_EXTRACTOR_CONFIG.temp_upload_dir, filename)
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"File '{filename}' not found.")
+            files.append(
+                (filename, file_path, progress or FileProgress(filename=filename))
+            )
+
+        results: Dict[str, Dict[str, Any]] = {}
+        documents: List[_PipelineDocument] = []
+        # Files identical to one that is indexed in this run: (filename, progress, source)
+        copies: List[Tuple[str, FileProgress, _PipelineDocument]] = []
+        by_hash: Dict[str, _PipelineDocument] = {}
+        for filename, file_path, progress in files:
+            content_hash = await asyncio.to_thread(sha256_file, file_path)
+            current = manifest.get_document(filename)
+            if current and current["content_hash"] == content_hash:
+                results[filename] = await self._link_indexed(
+                    filename, current, progress
+                )
+                continue
+            source = manifest.find_by_content_hash(
+                content_hash, exclude_filename=filename
+            )
+            if source:
+                results[filename] = await self._link_indexed(filename, source, progress)
+                continue
+            if content_hash in by_hash:
+                copies.append((filename, progress, by_hash[content_hash]))
+                continue
+
+            # Chunk IDs are tied to the chunks' text, so chunks of a previous version
+            # (possibly shared with other files) are reused but never overwritten
+            doc = _PipelineDocument(
+                document_id=filename,
+                file_path=file_path,
+                metadata={"filename": filename},
+                chunk_id_prefix=f"{filename}_",
+                progress=progress,
+                content_hash=content_hash,
+                previous=current or {"chunk_ids": [], "chunk_hashes": []},
+            )
+            documents.append(doc)
+            by_hash[content_hash] = doc
 
         try:
-            # 1) Extract text from file
-            extraction_result = await self.extractor.extract_text(file_path)
-            logger.info(f"Extraction succeeded for document: {doc_id}")
+            await self._run_pipeline(documents)
+        except BaseException:
+            await self._discard_uploads(documents)
+            raise
+        failed = [doc for doc in documents if doc.error is not None]
+        if failed:
+            await self._discard_uploads(documents)
+            raise failed[0].error  # type: ignore[misc]
 
-            # 2) Index the document (segments + embeddings)
-            indexed_data: Dict[str, Any] = await self.indexer._process_document(
-                document_id=doc_id, text=extraction_result.text or "", metadata=metadata
+        for doc in documents:
+            if not doc.chunk_ids:
+                results[doc.document_id] = {
+                    "filename": doc.document_id,
+                    "text_length": 0,
+                    "status": "No valid content",
+                }
+                continue
+            # Record the file in the manifest (filename → chunk IDs, hash, ...)
+            await asyncio.to_thread(
+                self._replace_indexed,
+                doc.document_id,
+                doc.content_hash,
+                doc.chunk_ids,
+                doc.chunk_hashes,
             )
+            results[doc.document_id] = {
+                "filename": doc.document_id,
+                "text_length": doc.text_length,
+                "chunks": len(doc.chunk_ids),
+                "status": "Indexed in ChromaDB",
+                **self._diff_counts(doc),
+            }
+
+        for filename, progress, source in copies:
+            if not source.chunk_ids:
+                results[filename] = {
+                    **results[source.document_id],
+                    "filename": filename,
+                }
+                continue
+            indexed = manifest.get_document(source.document_id)
+            results[filename] = await self._link_indexed(filename, indexed, progress)
+        return [results[filename] for filename, _, _ in files]
 
-            logger.info(
-                f"Document {doc_id} indexed successfully with {len(indexed_data.get('chunks', []))} chunks."
+    async def _link_indexed(
+        self, filename: str, indexed: Dict[str, Any], progress: FileProgress
+    ) -> Dict[str, Any]:
+        """
+        Records `filename` as sharing the chunks of an indexed file with the same
+        content (possibly its own current entry), without extracting or embedding.
+        """
+        if indexed["filename"] != filename:
+            await asyncio.to_thread(
+                self._replace_indexed,
+                filename,
+                indexed["content_hash"],
+                indexed["chunk_ids"],
+                indexed["chunk_hashes"],
             )
-            return indexed_data  # Ensured it's always a Dict[str, Any]
+        progress.chunks_total = progress.chunks_embedded = progress.chunks_written = (
+            indexed["chunk_count"]
+        )
+        result = {
+            "filename": filename,
+            "chunks": indexed["chunk_count"],
+            "status": "Already indexed",
+            "added": 0,
+            "changed": 0,
+            "removed": 0,
+            "unchanged": indexed["chunk_count"],
+        }
+        if indexed["filename"] != filename:
+            result = {
+                "filename": filename,
+                "chunks": indexed["chunk_count"],
+                "status": "Linked to an indexed copy",
+                "linked_to": indexed["filename"],
+            }
+        return result
+
+    @staticmethod
+    def _diff_counts(doc: _PipelineDocument) -> Dict[str, int]:
+        """
+        Compares a re-indexed document with its previous version. A new chunk that
+        takes the place of a vanished one counts as changed.
+        """
+        unchanged = sum(1 for chunk_id in doc.chunk_ids if doc.is_reused(chunk_id))
+        new = len(doc.chunk_ids) - unchanged
+        vanished = len(doc.previous_ids) - unchanged
+        changed = min(new, vanished)
+        return {
+            "added": new - changed,
+            "changed": changed,
+            "removed": vanished - changed,
+            "unchanged": unchanged,
+        }
+
+    @staticmethod
+    def _replace_indexed(
+        filename: str,
+        content_hash: Optional[str],
+        chunk_ids: List[str],
+        chunk_hashes: List[str],
+    ) -> None:
+        """
+        Records the new chunks of a file in the manifest, then releases the chunks
+        of its previous version that nothing refers to any more.
+        """
+        manifest = get_document_manifest()
+        previous = manifest.get_document(filename)
+        manifest.record_document(filename, content_hash, chunk_ids, chunk_hashes)
+        if previous:
+            kept = set(chunk_ids)
+            release_chunks(
+                [
+                    chunk_id
+                    for chunk_id in previous["chunk_ids"]
+                    if chunk_id not in kept
+                ],
+                manifest=manifest,
+            )
+
+    async def _discard_uploads(self, documents: List[_PipelineDocument]) -> None:
+        """Removes whatever was written for uploads that did not complete."""
+        for doc in documents:
+            await asyncio.to_thread(
+                release_chunks,
+                [chunk_id for chunk_id in doc.chunk_ids if not doc.is_reused(chunk_id)],
+            )
+            doc.progress.chunks_written = doc.progress.chunks_reused = 0
+
+    async def _run_pipeline(self, documents: List[_PipelineDocument]) -> None:
+        """
+        Runs the four stages concurrently until every document is stored.
+        Extraction errors are recorded per document; any other error stops the run.
+        """
+        batch_size = INGESTION_CONFIG.write_batch_size
+        pages: "asyncio.Queue" = asyncio.Queue(INGESTION_CONFIG.pipeline_queue_size)
+        chunks: "asyncio.Queue" = asyncio.Queue(2 * batch_size)
+        batches: "asyncio.Queue" = asyncio.Queue(2)
+
+        async def extract_all() -> None:
+            await asyncio.gather(*[self._extract(doc, pages) for doc in documents])
+            await pages.put(None)
+
+        tasks = [
+            asyncio.create_task(stage)
+            for stage in (
+                extract_all(),
+                self._segment_stage(pages, chunks),
+                self._embed_stage(
+                    chunks,
+                    batches,
+                    batch_size,
+                    INGESTION_CONFIG.embed_linger_ms / 1000,
+                ),
+                self._store_stage(batches),
+            )
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _extract(self, doc: _PipelineDocument, pages: asyncio.Queue) -> None:
+        """Stage 1: streams the pages of one document into the queue."""
+        logger.info(f"Starting extraction and indexing for document: {doc.document_id}")
+        async with self.extraction_slots:
+            try:
+                async for page in self.extractor.iter_pages(doc.file_path):
+                    await pages.put((doc, page))
+                    doc.progress.pages_extracted += 1
+            except Exception as e:
+                logger.error(f"Failed to process document {doc.document_id}: {str(e)}")
+                doc.error = e
+        # End of this document
+        await pages.put((doc, None))
+
+    async def _segment_stage(self, pages: asyncio.Queue, chunks: asyncio.Queue) -> None:
+        """Stage 2: segments each document incrementally as its pages arrive."""
+        streams: Dict[int, IncrementalSegmenter] = {}
+        counts: Dict[int, int] = {}
+        while (item := await pages.get()) is not None:
+            doc, page = item
+            key = id(doc)
+            if page is None:
+                stream = streams.pop(key, None)
+                pieces = stream.finish() if stream is not None else []
+            else:
+                if key not in streams:
+                    streams[key] = self.segmenter.stream()
+                else:
+                    page = "\n" + page
+                doc.text_length += len(page)
+                pieces = await asyncio.to_thread(streams[key].feed, page)
+
+            for piece in pieces:
+                if doc.error is None and piece:
+                    index = counts.get(key, 0)
+                    counts[key] = index + 1
+                    doc.progress.chunks_total = index + 1
+                    chunk_hash = sha256_text(piece)
+                    chunk_id = doc.assign_chunk_id(index, chunk_hash)
+                    await chunks.put((doc, index, piece, chunk_id, chunk_hash))
+            if page is None:
+                counts.pop(key, None)
+                await chunks.put((doc, None, None, None, None))
+        await chunks.put(None)
+
+    async def _embed_stage(
+        self,
+        chunks: asyncio.Queue,
+        batches: asyncio.Queue,
+        batch_size: int,
+        linger_s: float,
+    ) -> None:
+        """
+        Stage 3: embeds chunks in batches of up to `batch_size`, across documents.
+        A batch is sent on once it is full, at the end of the input, or when no new
+        chunk arrived for `linger_s` seconds.
+        Chunks reused from a previous version pass through without being embedded.
+        """
+        batch: List[_Chunk] = []
+        fresh: List[int] = []
+        finished: List[_PipelineDocument] = []
+        while True:
+            lingered = False
+            if batch or finished:
+                try:
+                    item = await asyncio.wait_for(chunks.get(), linger_s)
+                except asyncio.TimeoutError:
+                    item, lingered = _NO_CHUNK, True
+            else:
+                item = await chunks.get()
+            if item is not None and item is not _NO_CHUNK:
+                doc, index = item[0], item[1]
+                if index is None:
+                    finished.append(doc)
+                elif doc.error is None:
+                    if not doc.is_reused(item[3]):
+                        fresh.append(len(batch))
+                    batch.append(item)
+            # Reused chunks fill a write batch too, though they are not embedded
+            if item is None or len(batch) >= batch_size or lingered:
+                if batch or finished:
+                    vectors: List[Any] = [None] * len(batch)
+                    if fresh:
+                        embeddings: np.ndarray = await self.embedder.get_embeddings(
+                            [batch[i][2] for i in fresh]
+                        )
+                        for row, i in enumerate(fresh):
+                            vectors[i] = embeddings[row]
+                            batch[i][0].progress.chunks_embedded += 1
+                    await batches.put((batch, vectors, finished))
+                    batch, fresh, finished = [], [], []
+            if item is None:
+                await batches.put(None)
+                return
+
+    async def _store_stage(self, batches: asyncio.Queue) -> None:
+        """
+        Stage 4: writes embedded chunks to ChromaDB. Reused chunks are only
+        renumbered, when their position in the document changed.
+        """
+        while (item := await batches.get()) is not None:
+            batch, vectors, finished = item
+            # Documents whose extraction failed meanwhile are not written
+            keep = [i for i, chunk in enumerate(batch) if chunk[0].error is None]
+            batch = [batch[i] for i in keep]
+            vectors = [vectors[i] for i in keep]
 
-        except Exception as e:
-            logger.error(f"Failed to process document {doc_id}: {str(e)}")
+            new = [i for i, vector in enumerate(vectors) if vector is not None]
+            if new:
+                await asyncio.to_thread(
+                    upsert_documents_with_embeddings,
+                    texts=[batch[i][2] for i in new],
+                    embeddings=np.stack([vectors[i] for i in new]),
+                    metadatas=[
+                        {**batch[i][0].metadata, "chunk_index": batch[i][1]}
+                        for i in new
+                    ],
+                    ids=[batch[i][3] for i in new],
+                )
+            moved = [
+                (chunk_id, index)
+                for doc, index, _, chunk_id, _ in batch
+                if doc.is_reused(chunk_id) and doc.previous_ids[chunk_id] != index
+            ]
+            if moved:
+                await asyncio.to_thread(
+                    update_chunk_metadatas,
+                    [chunk_id for chunk_id, _ in moved],
+                    [{"chunk_index": index} for _, index in moved],
+                )
 
-            # 🔍 Explicitly return a correctly structured empty dictionary:
-            return {"document_id": doc_id, "chunks": [], "error": str(e)}
+            for (doc, index, text, chunk_id, chunk_hash), embedding in zip(
+                batch, vectors
+            ):
+                doc.chunk_ids.append(chunk_id)
+                doc.chunk_hashes.append(chunk_hash)
+                doc.progress.chunks_written += 1
+                if embedding is None:
+                    doc.progress.chunks_reused += 1
+                if doc.chunks is not None:
+                    doc.chunks.append(
+                        {
+                            "chunk_index": index,
+                            "content": text,
+                            "embedding": embedding,
+                            "metadata": {
+                                **doc.metadata,
+                                "chunk_index": index,
+                                "id": chunk_id,
+                            },
+                        }
+                    )
+            for doc in finished:
+                logger.info(f"Indexing complete for document: {doc.document_id}")
@@ -1,10 +1,27 @@
+import asyncio
 import logging
-from typing import Any, Dict, List
+import time
+from typing import Any, Dict, List, Set, Tuple
 
-from services.ragutils import CustomSegment, EmbeddingService, Indexer, WebSearchService
+import numpy as np
+from services.ragutils import (
+    CustomSegment,
+    EmbeddingService,
+    Indexer,
+    WebSearchService,
+    delete_chunks,
+    get_chunks_by_document_ids,
+    get_embedding_service,
+    update_chunk_metadatas,
+    upsert_documents_with_embeddings,
+)
+from services.ragutils.utils import normalize_url, sha256_text
 
 logger = logging.getLogger(__name__)
 
+# Keeps background persistence tasks alive until they finish
+_background_tasks: Set["asyncio.Task[None]"] = set()
+
 
 class WebSearchIndexingWorkflow:
     """
@@ -28,9 +45,114 @@ class WebSearchIndexingWorkflow:
         """
         self.search_service = search_service
         self.segmenter = segmenter if segmenter else CustomSegment()
-        self.embedder = embedder if embedder else EmbeddingService()
+        self.embedder = embedder if embedder else get_embedding_service()
         self.indexer = Indexer(segmenter=self.segmenter, embedder=self.embedder)
 
+    @staticmethod
+    def web_document_id(url: str) -> str:
+        """Returns the stable document ID of a page: a hash of its normalized URL."""
+        return f"web-{sha256_text(normalize_url(url))[:16]}"
+
+    @classmethod
+    def _build_documents(
+        cls, raw_results: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Turns scraped search results into indexer documents (id, text, metadata),
+        one per distinct page.
+        """
+        documents_to_process: List[Dict[str, Any]] = []
+        seen = set()
+        now = time.time()
+        for result in raw_results:
+            doc_id = cls.web_document_id(result.get("url", ""))
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            text_content: str = result.get("raw_text", "")
+            meta: Dict[str, Any] = {
+                "title": result.get("title", ""),
+                "url": result.get("url", ""),
+                "snippet": result.get("body_snippet", ""),
+                "document_id": doc_id,
+                "content_hash": sha256_text(text_content),
+                "last_seen": now,
+            }
+            documents_to_process.append(
+                {"document_id": doc_id, "text": text_content, "metadata": meta}
+            )
+        return documents_to_process
+
+    @staticmethod
+    def _partition(
+        documents: List[Dict[str, Any]], stored: Dict[str, Dict[str, list]]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Splits documents into those that must be (re)indexed and those whose stored
+        chunks are still current. Pages that could not be fetched this time keep
+        their stored chunks.
+        """
+        changed, unchanged = [], []
+        for doc in documents:
+            existing = stored.get(doc["document_id"])
+            if existing and (
+                not doc["text"].strip()
+                or all(
+                    meta.get("content_hash") == doc["metadata"]["content_hash"]
+                    for meta in existing["metadatas"]
+                )
+            ):
+                unchanged.append(doc)
+            else:
+                changed.append(doc)
+        return changed, unchanged
+
+    @staticmethod
+    def _refresh_last_seen(
+        unchanged: List[Dict[str, Any]], stored: Dict[str, Dict[str, list]]
+    ) -> None:
+        """Bumps `last_seen` on the chunks of pages seen again with the same content."""
+        ids: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
+        for doc in unchanged:
+            if not doc["text"].strip():
+                continue
+            existing = stored[doc["document_id"]]
+            ids.extend(existing["ids"])
+            metadatas.extend(
+                {**meta, "last_seen": doc["metadata"]["last_seen"]}
+                for meta in existing["metadatas"]
+            )
+        update_chunk_metadatas(ids, metadatas)
+
+    @staticmethod
+    def _delete_stale(
+        document_id: str, stored: Dict[str, Dict[str, list]], new_ids: List[str]
+    ) -> None:
+        """Deletes chunks left over from a longer previous version of a page."""
+        existing = stored.get(document_id)
+        if existing:
+            delete_chunks(sorted(set(existing["ids"]) - set(new_ids)))
+
+    @staticmethod
+    def _stored_as_indexed(document_id: str, existing: Dict[str, list]) -> Dict:
+        """Shapes the stored chunks of a page like the indexer's output."""
+        chunks = sorted(
+            zip(existing["ids"], existing["documents"], existing["metadatas"]),
+            key=lambda chunk: chunk[2].get("chunk_index", 0),
+        )
+        return {
+            "document_id": document_id,
+            "chunks": [
+                {
+                    "chunk_index": meta.get("chunk_index"),
+                    "content": text,
+                    "metadata": meta,
+                }
+                for _, text, meta in chunks
+            ],
+        }
+
     async def search_and_index(self, query: str) -> List[Dict[str, Any]]:
         """
         1) search_and_scrape for `query`
@@ -41,31 +163,160 @@ class WebSearchIndexingWorkflow:
         logger.info(f"Starting web search for query: {query}")
 
         # 1) Perform the search
-        raw_results: List[Dict[str, Any]] = self.search_service.search_and_scrape(
-            query
+        raw_results: List[Dict[str, Any]] = (
+            await self.search_service.asearch_and_scrape(query)
         )  # Explicit type annotation
         logger.info(f"Got {len(raw_results)} results for query: {query}")
 
-        # 2) Prepare a list of "documents" to feed to the indexer
-        documents_to_process: List[Dict[str, Any]] = []
-        for i, result in enumerate(raw_results):
-            doc_id = f"web-{i}"
-            text_content: str = result.get("raw_text", "")
-            meta: Dict[str, Any] = {
-                "title": result.get("title", ""),
-                "url": result.get("url", ""),
-                "snippet": result.get("body_snippet", ""),
-            }
-            documents_to_process.append(
-                {"document_id": doc_id, "text": text_content, "metadata": meta}
-            )
+        # 2) Prepare a list of "documents" to feed to the indexer, skipping pages
+        #    whose content is unchanged since they were last indexed
+        documents = self._build_documents(raw_results)
+        stored = await asyncio.to_thread(
+            get_chunks_by_document_ids,
+            [doc["document_id"] for doc in documents],
+            ["documents"],
+        )
+        documents_to_process, unchanged = self._partition(documents, stored)
+        await asyncio.to_thread(self._refresh_last_seen, unchanged, stored)
 
         # 3) Index them (async)
         indexed_data_list: List[Dict[str, Any]] = await self.indexer.index_documents(
             documents_to_process
         )  # Explicit type annotation
+        for indexed in indexed_data_list:
+            new_ids = [
+                f"{indexed['document_id']}_{chunk['chunk_index']}"
+                for chunk in indexed.get("chunks", [])
+            ]
+            await asyncio.to_thread(
+                self._delete_stale, indexed["document_id"], stored, new_ids
+            )
         logger.info(
-            f"Completed indexing {len(indexed_data_list)} documents from web search."
+            f"Completed indexing {len(indexed_data_list)} documents from web search, "
+            f"{len(unchanged)} unchanged."
+        )
+
+        indexed_by_id = {doc["document_id"]: doc for doc in indexed_data_list}
+        return [
+            indexed_by_id.get(doc["document_id"])
+            or self._stored_as_indexed(doc["document_id"], stored[doc["document_id"]])
+            for doc in documents
+        ]
+
+    async def search_and_rank(
+        self, query: str, top_k: int = 5, persist: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Ephemeral retrieval: searches, chunks the scraped pages and ranks the chunks
+        against the query in memory, without waiting on ChromaDB.
+
+        The query and all chunks are embedded in a single batch. With `persist=True`
+        the chunks (and their already computed embeddings) are upserted into Chroma
+        by a background task.
+
+        Args:
+            query (str): The search query.
+            top_k (int): Number of chunks to return.
+            persist (bool): Whether to store the chunks in Chroma in the background.
+
+        Returns:
+            List[Dict[str, Any]]: The best chunks, each with "content", "score" and
+            "metadata" (title, url, snippet, chunk_index), highest score first.
+        """
+        logger.info(f"Starting ephemeral web retrieval for query: {query}")
+        raw_results = await self.search_service.asearch_and_scrape(query)
+        documents = self._build_documents(raw_results)
+
+        chunk_lists = await asyncio.to_thread(
+            lambda: [
+                self.segmenter.hybrid_segmentation(doc["text"]) for doc in documents
+            ]
         )
+        texts: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
+        ids: List[str] = []
+        for doc, chunks in zip(documents, chunk_lists):
+            for i, chunk in enumerate(chunks):
+                if chunk.strip():
+                    texts.append(chunk)
+                    metadatas.append({**doc["metadata"], "chunk_index": i})
+                    ids.append(f"{doc['document_id']}_{i}")
+        if not texts or not query.strip():
+            return []
+
+        embeddings = await self.embedder.get_embeddings([query, *texts])
+        if not len(embeddings):
+            return []
+        query_vector, chunk_vectors = embeddings[0], embeddings[1:]
+
+        norms = np.linalg.norm(chunk_vectors, axis=1) * np.linalg.norm(query_vector)
+        scores = chunk_vectors @ query_vector / np.maximum(norms, 1e-12)
+        best = np.argsort(-scores, kind="stable")[:top_k]
+
+        if persist:
+            self._persist_in_background(documents, texts, chunk_vectors, metadatas, ids)
+
+        logger.info(f"Ranked {len(texts)} web chunks for query: {query}")
+        return [
+            {
+                "content": texts[i],
+                "score": float(scores[i]),
+                "metadata": metadatas[i],
+            }
+            for i in best
+        ]
+
+    @classmethod
+    def _persist_in_background(
+        cls,
+        documents: List[Dict[str, Any]],
+        texts: List[str],
+        embeddings: np.ndarray,
+        metadatas: List[Dict[str, Any]],
+        ids: List[str],
+    ) -> None:
+        """
+        Stores already embedded chunks in Chroma without blocking the caller.
+        Unchanged pages only get their `last_seen` refreshed.
+        """
+
+        def persist() -> None:
+            stored = get_chunks_by_document_ids(
+                [doc["document_id"] for doc in documents]
+            )
+            changed, unchanged = cls._partition(documents, stored)
+            cls._refresh_last_seen(unchanged, stored)
+
+            changed_ids = {doc["document_id"] for doc in changed}
+            keep = [
+                i
+                for i, meta in enumerate(metadatas)
+                if meta["document_id"] in changed_ids
+            ]
+            if keep:
+                upsert_documents_with_embeddings(
+                    texts=[texts[i] for i in keep],
+                    embeddings=embeddings[keep],
+                    metadatas=[metadatas[i] for i in keep],
+                    ids=[ids[i] for i in keep],
+                )
+            for doc in changed:
+                cls._delete_stale(
+                    doc["document_id"],
+                    stored,
+                    [
+                        ids[i]
+                        for i in keep
+                        if metadatas[i]["document_id"] == doc["document_id"]
+                    ],
+                )
+
+        async def run() -> None:
+            try:
+                await asyncio.to_thread(persist)
+            except Exception as e:
+                logger.error(f"Background persistence of web chunks failed: {e}")
 
-        return indexed_data_list
+        task = asyncio.get_running_loop().create_task(run())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
@@ -1,5 +1,7 @@
 import os
 import re
+import time
+import uuid
 
 import requests
 import streamlit as st
@@ -10,10 +12,11 @@ from streamlit_chat import message
 # ---------------------------
 BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8000")  # For Docker usage
 CHAT_ENDPOINT = f"{BACKEND_URL}/chat/message/"
+CLEAR_HISTORY_ENDPOINT = f"{BACKEND_URL}/chat/clear_history/"
 MODELS_ENDPOINT = f"{BACKEND_URL}/chat/available_models/"
 DOCS_LIST_ENDPOINT = f"{BACKEND_URL}/docs/list/"
 UPLOAD_DOC_ENDPOINT = f"{BACKEND_URL}/docs/upload/"
-BUILD_VECTOR_ENDPOINT = f"{BACKEND_URL}/text-extraction/extract_and_store/"
+BUILD_VECTOR_ENDPOINT = f"{BACKEND_URL}/text-extraction/jobs/"
 
 
 # ---------------------------
@@ -36,6 +39,30 @@ def separate_think_from_answer(text: str):
         return "", text
 
 
+def wait_for_ingestion_job(job_id: str, poll_interval: float = 1.0):
+    """
+    Polls a background ingestion job until it finishes, showing per-file progress
+    in the sidebar. Returns the final job status.
+    """
+    progress_bar = st.sidebar.progress(0.0)
+    status_text = st.sidebar.empty()
+    while True:
+        job = requests.get(f"{BUILD_VECTOR_ENDPOINT}{job_id}", timeout=10).json()
+        files = job.get("files", [])
+        total = sum(f["chunks_total"] for f in files) or 1
+        progress_bar.progress(min(job.get("chunks_written", 0) / total, 1.0))
+        status_text.text(
+            "\n".join(
+                f"{f['filename']}: {f['status']} "
+                f"({f['chunks_written']}/{f['chunks_total']} chunks)"
+                for f in files
+            )
+        )
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(poll_interval)
+
+
 def handle_streaming_response(resp):
     """
     Reads chunked lines from 'resp' (requests.Response with stream=True),
@@ -131,10 +158,18 @@ if document_options:
             try:
                 payload = {"filenames": selected_docs}
                 index_resp = requests.post(
-                    BUILD_VECTOR_ENDPOINT, json=payload, timeout=500
+                    BUILD_VECTOR_ENDPOINT, json=payload, timeout=30
                 )
-                if index_resp.status_code == 200:
-                    st.sidebar.success("Vector DB updated successfully!")
+                if index_resp.status_code == 202:
+                    job = wait_for_ingestion_job(index_resp.json()["job_id"])
+                    failed = [f for f in job["files"] if f["status"] == "failed"]
+                    if job["status"] == "cancelled":
+                        st.sidebar.warning("Indexing was cancelled.")
+                    elif failed:
+                        for f in failed:
+                            st.sidebar.error(f"{f['filename']}: {f['error']}")
+                    else:
+                        st.sidebar.success("Vector DB updated successfully!")
                 else:
                     st.sidebar.error(f"Vectorization failed: {index_resp.text}")
             except Exception as e:
@@ -186,6 +221,9 @@ st.write("Chat with your AI assistant below. Use RAG/WebSearch for smarter respo
 # Keep chat history in session_state
 if "chat_history" not in st.session_state:
     st.session_state["chat_history"] = []
+# The backend keeps the conversation memory of each browser session separately
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = uuid.uuid4().hex
 
 # Display existing conversation
 for i, chat_msg in enumerate(st.session_state["chat_history"]):
@@ -218,6 +256,7 @@ if st.button("Send"):
         payload = {
             "model_name": selected_model,
             "user_message": user_input,
+            "session_id": st.session_state["session_id"],
             "personality": selected_personality,
             "use_web_search": (single_search_toggle or use_web_search),
             "use_rag": use_rag,
@@ -278,4 +317,12 @@ if st.button("Send"):
 # Clear Chat Button
 if st.button("Clear Conversation"):
     st.session_state["chat_history"].clear()
+    try:
+        requests.delete(
+            CLEAR_HISTORY_ENDPOINT,
+            params={"session_id": st.session_state["session_id"]},
+            timeout=10,
+        )
+    except requests.RequestException:
+        pass
     st.rerun()